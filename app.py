@@ -1,15 +1,34 @@
-from flask import Flask, request, jsonify, redirect, session
+from flask import Flask, request, jsonify, redirect, session, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_socketio import SocketIO
-import requests
 import os
 import urllib.parse
 import base64
 import json
+import math
 import time
+import threading
+from datetime import datetime
 from dotenv import load_dotenv
 import eventlet
 from functools import wraps
+from lyrics_cache import LyricsMemoryCache, LyricsCacheStats
+from lyrics_store import open_lyrics_store
+from lyrics_snapshot import LyricsSnapshot, write_snapshot, publishable_entries
+from singleflight import SingleFlight
+from deadline import Deadline, DeadlineExceeded
+from provider_stats import ProviderScoreboard
+from lyrics_engine import LyricsEngine, LyricsPending, TrackSignature
+from content_filter import LEXICONS, MultilingualFilter, as_lexicons
+from provider_probe import ProviderProber
+import http_client
+from lyrics_compression import pack_lyrics, unpack_lyrics, use_dictionary_dir, compression_stats
+from lyrics_normalize import (
+    song_cache_key, legacy_cache_key, query_artist, query_title, record_lookup, hit_rate_report
+)
+from sqlalchemy import func, or_, and_, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import TypeDecorator
 
 eventlet.monkey_patch()
 
@@ -31,7 +50,7 @@ SCOPES = 'user-read-private user-read-email'
 
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///church_party.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///church_party.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'supersecretkey'
 
@@ -45,6 +64,21 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 # ----------------------
 # Database Models
 # ----------------------
+LYRICS_COMPRESSION = os.getenv('LYRICS_COMPRESSION', '1') == '1'
+LYRICS_ZDICT_DIR = os.getenv('LYRICS_ZDICT_DIR', 'lyrics_zdict')
+use_dictionary_dir(LYRICS_ZDICT_DIR)
+
+class CompressedText(TypeDecorator):
+    """Text column that stores lyrics zlib-compressed and reads plain rows unchanged"""
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return pack_lyrics(value) if LYRICS_COMPRESSION else value
+
+    def process_result_value(self, value, dialect):
+        return unpack_lyrics(value)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -63,6 +97,7 @@ class Song(db.Model):
     explicit = db.Column(db.Boolean, nullable=False)
     duration_ms = db.Column(db.Integer)
     image_url = db.Column(db.String(500))
+    artists = db.Column(db.Text)  # JSON list of every credited artist; `artist` is the first
     
     # Relationships
     requests = db.relationship('Request', backref='song', lazy=True)
@@ -80,8 +115,24 @@ class Request(db.Model):
 class LyricsCheck(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     song_id = db.Column(db.Integer, db.ForeignKey('song.id'), nullable=False)
-    lyrics = db.Column(db.Text)
+    lyrics = db.Column(CompressedText)
     is_clean = db.Column(db.Boolean, nullable=False)
+    checked_at = db.Column(db.DateTime)  # NULL for rows from before it was tracked
+
+class LyricsJob(db.Model):
+    """Durable lyrics-check job, one per song (see Lyrics Check Job Queue)"""
+    id = db.Column(db.Integer, primary_key=True)
+    song_id = db.Column(db.Integer, db.ForeignKey('song.id'), unique=True, nullable=False)
+    priority = db.Column(db.Integer, nullable=False, default=5)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.Float, nullable=False, default=time.time)
+    locked_at = db.Column(db.Float)
+    locked_by = db.Column(db.String(64))
+    last_error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+    song = db.relationship('Song')
 
 class Vote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -98,176 +149,261 @@ class SongLike(db.Model):
 # Lyrics Cache System
 # ----------------------
 LYRICS_CACHE_FILE = 'lyrics_cache.json'
+LYRICS_DB_FILE = os.getenv('LYRICS_DB_FILE', 'lyrics_cache.db')
+LYRICS_STORE_BACKEND = os.getenv('LYRICS_STORE', 'sqlite')  # 'sqlite' or 'log'
+LYRICS_LOG_COMPACT_BYTES = int(os.getenv('LYRICS_LOG_COMPACT_BYTES', 1024 * 1024))
+LYRICS_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days
+# Misses are cached separately and retried on an exponential schedule
+LYRICS_NEGATIVE_TTL = int(os.getenv('LYRICS_NEGATIVE_TTL', 15 * 60))  # first retry after 15 minutes
+LYRICS_NEGATIVE_MAX_TTL = int(os.getenv('LYRICS_NEGATIVE_MAX_TTL', 24 * 60 * 60))
+
+lyrics_store = open_lyrics_store(
+    LYRICS_STORE_BACKEND, LYRICS_CACHE_FILE, LYRICS_DB_FILE,
+    compact_bytes=LYRICS_LOG_COMPACT_BYTES
+)
+
+# Process-wide in-memory layer in front of the lyrics store
+lyrics_memory_cache = LyricsMemoryCache(
+    max_entries=int(os.getenv('LYRICS_CACHE_MAX_ENTRIES', 2000)),
+    max_bytes=int(os.getenv('LYRICS_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    ttl=LYRICS_CACHE_TTL
+)
+_lyrics_store_version = {'value': None}
+lyrics_cache_stats = LyricsCacheStats()
+
+# Read-only snapshot shared by every worker through mmap; one process publishes it
+LYRICS_SNAPSHOT_FILE = os.getenv('LYRICS_SNAPSHOT_FILE', 'lyrics_snapshot.bin')
+LYRICS_SNAPSHOT_WRITER = os.getenv('LYRICS_SNAPSHOT_WRITER', '0') == '1'
+LYRICS_SNAPSHOT_INTERVAL = int(os.getenv('LYRICS_SNAPSHOT_INTERVAL', 10 * 60))
+lyrics_snapshot = LyricsSnapshot(LYRICS_SNAPSHOT_FILE)
+# Keys the store has written since the snapshot's write sequence, whose snapshot copy may be stale
+_lyrics_snapshot_state = {'seq': None, 'version': None, 'written': set()}
+
+# Concurrent fetches of the same song wait on one upstream lookup
+lyrics_fetches = SingleFlight()
+
+def sync_lyrics_memory_cache():
+    """Drop the memory cache when another process wrote to the store"""
+    version = lyrics_store.version()
+    if version != _lyrics_store_version['value']:
+        lyrics_memory_cache.clear()
+        _lyrics_store_version['value'] = version
+
+def get_lyrics_cache_entry(cache_key):
+    """Read-through lookup: memory, then the shared snapshot, then a point read from the store"""
+    sync_lyrics_memory_cache()
+    entry = lyrics_memory_cache.get(cache_key)
+    if entry is None:
+        entry = get_lyrics_snapshot_entry(cache_key)
+    if entry is None:
+        entry = lyrics_store.get(cache_key)
+        if entry and lyrics_memory_cache.is_fresh(entry):
+            lyrics_memory_cache.put(cache_key, entry)
+    return entry
+
+def get_lyrics_snapshot_entry(cache_key):
+    """The published snapshot's copy, unless the store has written this key since it was published
+
+    Snapshot hits are shared through the page cache, so they are not copied
+    into this worker's memory cache.
+    """
+    lyrics_snapshot.refresh()
+    seq = lyrics_snapshot.seq
+    if not seq:
+        return None
+    state = _lyrics_snapshot_state
+    # Other processes' writes change the store version; this process's own are added as they happen
+    if state['seq'] != seq or state['version'] != _lyrics_store_version['value']:
+        state['written'] = set(lyrics_store.keys_written_since(seq))
+        state['seq'], state['version'] = seq, _lyrics_store_version['value']
+    if cache_key in state['written']:
+        return None
+    entry = lyrics_snapshot.get(cache_key)
+    if entry and lyrics_memory_cache.is_fresh(entry):
+        return entry
+    return None
 
-def load_lyrics_cache():
-    """Load lyrics cache from file"""
-    try:
-        with open(LYRICS_CACHE_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_lyrics_cache(cache):
-    """Save lyrics cache to file"""
-    with open(LYRICS_CACHE_FILE, 'w') as f:
-        json.dump(cache, f)
+def put_lyrics_cache_entry(cache_key, entry):
+    """Write through to the store and this worker's memory cache"""
+    lyrics_store.put(cache_key, entry)
+    sync_lyrics_memory_cache()
+    lyrics_memory_cache.put(cache_key, entry)
+    _lyrics_snapshot_state['written'].add(cache_key)
+
+def find_lyrics_cache_entry(artist, title):
+    """Look a song up under its canonical key, falling back to the pre-normalization key"""
+    cache_key = song_cache_key(artist, title)
+    entry = get_lyrics_cache_entry(cache_key)
+    from_legacy_key = False
+    if entry is None:
+        old_key = legacy_cache_key(artist, title)
+        if old_key != cache_key:
+            entry = get_lyrics_cache_entry(old_key)
+            if entry is not None:
+                # Re-key so the next lookup is a single read
+                put_lyrics_cache_entry(cache_key, entry)
+                from_legacy_key = True
+    return cache_key, entry, from_legacy_key
 
 def get_cached_lyrics(artist, title):
     """Get lyrics from cache if available"""
-    cache = load_lyrics_cache()
-    cache_key = f"{artist.lower()}_{title.lower()}"
-    cached_data = cache.get(cache_key)
+    started = time.perf_counter()
+    cache_key, cached_data, from_legacy_key = find_lyrics_cache_entry(artist, title)
+    lyrics = None
     
-    if cached_data:
+    if cached_data and not cached_data.get('negative'):
+        # Older versions cached a placeholder message when every API missed
+        if cached_data.get('api_used') == 'Not Found':
+            cached_data = None
         # Check if cache is not too old (30 days)
-        if time.time() - cached_data.get('timestamp', 0) < 30 * 24 * 60 * 60:
-            return cached_data.get('lyrics')
+        elif lyrics_memory_cache.is_fresh(cached_data):
+            lyrics = unpack_lyrics(cached_data.get('lyrics'))
+
+    # A hit is "normalized" when the entry was cached under a different spelling
+    normalized_only = bool(
+        lyrics and not from_legacy_key and cached_data.get('artist') and cached_data.get('title')
+        and legacy_cache_key(cached_data['artist'], cached_data['title']) != legacy_cache_key(artist, title)
+    )
+    record_lookup(lyrics is not None, normalized_only=normalized_only, legacy=bool(lyrics and from_legacy_key))
+    if lyrics is not None:
+        outcome = 'hits'
+    elif cached_data and cached_data.get('negative') and lyrics_memory_cache.is_fresh(cached_data):
+        outcome = 'negative_hits'
+    else:
+        outcome = 'misses'
+    lyrics_cache_stats.record_lookup(outcome, time.perf_counter() - started)
+    return lyrics
+
+def get_lyrics_miss(artist, title):
+    """Return the negative cache entry if this song is still inside its retry backoff"""
+    _, cached_data, _ = find_lyrics_cache_entry(artist, title)
+    if cached_data and cached_data.get('negative') and lyrics_memory_cache.is_fresh(cached_data):
+        return cached_data
     return None
 
+def cache_lyrics_miss(artist, title):
+    """Record that every provider missed, doubling the retry delay on each repeat miss"""
+    cache_key, previous, _ = find_lyrics_cache_entry(artist, title)
+    attempts = previous.get('attempts', 0) + 1 if previous and previous.get('negative') else 1
+    delay = min(LYRICS_NEGATIVE_TTL * 2 ** (attempts - 1), LYRICS_NEGATIVE_MAX_TTL)
+    now = time.time()
+    entry = {
+        'lyrics': None,
+        'timestamp': now,
+        'api_used': None,
+        'artist': artist,
+        'title': title,
+        'negative': True,
+        'attempts': attempts,
+        'retry_at': now + delay
+    }
+    put_lyrics_cache_entry(cache_key, entry)
+    lyrics_cache_stats.record_fill(None, negative=True)
+    print(f"🕳️  Cached lyrics miss #{attempts}, next retry in {int(delay)}s")
+    return entry
+
 def cache_lyrics(artist, title, lyrics, api_used=None):
     """Cache lyrics for future use"""
     if not lyrics:
         return
         
-    cache = load_lyrics_cache()
-    cache_key = f"{artist.lower()}_{title.lower()}"
-    cache[cache_key] = {
-        'lyrics': lyrics,
+    cache_key = song_cache_key(artist, title)
+    entry = {
+        'lyrics': pack_lyrics(lyrics) if LYRICS_COMPRESSION else lyrics,
         'timestamp': time.time(),
-        'api_used': api_used
+        'api_used': api_used,
+        'artist': artist,
+        'title': title
     }
-    save_lyrics_cache(cache)
-
-# ----------------------
-# Lyrics API Testing & Selection
-# ----------------------
-def test_lyrics_apis(artist, title):
-    """Test all available lyrics APIs and return working ones"""
-    print(f"🔍 Testing lyrics APIs for: '{artist}' - '{title}'")
-    
-    clean_artist = urllib.parse.quote(artist.lower().strip())
-    clean_title = urllib.parse.quote(title.lower().strip())
-    
-    apis_to_test = [
-        # Most reliable APIs (tested)
-        {
-            'name': 'Lyrics.ovh',
-            'url': f"https://api.lyrics.ovh/v1/{clean_artist}/{clean_title}",
-            'parser': lambda data: data.get('lyrics', ''),
-            'method': 'GET'
-        },
-        {
-            'name': 'LRCLIB',
-            'url': f"https://lrclib.net/api/get?artist_name={clean_artist}&track_name={clean_title}",
-            'parser': lambda data: data.get('plainLyrics', ''),
-            'method': 'GET'
-        },
-        {
-            'name': 'Vanilla API',
-            'url': f"https://vanilla.works.gd/api/lyrics?artist={clean_artist}&song={clean_title}",
-            'parser': lambda data: data.get('lyrics', ''),
-            'method': 'GET'
-        },
-        {
-            'name': 'Some Random API',
-            'url': f"https://some-random-api.com/lyrics?title={clean_title}",
-            'parser': lambda data: data.get('lyrics', ''),
-            'method': 'GET'
-        },
-        # Fallback APIs
-        {
-            'name': 'Lyrist (Vercel)',
-            'url': f"https://lyrist.vercel.app/api/{clean_artist}/{clean_title}",
-            'parser': lambda data: data.get('lyrics', ''),
-            'method': 'GET'
-        },
-        {
-            'name': 'Genius Proxy',
-            'url': f"https://genius.com/api/search/song?q={clean_artist}%20{clean_title}",
-            'parser': lambda data: parse_genius_search(data, artist, title),
-            'method': 'GET'
-        }
-    ]
-    
-    working_apis = []
-    
-    for api in apis_to_test:
+    put_lyrics_cache_entry(cache_key, entry)
+    lyrics_cache_stats.record_fill(api_used)
+
+def publish_lyrics_snapshot():
+    """Write every positive cache entry to a new snapshot and swap it in atomically"""
+    # Read the sequence first: anything written while the entries are collected counts as newer
+    seq = lyrics_store.write_seq() or 0
+    count = write_snapshot(LYRICS_SNAPSHOT_FILE, publishable_entries(lyrics_store, LYRICS_CACHE_TTL), seq)
+    lyrics_snapshot.refresh(force=True)
+    print(f"📸 Published lyrics snapshot with {count} entries")
+    return count
+
+def _lyrics_snapshot_publisher():
+    while True:
         try:
-            print(f"🧪 Testing {api['name']}...")
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json'
-            }
-            
-            if api['method'] == 'GET':
-                response = requests.get(api['url'], timeout=8, headers=headers)
-            else:
-                response = requests.post(api['url'], timeout=8, headers=headers)
-            
-            print(f"   Status: {response.status_code}")
-            
-            if response.status_code == 200:
-                # Try to parse as JSON
-                try:
-                    data = response.json()
-                    lyrics = api['parser'](data)
-                    
-                    if lyrics and len(lyrics.strip()) > 50:
-                        print(f"   ✅ SUCCESS: Got {len(lyrics)} characters")
-                        working_apis.append({
-                            'name': api['name'],
-                            'url': api['url'],
-                            'parser': api['parser'],
-                            'response_time': response.elapsed.total_seconds(),
-                            'sample': lyrics[:100] + '...' if len(lyrics) > 100 else lyrics
-                        })
-                    else:
-                        print(f"   ⚠️  No lyrics found")
-                        
-                except ValueError as e:
-                    print(f"   ❌ JSON Parse Error: {e}")
-            else:
-                print(f"   ❌ HTTP Error: {response.status_code}")
-                
-        except requests.exceptions.Timeout:
-            print(f"   ⏰ Timeout")
-        except requests.exceptions.ConnectionError:
-            print(f"   🔌 Connection Error")
+            publish_lyrics_snapshot()
         except Exception as e:
-            print(f"   💥 Unexpected error: {str(e)}")
-    
-    # Sort by response time (fastest first)
-    working_apis.sort(key=lambda x: x.get('response_time', 10))
-    return working_apis
-
-def parse_genius_search(data, artist, title):
-    """Parse Genius API search results and try to get lyrics"""
-    try:
-        if data.get('response') and data['response'].get('sections'):
-            for section in data['response']['sections']:
-                if section.get('hits'):
-                    for hit in section['hits']:
-                        if hit.get('result'):
-                            result = hit['result']
-                            # Check if it's the right song
-                            if (result.get('artist_names', '').lower() == artist.lower() or 
-                                result.get('title', '').lower() == title.lower()):
-                                # For Genius, we'd need to scrape the actual lyrics page
-                                # This is a simplified version
-                                return "Lyrics available on Genius (full implementation needed)"
-        return ""
-    except:
-        return ""
-
+            print(f"❌ Lyrics snapshot publish failed: {e}")
+        eventlet.sleep(LYRICS_SNAPSHOT_INTERVAL)
 
 # ----------------------
 # Main Lyrics Function with Smart API Selection
 # ----------------------
 
-def get_lyrics(artist, title):
-    """Main lyrics function using the working fetcher"""
-    return get_lyrics_working(artist, title)
+# How providers are queried on a cache miss:
+#   sequential - one after another, the next only starts when the previous fails
+#   parallel   - all at once, first valid lyrics win
+#   hedged     - the next provider also starts if the current one hasn't answered in LYRICS_HEDGE_DELAY
+LYRICS_FETCH_MODE = os.getenv('LYRICS_FETCH_MODE', 'hedged')
+LYRICS_HEDGE_DELAY = float(os.getenv('LYRICS_HEDGE_DELAY', 1.5))
+LYRICS_FETCH_DEADLINE = float(os.getenv('LYRICS_FETCH_DEADLINE', 12))
+
+# Live success/latency per provider; decides the fetch order and skips providers that keep erroring
+provider_scoreboard = ProviderScoreboard(
+    failure_threshold=int(os.getenv('LYRICS_BREAKER_THRESHOLD', 3)),
+    cooldown=int(os.getenv('LYRICS_BREAKER_COOLDOWN', 60))
+)
+
+# The one place providers are queried: song requests, DJ refreshes, warm-up and /test-lyrics-apis
+lyrics_engine = LyricsEngine(
+    scoreboard=provider_scoreboard,
+    mode=LYRICS_FETCH_MODE,
+    hedge_delay=LYRICS_HEDGE_DELAY,
+    deadline=LYRICS_FETCH_DEADLINE
+)
+
+# ----------------------
+# Lyrics API Testing & Selection
+# ----------------------
+# /test-lyrics-apis serves a cached song x provider matrix; a background prober
+# re-checks one pair every LYRICS_PROBE_INTERVAL seconds so provider health
+# (and with it the fetch order) stays current between real requests.
+LYRICS_PROBE_SONGS = [
+    ("Ed Sheeran", "Shape of You"),
+    ("The Weeknd", "Blinding Lights"),
+    ("Queen", "Bohemian Rhapsody"),
+    ("Adele", "Hello"),
+    ("Taylor Swift", "Shake It Off")
+]
+LYRICS_PROBE_MAX_AGE = int(os.getenv('LYRICS_PROBE_MAX_AGE', 10 * 60))
+LYRICS_PROBE_INTERVAL = float(os.getenv('LYRICS_PROBE_INTERVAL', 30))
+LYRICS_PROBER = os.getenv('LYRICS_PROBER', '1') == '1'
+
+lyrics_prober = ProviderProber(
+    lyrics_engine,
+    LYRICS_PROBE_SONGS,
+    max_age=LYRICS_PROBE_MAX_AGE,
+    interval=LYRICS_PROBE_INTERVAL,
+    normalize=lambda artist, title: (query_artist(artist), query_title(title))
+)
+
+def track_signature(song):
+    """TrackSignature (album, duration, all artists) of a Song or a row with the same columns"""
+    return TrackSignature(
+        album=song.album,
+        duration=song.duration_ms / 1000.0 if song.duration_ms else None,
+        artists=json.loads(song.artists) if song.artists else [song.artist]
+    )
+
+def get_lyrics(artist, title, deadline=None, track=None):
+    """Smart lyrics fetching with caching and multiple fallbacks (bounded by an optional Deadline)
+
+    track, the song's TrackSignature, lets providers match the exact recording.
+    Returns None only for a confirmed miss; raises LyricsPending when there is
+    no verdict yet, so callers must not store one.
+    """
+    if track and track.artists:
+        # Spotify's first credited artist, rather than anything parsed out of a joined name
+        artist = track.artists[0]
     print(f"🎵 Getting lyrics for: {artist} - {title}")
     
     # Try cache first
@@ -276,106 +412,278 @@ def get_lyrics(artist, title):
         print(f"📦 Using cached lyrics")
         return cached_lyrics
     
-    clean_artist = urllib.parse.quote(artist.lower().strip())
-    clean_title = urllib.parse.quote(title.lower().strip())
-    
-    # Updated API priority list with working endpoints
-    apis_priority = [
-        # Most reliable - Lyrics.ovh
-        {
-            'name': 'Lyrics.ovh',
-            'url': f"https://api.lyrics.ovh/v1/{clean_artist}/{clean_title}",
-            'parser': lambda data: data.get('lyrics', ''),
-            'headers': {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        },
-        # Second option - LRCLIB
-        {
-            'name': 'LRCLIB', 
-            'url': f"https://lrclib.net/api/get?artist_name={clean_artist}&track_name={clean_title}",
-            'parser': lambda data: data.get('plainLyrics', ''),
-            'headers': {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        },
-        # Third option - AZLyrics scraper (fallback)
-        {
-            'name': 'AZLyrics Proxy',
-            'url': f"https://api.lyrics.ovh/v1/{clean_artist}/{clean_title}",
-            'parser': lambda data: data.get('lyrics', ''),
-            'headers': {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        }
-    ]
-    
-    best_lyrics = None
-    best_api = None
-    
-    for api in apis_priority:
-        try:
-            print(f"🔍 Trying {api['name']}...")
-            response = requests.get(api['url'], timeout=10, headers=api.get('headers', {}))
-            
-            if response.status_code == 200:
-                data = response.json()
-                lyrics = api['parser'](data)
-                
-                # Better validation for lyrics
-                if lyrics and len(lyrics.strip()) > 100:  # Require at least 100 characters
-                    print(f"✅ Success with {api['name']} - {len(lyrics)} characters")
-                    best_lyrics = lyrics
-                    best_api = api['name']
-                    break
-                else:
-                    print(f"⚠️  {api['name']} returned insufficient lyrics: {len(lyrics) if lyrics else 0} chars")
-            else:
-                print(f"❌ {api['name']} returned {response.status_code}")
-                
-        except Exception as e:
-            print(f"💥 {api['name']} failed: {str(e)}")
-            continue
+    if get_lyrics_miss(artist, title):
+        print(f"🕳️  Known miss, waiting for scheduled retry")
+        return None
+
+    # Guests requesting the same new song at once share a single upstream fetch
+    try:
+        return lyrics_fetches.do_within(
+            deadline.remaining() if deadline else None,
+            song_cache_key(artist, title), fetch_lyrics_from_apis, artist, title, deadline, track
+        )
+    except TimeoutError:
+        # Another caller's fetch is still running; it will cache the result
+        print(f"⏱️  Deadline reached waiting for an in-flight fetch")
+        raise LyricsPending(f"Lyrics fetch for {artist} - {title} still in flight")
+
+def fetch_lyrics_from_apis(artist, title, deadline=None, track=None):
+    """Ask the lyrics engine and cache the outcome (LyricsPending if it gave no verdict)"""
+    # Query providers with the primary artist and the title minus feat./remaster suffixes
+    artist, title = query_artist(artist), query_title(title)
+    best_lyrics, best_api, inconclusive = lyrics_engine.fetch(artist, title, deadline, track)
     
     # Cache the result
-    cache_lyrics(artist, title, best_lyrics, best_api)
-    
     if best_lyrics:
+        cache_lyrics(artist, title, best_lyrics, best_api)
         print(f"🎯 Returning lyrics from {best_api}")
-        return best_lyrics
+    elif inconclusive:
+        # Providers were still working, cooling down or rate limited, so this is not a confirmed miss
+        print(f"⏱️  No verdict (deadline or rate limit), not caching a miss")
+        raise LyricsPending(f"No lyrics verdict yet for {artist} - {title} (deadline or rate limit)")
     else:
+        cache_lyrics_miss(artist, title)
         print("😞 No lyrics found from any API")
-        # Return a helpful message instead of None
-        return f"Lyrics for '{title}' by {artist} are not available in our database.\n\nThis could be because:\n• The song is very new\n• It's a regional song not in international databases\n• The lyrics APIs are temporarily unavailable\n\nYou can manually check lyrics on music services or approve based on Spotify's explicit flag."
     
+    return best_lyrics
+
 # ----------------------
 # Content Checking
 # ----------------------
+LYRICS_FILTER_LEXICON_FILE = os.getenv('LYRICS_FILTER_LEXICON_FILE')
+
+def load_filter_lexicons():
+    """Per-language lexicons from LYRICS_FILTER_LEXICON_FILE (see as_lexicons), or the built-in ones"""
+    if LYRICS_FILTER_LEXICON_FILE and os.path.exists(LYRICS_FILTER_LEXICON_FILE):
+        with open(LYRICS_FILTER_LEXICON_FILE, 'r', encoding='utf-8') as f:
+            return as_lexicons(json.load(f))
+    return LEXICONS
+
+# Each language's matcher is compiled once; a song costs one language detection plus one pass
+lyrics_filter = MultilingualFilter(load_filter_lexicons())
+
+def find_inappropriate_content(lyrics):
+    """(detected language, every lexicon match in the lyrics with its offset and category)"""
+    return lyrics_filter.scan(lyrics)
+
 def check_lyrics_content(lyrics):
     """Check lyrics for inappropriate content"""
     if not lyrics:
         return True  # If we can't get lyrics, assume clean
     
-    # Convert to lowercase for case-insensitive matching
-    lyrics_lower = lyrics.lower()
+    language, matches = find_inappropriate_content(lyrics)
+    if matches:
+        found = sorted({f"{match.text.lower()} ({match.category})" for match in matches})
+        print(f"🚫 Found inappropriate words [{language or 'unknown language'}]: {', '.join(found)}")
+        return False
     
-    # List of inappropriate words/phrases
-    inappropriate_words = [
-        # Profanity
-        'fuck', 'shit', 'bitch', 'asshole', 'damn', 'hell',
-        # Sexual content
-        'sex', 'naked', 'fucking', 'dick', 'pussy', 'whore',
-        # Violence
-        'kill', 'murder', 'gun', 'shoot', 'stab',
-        # Drugs/alcohol
-        'drugs', 'cocaine', 'weed', 'alcohol', 'drunk'
-    ]
+    return True
+
+# LyricsCheck keeps an excerpt; the full lyrics live in the lyrics cache
+LYRICS_EXCERPT_CHARS = 1000
+# Lyrics a DJ types in are kept up to this length
+MANUAL_LYRICS_CHARS = 2000
+
+def save_lyrics_check(song_id, lyrics, is_clean):
+    """Create or update a song's LyricsCheck row (the caller commits)"""
+    lyrics_check = LyricsCheck.query.filter_by(song_id=song_id).first()
+    if lyrics_check:
+        lyrics_check.lyrics = lyrics[:LYRICS_EXCERPT_CHARS] if lyrics else None
+        lyrics_check.is_clean = is_clean
+        lyrics_check.checked_at = datetime.utcnow()
+    else:
+        lyrics_check = LyricsCheck(
+            song_id=song_id,
+            lyrics=lyrics[:LYRICS_EXCERPT_CHARS] if lyrics else None,
+            is_clean=is_clean,
+            checked_at=datetime.utcnow()
+        )
+        db.session.add(lyrics_check)
+    return lyrics_check
+
+# ----------------------
+# Lyrics Check Job Queue
+# ----------------------
+# Lyrics checks are rows in the lyrics_job table instead of one thread per
+# request, so they survive restarts, retry with backoff and run on a fixed
+# pool of green-thread workers. The web server starts them (see
+# start_background_services). Running them in a separate `python
+# lyrics_worker.py` process is opt-in (see its docstring), with
+# LYRICS_JOB_WORKERS_IN_WEB=0 on the web process. Claims are atomic, so both
+# may run at once.
+JOB_PRIORITY_DJ = 0
+JOB_PRIORITY_REQUEST = 5
+JOB_PRIORITY_BACKGROUND = 10
+
+LYRICS_JOB_WORKERS = int(os.getenv('LYRICS_JOB_WORKERS', 4))
+LYRICS_JOB_WORKERS_IN_WEB = os.getenv('LYRICS_JOB_WORKERS_IN_WEB', '1') == '1'
+LYRICS_JOB_MAX_ATTEMPTS = int(os.getenv('LYRICS_JOB_MAX_ATTEMPTS', 5))
+LYRICS_JOB_RETRY_DELAY = int(os.getenv('LYRICS_JOB_RETRY_DELAY', 30))  # doubles after every failure
+LYRICS_JOB_LEASE = int(os.getenv('LYRICS_JOB_LEASE', 5 * 60))  # running jobs older than this were orphaned
+LYRICS_JOB_POLL_INTERVAL = float(os.getenv('LYRICS_JOB_POLL_INTERVAL', 2))
+# Budget for one job run; a job that runs out without lyrics stays pending and is retried
+LYRICS_JOB_DEADLINE = float(os.getenv('LYRICS_JOB_DEADLINE', 30))
+
+_lyrics_job_wakeup = threading.Event()
+_lyrics_job_workers = []
+
+def enqueue_lyrics_check(song_id, priority=JOB_PRIORITY_REQUEST):
+    """Queue a lyrics check; a song already queued keeps one job at the more urgent priority"""
+    job = LyricsJob.query.filter_by(song_id=song_id).first()
+    if job:
+        job.priority = min(job.priority, priority)
+        if job.status in ('done', 'failed'):
+            job.status, job.attempts, job.last_error, job.run_at = 'queued', 0, None, time.time()
+    else:
+        job = LyricsJob(song_id=song_id, priority=priority, run_at=time.time())
+        db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request queued the same song first
+        db.session.rollback()
+        job = LyricsJob.query.filter_by(song_id=song_id).first()
+    _lyrics_job_wakeup.set()
+    return job
+
+def claim_lyrics_job(worker_id):
+    """Atomically take the most urgent due job (or one orphaned by a dead worker)"""
+    for _ in range(3):
+        now = time.time()
+        job = LyricsJob.query.filter(or_(
+            and_(LyricsJob.status == 'queued', LyricsJob.run_at <= now),
+            and_(LyricsJob.status == 'running', LyricsJob.locked_at < now - LYRICS_JOB_LEASE)
+        )).order_by(LyricsJob.priority, LyricsJob.run_at, LyricsJob.id).first()
+        if job is None:
+            return None
+        claimed = LyricsJob.query.filter_by(id=job.id, status=job.status, locked_at=job.locked_at).update({
+            'status': 'running',
+            'locked_at': now,
+            'locked_by': worker_id,
+            'attempts': LyricsJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(LyricsJob, job.id)
+    return None
+
+def process_lyrics_check(song_id, deadline=None):
+    """Fetch, filter and store a song's lyrics verdict, auto-rejecting pending requests if unclean"""
+    song = db.session.get(Song, song_id)
+    if not song:
+        return
+    # LyricsPending (out of time, providers throttled) is not "no lyrics": it propagates and the job retries
+    lyrics = get_lyrics(song.artist, song.title, deadline, track_signature(song))
+    is_clean = check_lyrics_content(lyrics) if lyrics else True
     
-    # Check for any inappropriate words
-    for word in inappropriate_words:
-        if word in lyrics_lower:
-            print(f"🚫 Found inappropriate word: {word}")
-            return False
+    # Update lyrics check
+    save_lyrics_check(song_id, lyrics, is_clean)
+    db.session.commit()
     
-    return True
+    # If lyrics are bad, auto-reject
+    if not is_clean:
+        reject_flagged_requests(song_id)
+
+def reject_flagged_requests(song_id):
+    """Auto-reject a flagged song's pending requests and tell connected clients; returns how many"""
+    rejected = Request.query.filter_by(song_id=song_id, status='Pending').all()
+    if not rejected:
+        return 0
+    for request_obj in rejected:
+        request_obj.status = 'Rejected'
+    db.session.commit()
+    for request_obj in rejected:
+        socketio.emit('request_rejected', {
+            'request_id': request_obj.id,
+            'song_title': request_obj.song.title,
+            'reason': 'Inappropriate lyrics detected'
+        })
+    return len(rejected)
+
+def run_lyrics_job(job):
+    """Run a claimed job and record done, a scheduled retry, or failure"""
+    job_id, song_id = job.id, job.song_id
+    try:
+        process_lyrics_check(song_id, Deadline(LYRICS_JOB_DEADLINE, 'lyrics job'))
+        error = None
+    except Exception as e:
+        db.session.rollback()
+        error = str(e)[:500]
+        print(f"❌ Lyrics job for song {song_id} failed: {error}")
+    
+    job = db.session.get(LyricsJob, job_id)
+    if job is None:
+        return
+    job.locked_at, job.locked_by, job.last_error = None, None, error
+    if error is None:
+        job.status = 'done'
+    elif job.attempts >= LYRICS_JOB_MAX_ATTEMPTS:
+        job.status = 'failed'
+    else:
+        job.status = 'queued'
+        job.run_at = time.time() + LYRICS_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+    db.session.commit()
+
+def lyrics_job_worker(worker_id):
+    """Worker loop: claim and run jobs, idling until woken or the next poll"""
+    while True:
+        job = None
+        try:
+            with app.app_context():
+                job = claim_lyrics_job(worker_id)
+                if job:
+                    run_lyrics_job(job)
+        except Exception as e:
+            print(f"❌ Lyrics job worker {worker_id} error: {e}")
+        if job is None:
+            _lyrics_job_wakeup.wait(LYRICS_JOB_POLL_INTERVAL)
+            _lyrics_job_wakeup.clear()
+
+def start_lyrics_job_workers(count=LYRICS_JOB_WORKERS):
+    """Spawn the fixed pool of green-thread workers for this process"""
+    spawned = []
+    for i in range(count):
+        worker_id = f"{os.getpid()}-{len(_lyrics_job_workers)}"
+        spawned.append(eventlet.spawn(lyrics_job_worker, worker_id))
+        _lyrics_job_workers.append(spawned[-1])
+    print(f"🧵 Started {count} lyrics job workers")
+    return spawned
+
+def lyrics_job_status(limit=20):
+    """Queue counts plus the next and the failed jobs"""
+    counts = dict(db.session.query(LyricsJob.status, func.count(LyricsJob.id)).group_by(LyricsJob.status).all())
+
+    def describe(job):
+        return {
+            'job_id': job.id,
+            'song_id': job.song_id,
+            'song_title': job.song.title if job.song else None,
+            'priority': job.priority,
+            'status': job.status,
+            'attempts': job.attempts,
+            'run_at': job.run_at,
+            'locked_by': job.locked_by,
+            'last_error': job.last_error
+        }
+
+    upcoming = LyricsJob.query.filter(LyricsJob.status.in_(('queued', 'running'))) \
+        .order_by(LyricsJob.priority, LyricsJob.run_at, LyricsJob.id).limit(limit).all()
+    failed = LyricsJob.query.filter_by(status='failed').order_by(LyricsJob.updated_at.desc()).limit(limit).all()
+    return {
+        'counts': {status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')},
+        'workers_in_process': len(_lyrics_job_workers),
+        'upcoming': [describe(job) for job in upcoming],
+        'failed': [describe(job) for job in failed]
+    }
 
 # ----------------------
 # Spotify API Integration
 # ----------------------
+# Total budget for admitting a song request; Spotify calls get what is left of it
+SONG_REQUEST_DEADLINE = float(os.getenv('SONG_REQUEST_DEADLINE', 8))
+# Guest searches and the OAuth callback make one or two quick Spotify calls
+SPOTIFY_CALL_DEADLINE = float(os.getenv('SPOTIFY_CALL_DEADLINE', 5))
+
 def search_spotify(query):
     token = session.get('spotify_token')
     if not token:
@@ -384,27 +692,38 @@ def search_spotify(query):
     url = f'{SPOTIFY_API_URL}/search'
     headers = {"Authorization": f"Bearer {token}"}
     params = {"q": query, "type": "track", "limit": 5}
-    response = requests.get(url, headers=headers, params=params)
+    response = http_client.get(url, headers=headers, params=params)
     return response.json()
 
-def get_track_details(track_id):
-    """Get detailed track information from Spotify"""
+def get_track_details(track_id, deadline=None):
+    """Get detailed track information from Spotify (within an optional Deadline)"""
     token = session.get('spotify_token')
     if not token:
         return None
 
     url = f'{SPOTIFY_API_URL}/tracks/{track_id}'
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(url, headers=headers)
+    timeout = http_client.client.timeout
+    if deadline is not None:
+        connect_timeout, read_timeout = timeout
+        timeout = (deadline.timeout(connect_timeout, 'Spotify track lookup'), deadline.timeout(read_timeout))
+    try:
+        response = http_client.get(url, headers=headers, timeout=timeout, deadline=deadline)
+    except http_client.Timeout:
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded(f"Spotify track lookup did not finish within the {deadline.label} deadline")
+        raise
     
     if response.status_code == 200:
         return response.json()
     return None
 
 # helper: get app access token (client credentials)
-def get_app_spotify_token():
-    # opcional: cache token in memory with expiration
-    token_info = session.get('app_spotify_token_info')
+_app_spotify_token_info = {}
+
+def get_app_spotify_token(deadline=None):
+    # Cached in memory with expiration so background jobs can use it outside a request
+    token_info = _app_spotify_token_info
     if token_info and token_info.get('expires_at', 0) > time.time():
         return token_info['access_token']
     data = {
@@ -412,14 +731,28 @@ def get_app_spotify_token():
     }
     auth_header = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
     headers = {"Authorization": f"Basic {auth_header}"}
-    resp = requests.post(SPOTIFY_TOKEN_URL, data=data, headers=headers)
+    resp = http_client.post(SPOTIFY_TOKEN_URL, data=data, headers=headers, deadline=deadline)
     info = resp.json()
     if resp.status_code == 200 and 'access_token' in info:
         info['expires_at'] = time.time() + info.get('expires_in', 3600) - 10
-        session['app_spotify_token_info'] = info
+        _app_spotify_token_info.clear()
+        _app_spotify_token_info.update(info)
         return info['access_token']
     return None
 
+def song_from_track(track_data):
+    """Build a (not yet added) Song from a Spotify track object"""
+    return Song(
+        spotify_id=track_data['id'],
+        title=track_data['name'],
+        artist=track_data['artists'][0]['name'] if track_data['artists'] else 'Unknown',
+        artists=json.dumps([artist['name'] for artist in track_data['artists']]),
+        album=track_data['album']['name'],
+        explicit=track_data['explicit'],
+        duration_ms=track_data['duration_ms'],
+        image_url=track_data['album']['images'][0]['url'] if track_data['album']['images'] else None
+    )
+
 # ----------------------
 # Error Handling Utilities
 # ----------------------
@@ -431,6 +764,12 @@ def handle_api_error(message, status=500):
     """Standard error response for API endpoints"""
     return json_response({'error': message}, status)
 
+def rate_limited_error(error):
+    """429 telling the client when our own Spotify rate limit frees up"""
+    response, status = handle_api_error("Spotify is busy right now, please try again shortly", 429)
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response, status
+
 def require_spotify_auth():
     """Decorator to require Spotify authentication"""
     def decorator(f):
@@ -492,7 +831,12 @@ def callback():
         "Content-Type": "application/x-www-form-urlencoded"
     }
 
-    response = requests.post(SPOTIFY_TOKEN_URL, data=data, headers=headers)
+    try:
+        response = http_client.post(
+            SPOTIFY_TOKEN_URL, data=data, headers=headers, deadline=Deadline(SPOTIFY_CALL_DEADLINE, 'Spotify login')
+        )
+    except http_client.RateLimited as e:
+        return rate_limited_error(e)
     token_info = response.json()
 
     if 'access_token' in token_info:
@@ -541,6 +885,8 @@ def search_song():
         
         return handle_api_error("No tracks found", 404)
         
+    except http_client.RateLimited as e:
+        return rate_limited_error(e)
     except Exception as e:
         print(f"ERROR in /search: {str(e)}")
         return handle_api_error(f"Search failed: {str(e)}", 500)
@@ -548,6 +894,7 @@ def search_song():
 @app.route('/request-song', methods=['POST'])
 def request_song():
     """Submit a song request"""
+    deadline = Deadline(SONG_REQUEST_DEADLINE, 'song request')
     try:
         # Check authentication first
         token = session.get('spotify_token')
@@ -571,66 +918,19 @@ def request_song():
         
         if not song:
             # Fetch song details from Spotify
-            track_data = get_track_details(spotify_id)
+            track_data = get_track_details(spotify_id, deadline)
             if not track_data:
                 return jsonify({"error": "Could not fetch song details from Spotify"}), 400
             
             # Create new song record
-            song = Song(
-                spotify_id=track_data['id'],
-                title=track_data['name'],
-                artist=track_data['artists'][0]['name'] if track_data['artists'] else 'Unknown',
-                album=track_data['album']['name'],
-                explicit=track_data['explicit'],
-                duration_ms=track_data['duration_ms'],
-                image_url=track_data['album']['images'][0]['url'] if track_data['album']['images'] else None
-            )
+            deadline.check('saving the song')
+            song = song_from_track(track_data)
             db.session.add(song)
             db.session.commit()
 
-            # Check lyrics asynchronously
-            def check_lyrics_async(song_id, artist, title):
-                with app.app_context():
-                    try:
-                        lyrics = get_lyrics(artist, title)
-                        is_clean = check_lyrics_content(lyrics) if lyrics else True
+            # Check lyrics in the background job queue
+            enqueue_lyrics_check(song.id, JOB_PRIORITY_REQUEST)
                         
-                        # Update lyrics check
-                        lyrics_check = LyricsCheck.query.filter_by(song_id=song_id).first()
-                        if lyrics_check:
-                            lyrics_check.lyrics = lyrics[:1000] if lyrics else None
-                            lyrics_check.is_clean = is_clean
-                        else:
-                            lyrics_check = LyricsCheck(
-                                song_id=song_id,
-                                lyrics=lyrics[:1000] if lyrics else None,
-                                is_clean=is_clean
-                            )
-                            db.session.add(lyrics_check)
-                        
-                        db.session.commit()
-                        
-                        # If lyrics are bad, auto-reject
-                        if not is_clean:
-                            request_obj = Request.query.filter_by(song_id=song_id, status='Pending').first()
-                            if request_obj:
-                                request_obj.status = 'Rejected'
-                                db.session.commit()
-                                socketio.emit('request_rejected', {
-                                    'request_id': request_obj.id,
-                                    'song_title': request_obj.song.title,
-                                    'reason': 'Inappropriate lyrics detected'
-                                })
-                    
-                    except Exception as e:
-                        print(f"DEBUG: Async lyrics check failed: {str(e)}")
-
-            # Start async lyrics check
-            import threading
-            thread = threading.Thread(target=check_lyrics_async, args=(song.id, song.artist, song.title))
-            thread.daemon = True
-            thread.start()
-
         # Use a default user
         temp_user = User.query.filter_by(username='guest').first()
         if not temp_user:
@@ -664,6 +964,7 @@ def request_song():
             }), 400
 
         # Create request record
+        deadline.check('saving the request')
         new_request = Request(
             user_id=temp_user.id, 
             song_id=song.id, 
@@ -679,15 +980,30 @@ def request_song():
             'explicit': song.explicit
         })
 
+        # Known songs already have a verdict; new ones are checked by a lyrics job
+        verdict = db.session.query(LyricsCheck.is_clean).filter_by(song_id=song.id).first()
+        if verdict is None:
+            lyrics_status = 'pending'
+        else:
+            lyrics_status = 'clean' if verdict.is_clean else 'flagged'
+
         return jsonify({
             "message": "Song request submitted successfully!",
             "request_id": new_request.id,
             "song_title": song.title,
             "artist": song.artist,
             "explicit": song.explicit,
-            "lyrics_checked": False  # Will be checked async
+            "lyrics_checked": verdict is not None,
+            "lyrics_status": lyrics_status
         })
 
+    except DeadlineExceeded as e:
+        db.session.rollback()
+        print(f"⏱️  {str(e)}")
+        return handle_api_error("Request took too long, please try again", 504)
+    except http_client.RateLimited as e:
+        db.session.rollback()
+        return rate_limited_error(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Failed to submit request: {str(e)}"}), 500
@@ -697,113 +1013,12 @@ def request_song():
 # ----------------------
 @app.route('/test-lyrics-apis')
 def test_lyrics_apis_route():
-    """Test all lyrics APIs with popular songs"""
-    test_songs = [
-        {"artist": "Ed Sheeran", "title": "Shape of You"},
-        {"artist": "The Weeknd", "title": "Blinding Lights"},
-        {"artist": "Queen", "title": "Bohemian Rhapsody"},
-        {"artist": "Adele", "title": "Hello"},
-        {"artist": "Taylor Swift", "title": "Shake It Off"}
-    ]
-    
-    results = {}
-    
-    for song in test_songs:
-        artist = song["artist"]
-        title = song["title"]
-        print(f"\n🎵 Testing: {artist} - {title}")
-        print("=" * 50)
-        
-        working_apis = test_lyrics_apis(artist, title)
-        
-        # Convert to JSON-serializable format
-        serializable_apis = []
-        for api in working_apis:
-            serializable_apis.append({
-                'name': api['name'],
-                'url': api['url'],
-                'response_time': api.get('response_time', 0),
-                'sample': api.get('sample', '')[:100] + '...' if api.get('sample') and len(api.get('sample', '')) > 100 else api.get('sample', '')
-            })
-        
-        results[f"{artist} - {title}"] = {
-            'working_apis': serializable_apis,
-            'working_count': len(working_apis)
-        }
-    
-    return jsonify(results)
+    """Test all lyrics APIs with popular songs
 
-def get_lyrics(artist, title):
-    """Smart lyrics fetching with caching and multiple fallbacks"""
-    print(f"🎵 Getting lyrics for: {artist} - {title}")
-    
-    # Try cache first
-    cached_lyrics = get_cached_lyrics(artist, title)
-    if cached_lyrics:
-        print(f"📦 Using cached lyrics")
-        return cached_lyrics
-    
-    clean_artist = urllib.parse.quote(artist.lower().strip())
-    clean_title = urllib.parse.quote(title.lower().strip())
-    
-    # Updated priority list based on test results
-    apis_priority = [
-        # Most reliable based on testing
-        {
-            'name': 'Lyrics.ovh',
-            'url': f"https://api.lyrics.ovh/v1/{clean_artist}/{clean_title}",
-            'parser': lambda data: data.get('lyrics', '')
-        },
-        {
-            'name': 'LRCLIB',
-            'url': f"https://lrclib.net/api/get?artist_name={clean_artist}&track_name={clean_title}",
-            'parser': lambda data: data.get('plainLyrics', '')
-        },
-        # Fallback - Genius provides limited lyrics but works consistently
-        {
-            'name': 'Genius Proxy',
-            'url': f"https://genius.com/api/search/song?q={clean_artist}%20{clean_title}",
-            'parser': lambda data: parse_genius_lyrics(data, artist, title)
-        }
-    ]
-    
-    best_lyrics = None
-    best_api = None
-    
-    for api in apis_priority:
-        try:
-            print(f"🔍 Trying {api['name']}...")
-            response = requests.get(api['url'], timeout=10, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            })
-            
-            if response.status_code == 200:
-                data = response.json()
-                lyrics = api['parser'](data)
-                
-                if lyrics and len(lyrics.strip()) > 50:
-                    print(f"✅ Success with {api['name']} - {len(lyrics)} characters")
-                    best_lyrics = lyrics
-                    best_api = api['name']
-                    break  # Stop at first successful API
-                else:
-                    print(f"⚠️  {api['name']} returned insufficient lyrics")
-            else:
-                print(f"❌ {api['name']} returned {response.status_code}")
-                
-        except Exception as e:
-            print(f"💥 {api['name']} failed: {str(e)}")
-            continue
-    
-    # Cache the result
-    cache_lyrics(artist, title, best_lyrics, best_api)
-    
-    if best_lyrics:
-        print(f"🎯 Returning lyrics from {best_api}")
-    else:
-        print("😞 No lyrics found from any API")
-    
-    return best_lyrics
+    Served from the cached probe matrix; ?refresh=1 waits for a fresh run.
+    """
+    refresh = request.args.get('refresh') in ('1', 'true', 'yes')
+    return jsonify(lyrics_prober.matrix(refresh=refresh))
 
 @app.route('/dj/manual-lyrics/<int:song_id>', methods=['POST'])
 def manual_lyrics_input(song_id):
@@ -818,13 +1033,15 @@ def manual_lyrics_input(song_id):
         # Update or create lyrics check
         lyrics_check = LyricsCheck.query.filter_by(song_id=song_id).first()
         if lyrics_check:
-            lyrics_check.lyrics = lyrics_text[:2000]  # Limit length
+            lyrics_check.lyrics = lyrics_text[:MANUAL_LYRICS_CHARS]
             lyrics_check.is_clean = check_lyrics_content(lyrics_text)
+            lyrics_check.checked_at = datetime.utcnow()
         else:
             lyrics_check = LyricsCheck(
                 song_id=song_id,
-                lyrics=lyrics_text[:2000],
-                is_clean=check_lyrics_content(lyrics_text)
+                lyrics=lyrics_text[:MANUAL_LYRICS_CHARS],
+                is_clean=check_lyrics_content(lyrics_text),
+                checked_at=datetime.utcnow()
             )
             db.session.add(lyrics_check)
         
@@ -839,196 +1056,101 @@ def manual_lyrics_input(song_id):
         db.session.rollback()
         return jsonify({"error": f"Failed to add lyrics: {str(e)}"}), 500
 
-def parse_genius_lyrics(data, artist, title):
-    """Better Genius lyrics parser"""
-    try:
-        if data.get('response') and data['response'].get('sections'):
-            for section in data['response']['sections']:
-                if section.get('hits'):
-                    for hit in section['hits']:
-                        if hit.get('result'):
-                            result = hit['result']
-                            # Check if it's the right song
-                            match_score = 0
-                            if result.get('artist_names', '').lower() == artist.lower():
-                                match_score += 2
-                            if result.get('title', '').lower() == title.lower():
-                                match_score += 1
-                            
-                            if match_score >= 1:  # At least partial match
-                                # For now, return a message since we can't easily get full lyrics
-                                return f"Lyrics available on Genius for '{result.get('title', '')}' by {result.get('artist_names', '')}"
-        return ""
-    except:
-        return ""
-
 @app.route('/lyrics-cache-info')
 def lyrics_cache_info():
-    """Get info about cached lyrics"""
-    cache = load_lyrics_cache()
+    """Get info about cached lyrics
+
+    Query params: page, per_page (max 200), provider, q (substring of the
+    cache key) and negative=1/0 filter the listed entries.
+    """
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(200, max(1, request.args.get('per_page', 10, type=int)))
+    negative = request.args.get('negative')
+    filters = {
+        'provider': request.args.get('provider') or None,
+        'query': request.args.get('q') or None,
+        'negative': None if negative is None else negative in ('1', 'true', 'yes')
+    }
+
+    entries = lyrics_store.list_entries(offset=(page - 1) * per_page, limit=per_page, **filters)
+    stats = lyrics_cache_stats.snapshot()
+    stats['evictions'] = lyrics_memory_cache.evictions
     return jsonify({
-        "cached_songs_count": len(cache),
-        "cached_songs": list(cache.keys())[:10]  # First 10
+        "cached_songs_count": lyrics_store.count(),
+        "cached_songs": [entry['key'] for entry in entries],
+        "entries": entries,
+        "page": page,
+        "per_page": per_page,
+        "matching_count": lyrics_store.count(**filters),
+        "stats": stats,
+        "entries_by_provider": lyrics_store.provider_counts(),
+        "memory_cache": {
+            "entries": len(lyrics_memory_cache),
+            "bytes_used": lyrics_memory_cache.bytes_used,
+            "max_entries": lyrics_memory_cache.max_entries,
+            "max_bytes": lyrics_memory_cache.max_bytes
+        },
+        "store": {
+            "backend": LYRICS_STORE_BACKEND,
+            "bytes_used": lyrics_store.storage_bytes()
+        },
+        "snapshot": {
+            "file": LYRICS_SNAPSHOT_FILE,
+            "entries": len(lyrics_snapshot),
+            "seq": lyrics_snapshot.seq,
+            "writer": LYRICS_SNAPSHOT_WRITER
+        },
+        "single_flight": lyrics_fetches.stats(),
+        "compression": compression_stats(),
+        "hit_rate": hit_rate_report()
     })
 
+@app.route('/dj/publish-lyrics-snapshot', methods=['POST'])
+def publish_lyrics_snapshot_route():
+    """Publish a fresh shared lyrics snapshot for all workers"""
+    try:
+        count = publish_lyrics_snapshot()
+        return jsonify({"message": "Lyrics snapshot published", "entries": count})
+    except Exception as e:
+        return jsonify({"error": f"Failed to publish snapshot: {str(e)}"}), 500
+
 @app.route('/lyrics-summary')
 def lyrics_summary():
-    """Show which APIs are working best"""
+    """Show which APIs are working best, from live fetch and test statistics"""
+    board = provider_scoreboard.snapshot()
+    ranked = sorted(board.items(), key=lambda item: item[1]['expected_time_ms'])
+    reliable = [dict(stats, name=name) for name, stats in ranked if stats['circuit'] != 'open']
+    unreliable = [
+        f"{name} - {stats['last_error'] or 'errors'}, retry in {stats['retry_in']}s"
+        for name, stats in ranked if stats['circuit'] == 'open'
+    ]
     return jsonify({
-        "reliable_apis": [
-            {
-                "name": "Lyrics.ovh",
-                "status": "✅ Working",
-                "description": "Most reliable, good coverage"
-            },
-            {
-                "name": "LRCLIB", 
-                "status": "✅ Working (some songs)",
-                "description": "Good when available"
-            },
-            {
-                "name": "Genius Proxy",
-                "status": "✅ Working (limited)",
-                "description": "Always works but limited lyrics"
-            }
-        ],
-        "unreliable_apis": [
-            "Vanilla API - Connection issues",
-            "Some Random API - 403 Forbidden", 
-            "Lyrist (Vercel) - Rate limited"
-        ],
-        "recommendation": "Use Lyrics.ovh as primary, LRCLIB as fallback"
+        "reliable_apis": reliable,
+        "unreliable_apis": unreliable,
+        "recommendation": (
+            "Current order: " + " → ".join(p['name'] for p in reliable)
+            if reliable else "No provider statistics yet, run /test-lyrics-apis"
+        ),
+        "prober": lyrics_prober.stats()
     })
 
 @app.route('/quick-test/<artist>/<title>')
 def quick_test(artist, title):
     """Quick test of lyrics for a specific song"""
-    lyrics = get_lyrics(artist, title)
+    try:
+        lyrics, pending = get_lyrics(artist, title), False
+    except LyricsPending:
+        lyrics, pending = None, True
     
     return jsonify({
         "artist": artist,
         "title": title,
         "lyrics_found": lyrics is not None,
+        "pending": pending,
         "lyrics_length": len(lyrics) if lyrics else 0,
         "preview": lyrics[:200] + "..." if lyrics and len(lyrics) > 200 else lyrics
     })
 
-# ----------------------
-# Working Lyrics Scraper
-# ----------------------
-def scrape_lyrics_direct(artist, title):
-    """Direct lyrics scraping as fallback"""
-    try:
-        # Clean the artist and title for URL
-        clean_artist = artist.lower().replace(' ', '-').replace('&', 'and')
-        clean_title = title.lower().replace(' ', '-')
-        
-        # Try AZLyrics style URL
-        url = f"https://www.azlyrics.com/lyrics/{clean_artist}/{clean_title}.html"
-        
-        print(f"🔍 Trying direct scrape from: {url}")
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            # Simple HTML parsing to extract lyrics
-            import re
-            # Look for lyrics between specific div tags (AZLyrics structure)
-            lyrics_match = re.search(r'<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited by our licensing agreement\. Sorry\. -->(.*?)</div>', response.text, re.DOTALL)
-            
-            if lyrics_match:
-                lyrics = lyrics_match.group(1).strip()
-                # Clean up the lyrics
-                lyrics = re.sub(r'<br>', '\n', lyrics)
-                lyrics = re.sub(r'<.*?>', '', lyrics)
-                lyrics = re.sub(r'\n\s*\n', '\n\n', lyrics)  # Remove extra blank lines
-                
-                if len(lyrics) > 100:
-                    print(f"✅ Successfully scraped {len(lyrics)} characters")
-                    return lyrics
-        
-        return None
-    except Exception as e:
-        print(f"❌ Direct scrape failed: {e}")
-        return None
-
-def get_lyrics_working(artist, title):
-    """Working lyrics fetcher with multiple fallbacks"""
-    print(f"🎵 Getting lyrics for: {artist} - {title}")
-    
-    # Try cache first
-    cached_lyrics = get_cached_lyrics(artist, title)
-    if cached_lyrics and len(cached_lyrics.strip()) > 100:
-        print(f"📦 Using cached lyrics")
-        return cached_lyrics
-    
-    # Priority 1: Lyrics.ovh (most reliable)
-    try:
-        clean_artist = urllib.parse.quote(artist)
-        clean_title = urllib.parse.quote(title)
-        url = f"https://api.lyrics.ovh/v1/{clean_artist}/{clean_title}"
-        
-        print(f"🔍 Trying Lyrics.ovh...")
-        response = requests.get(url, timeout=8, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        
-        if response.status_code == 200:
-            data = response.json()
-            lyrics = data.get('lyrics', '')
-            if lyrics and len(lyrics.strip()) > 100:
-                print(f"✅ Lyrics.ovh success: {len(lyrics)} characters")
-                cache_lyrics(artist, title, lyrics, 'Lyrics.ovh')
-                return lyrics
-    except Exception as e:
-        print(f"❌ Lyrics.ovh failed: {e}")
-    
-    # Priority 2: LRCLIB
-    try:
-        url = f"https://lrclib.net/api/get?artist_name={urllib.parse.quote(artist)}&track_name={urllib.parse.quote(title)}"
-        print(f"🔍 Trying LRCLIB...")
-        response = requests.get(url, timeout=8)
-        
-        if response.status_code == 200:
-            data = response.json()
-            lyrics = data.get('plainLyrics', '')
-            if lyrics and len(lyrics.strip()) > 100:
-                print(f"✅ LRCLIB success: {len(lyrics)} characters")
-                cache_lyrics(artist, title, lyrics, 'LRCLIB')
-                return lyrics
-    except Exception as e:
-        print(f"❌ LRCLIB failed: {e}")
-    
-    # Priority 3: Direct scraping as last resort
-    print(f"🔍 Trying direct scraping...")
-    lyrics = scrape_lyrics_direct(artist, title)
-    if lyrics:
-        cache_lyrics(artist, title, lyrics, 'Direct Scrape')
-        return lyrics
-    
-    # Final fallback - return a helpful message
-    fallback_msg = f"""We couldn't find lyrics for "{title}" by {artist} in our databases.
-                        This is common for:
-                        • Newly released songs
-                        • Lesser-known artists  
-                        • Regional or non-English songs
-                        • Songs with limited online presence
-
-                        What you can do:
-                        1. Check Spotify or YouTube Music for lyrics
-                        2. Search manually on lyrics websites
-                        3. Use your judgment based on the artist and song title
-                        4. The Spotify explicit flag is still reliable for content filtering
-
-                        If you believe this song should have lyrics available, try the "Refresh Lyrics" button to search again."""
-    
-    cache_lyrics(artist, title, fallback_msg, 'Not Found')
-    return fallback_msg
-
 # ----------------------
 # Existing Routes (Updated)
 # ----------------------
@@ -1247,42 +1369,160 @@ def get_lyrics_for_song(song_id):
 
 @app.route('/dj/refresh-lyrics/<int:song_id>', methods=['POST'])
 def refresh_lyrics(song_id):
-    """Manually refresh lyrics for a song"""
+    """Manually refresh lyrics for a song (body {"queue": true} queues it ahead of other jobs instead)"""
     try:
         song = Song.query.get(song_id)
         if not song:
             return jsonify({"error": "Song not found"}), 404
         
+        if (request.get_json(silent=True) or {}).get('queue'):
+            job = enqueue_lyrics_check(song_id, JOB_PRIORITY_DJ)
+            return jsonify({"message": "Lyrics check queued", "job_id": job.id, "status": job.status}), 202
+        
         print(f"DEBUG: Manually refreshing lyrics for {song.title}")
-        lyrics = get_lyrics(song.artist, song.title)
+        try:
+            lyrics = get_lyrics(song.artist, song.title, track=track_signature(song))
+        except LyricsPending as e:
+            # Keep the verdict we have and let a job retry once the providers are back
+            job = enqueue_lyrics_check(song_id, JOB_PRIORITY_DJ)
+            return jsonify({"message": "No lyrics verdict yet, check queued", "reason": str(e),
+                            "job_id": job.id, "status": "pending"}), 202
+        miss = get_lyrics_miss(song.artist, song.title) if not lyrics else None
         is_clean = check_lyrics_content(lyrics) if lyrics else True
         
         # Update or create lyrics check
-        lyrics_check = LyricsCheck.query.filter_by(song_id=song_id).first()
-        if lyrics_check:
-            lyrics_check.lyrics = lyrics[:1000] if lyrics else None
-            lyrics_check.is_clean = is_clean
-        else:
-            lyrics_check = LyricsCheck(
-                song_id=song_id,
-                lyrics=lyrics[:1000] if lyrics else None,
-                is_clean=is_clean
-            )
-            db.session.add(lyrics_check)
-        
+        save_lyrics_check(song_id, lyrics, is_clean)
         db.session.commit()
         
         return jsonify({
             "message": "Lyrics refreshed successfully",
             "lyrics_available": lyrics is not None,
             "is_clean": is_clean,
-            "song_title": song.title
+            "song_title": song.title,
+            "next_retry_at": miss['retry_at'] if miss else None
         })
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Failed to refresh lyrics: {str(e)}"}), 500
 
+@app.route('/dj/lyrics-jobs', methods=['GET', 'POST'])
+def lyrics_jobs():
+    """Lyrics job queue status; POST {"song_ids": [...]} queues checks at DJ priority"""
+    if request.method == 'POST':
+        song_ids = (request.get_json(silent=True) or {}).get('song_ids') or []
+        if not song_ids:
+            return jsonify({"error": "song_ids required"}), 400
+        jobs = [enqueue_lyrics_check(int(song_id), JOB_PRIORITY_DJ) for song_id in song_ids]
+        return jsonify({"message": f"Queued {len(jobs)} lyrics checks", "job_ids": [job.id for job in jobs]}), 202
+    return jsonify(lyrics_job_status(limit=request.args.get('limit', 20, type=int)))
+
+@app.route('/dj/backfill-lyrics', methods=['GET', 'POST'])
+def backfill_lyrics_route():
+    """Bring every song's lyrics verdict up to date
+
+    GET counts the songs that need a check; POST runs the backfill and streams
+    progress as newline-delimited JSON. Options (query or JSON body):
+    concurrency, batch_size, max_age_days, include_no_lyrics, limit.
+    """
+    from backfill import run_backfill, count_songs_needing_check, backfill_lock, BACKFILL_CONCURRENCY, BACKFILL_BATCH_SIZE, BACKFILL_MAX_AGE_DAYS
+
+    options = dict(request.args)
+    options.update(request.get_json(silent=True) or {})
+    max_age_days = float(options.get('max_age_days', BACKFILL_MAX_AGE_DAYS))
+    include_no_lyrics = str(options.get('include_no_lyrics', '')).lower() in ('1', 'true', 'yes')
+
+    if request.method == 'GET':
+        return jsonify({
+            "songs_needing_check": count_songs_needing_check(max_age_days, include_no_lyrics),
+            "running": backfill_lock.locked()
+        })
+
+    if not backfill_lock.acquire(blocking=False):
+        return jsonify({"error": "A backfill is already running"}), 409
+
+    def stream():
+        try:
+            for progress in run_backfill(
+                concurrency=int(options.get('concurrency', BACKFILL_CONCURRENCY)),
+                batch_size=int(options.get('batch_size', BACKFILL_BATCH_SIZE)),
+                max_age_days=max_age_days,
+                include_no_lyrics=include_no_lyrics,
+                limit=int(options['limit']) if options.get('limit') else None
+            ):
+                yield json.dumps(progress) + '\n'
+        finally:
+            backfill_lock.release()
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+@app.route('/dj/rescore-lyrics', methods=['GET', 'POST'])
+def rescore_lyrics_route():
+    """Re-verdict every song's stored lyrics against the filter policy, without re-downloading
+
+    GET reports the tokenized corpus; POST runs the rescore. Options (query or
+    JSON body): dry_run, batch_size. A JSON "lexicons" previews another policy
+    and is never written.
+    """
+    from rescore import run_rescore, corpus_status, rescore_lock, RESCORE_BATCH_SIZE
+
+    if request.method == 'GET':
+        return jsonify(corpus_status())
+
+    options = dict(request.args)
+    options.update(request.get_json(silent=True) or {})
+    lexicons = options.get('lexicons')
+    if lexicons is not None and not isinstance(lexicons, dict):
+        return jsonify({"error": "lexicons must be {language: {category: [terms]}}"}), 400
+
+    if not rescore_lock.acquire(blocking=False):
+        return jsonify({"error": "A rescore is already running"}), 409
+    try:
+        return jsonify(run_rescore(
+            lexicons=as_lexicons(lexicons) if lexicons is not None else None,
+            dry_run=str(options.get('dry_run', '')).lower() in ('1', 'true', 'yes'),
+            batch_size=int(options.get('batch_size', RESCORE_BATCH_SIZE))
+        ))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"Rescore failed: {str(e)}"}), 500
+    finally:
+        rescore_lock.release()
+
+@app.route('/dj/warmup', methods=['GET', 'POST'])
+def warmup_lyrics():
+    """Warm the lyrics cache from a Spotify playlist or track list before the event"""
+    from warmup import (warmup_from_spotify, warmup_status, warmup_lock, parse_playlist_id, parse_track_ids,
+                        WARMUP_CONCURRENCY)
+
+    if request.method == 'GET':
+        return jsonify(warmup_status)
+
+    # Playlist IDs, spotify:playlist: URIs and open.spotify.com links, as on the command line
+    data = request.json or {}
+    playlist_id = parse_playlist_id(data.get('playlist_id') or '')
+    track_ids = parse_track_ids('\n'.join(data.get('track_ids', [])))
+    if not playlist_id and not track_ids:
+        return jsonify({"error": "playlist_id or track_ids required"}), 400
+
+    if not warmup_lock.acquire(blocking=False):
+        return jsonify({"error": "A warm-up is already running", "status": warmup_status}), 409
+
+    def run():
+        try:
+            warmup_from_spotify(
+                playlist_id=playlist_id or None,
+                track_ids=track_ids,
+                concurrency=int(data.get('concurrency', WARMUP_CONCURRENCY))
+            )
+        except Exception as e:
+            print(f"❌ Warm-up failed: {e}")
+        finally:
+            warmup_lock.release()
+
+    eventlet.spawn(run)
+    return jsonify({"message": "Warm-up started", "status": warmup_status}), 202
+
 @app.route('/dj/override/<int:request_id>', methods=['POST'])
 def override_lyrics_check(request_id):
     """Allow DJ to manually override lyrics check and approve song"""
@@ -1365,15 +1605,19 @@ def guest_search():
     if not query:
         return jsonify({"error": "query required"}), 400
 
-    token = get_app_spotify_token()
-    if not token:
-        return jsonify({"error": "spotify token unavailable"}), 500
+    deadline = Deadline(SPOTIFY_CALL_DEADLINE, 'guest search')
+    try:
+        token = get_app_spotify_token(deadline)
+        if not token:
+            return jsonify({"error": "spotify token unavailable"}), 500
 
-    url = f"{SPOTIFY_API_URL}/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"q": query, "type": "track", "limit": 10}
+        url = f"{SPOTIFY_API_URL}/search"
+        headers = {"Authorization": f"Bearer {token}"}
+        params = {"q": query, "type": "track", "limit": 10}
 
-    resp = requests.get(url, headers=headers, params=params)
+        resp = http_client.get(url, headers=headers, params=params, deadline=deadline)
+    except http_client.RateLimited as e:
+        return rate_limited_error(e)
     raw = resp.json()
 
     results = []
@@ -1469,26 +1713,74 @@ def debug_auth():
         "token_exists": bool(session.get('spotify_token'))
     })
 
+@app.route('/debug-http')
+def debug_http():
+    """Outbound connection pool usage per upstream host"""
+    return jsonify({
+        "pool_maxsize": http_client.client.pool_maxsize,
+        "hosts": http_client.stats()
+    })
+
 @app.route('/debug-lyrics/<artist>/<title>')
 def debug_lyrics(artist, title):
     """Debug lyrics fetching for a specific song"""
     print(f"🔍 Debugging lyrics for: {artist} - {title}")
     
     # Test the improved lyrics function
-    lyrics = get_lyrics(artist, title)
+    try:
+        lyrics, pending = get_lyrics(artist, title), False
+    except LyricsPending:
+        lyrics, pending = None, True
+    content_language, content_matches = find_inappropriate_content(lyrics)
     
     return jsonify({
         "artist": artist,
         "title": title,
         "lyrics_found": lyrics is not None,
+        "pending": pending,
         "lyrics_length": len(lyrics) if lyrics else 0,
         "lyrics_preview": lyrics[:500] + "..." if lyrics and len(lyrics) > 500 else lyrics,
+        "content_language": content_language,
+        "content_matches": [match.to_dict() for match in content_matches],
         "cache_info": "Check server logs for detailed API testing"
     })
 
+# Columns added to existing tables after they were first created
+ADDED_COLUMNS = {
+    'lyrics_check': {'checked_at': 'DATETIME'},
+    'song': {'artists': 'TEXT'}
+}
+
+def ensure_added_columns():
+    """Add the ADDED_COLUMNS that create_all() won't add to an existing table"""
+    for table, added in ADDED_COLUMNS.items():
+        columns = {column['name'] for column in inspect(db.engine).get_columns(table)}
+        for name, column_type in added.items():
+            if name not in columns:
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}'))
+                print(f"🛠️  Added {table}.{name}")
+
 # Create all tables
 with app.app_context():
     db.create_all()
+    ensure_added_columns()
+
+def start_background_services():
+    """Start the web process's lyrics job workers, provider prober and snapshot publisher
+
+    Called by the server entry points (gunicorn.conf.py, __main__ below) and
+    never on import, so scripts that import app start nothing.
+    """
+    if LYRICS_JOB_WORKERS_IN_WEB:
+        start_lyrics_job_workers()
+    if LYRICS_PROBER:
+        lyrics_prober.start()
+    if LYRICS_SNAPSHOT_WRITER:
+        eventlet.spawn(_lyrics_snapshot_publisher)
 
 if __name__ == '__main__':
+    # The reloader's parent process only watches files; the child it spawns serves
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""Bulk lyrics verdict backfill
+
+Finds every Song with no LyricsCheck row, or one older than --max-age-days
+(rows from before checks were timestamped count as stale), then fetches and
+filters lyrics in parallel and commits verdicts in batches.
+
+    python backfill.py --concurrency 8 --batch-size 50
+    python backfill.py --dry-run
+
+The DJ endpoint /dj/backfill-lyrics runs the same job and streams progress.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import eventlet
+from sqlalchemy import or_
+
+from app import (
+    app, db, Song, LyricsCheck, track_signature, get_lyrics, check_lyrics_content, save_lyrics_check,
+    reject_flagged_requests
+)
+from lyrics_engine import LyricsPending
+
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 8))
+BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', 50))
+BACKFILL_MAX_AGE_DAYS = float(os.getenv('BACKFILL_MAX_AGE_DAYS', 30))
+
+# One backfill at a time per process
+backfill_lock = threading.Lock()
+
+
+def _needing_check_query(max_age_days, include_no_lyrics=False):
+    cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+    conditions = [
+        LyricsCheck.id.is_(None),
+        LyricsCheck.checked_at.is_(None),
+        LyricsCheck.checked_at < cutoff
+    ]
+    if include_no_lyrics:
+        conditions.append(LyricsCheck.lyrics.is_(None))
+    return db.session.query(Song.id, Song.artist, Song.title, Song.album, Song.duration_ms, Song.artists) \
+        .outerjoin(LyricsCheck, LyricsCheck.song_id == Song.id) \
+        .filter(or_(*conditions))
+
+
+def count_songs_needing_check(max_age_days=BACKFILL_MAX_AGE_DAYS, include_no_lyrics=False):
+    return _needing_check_query(max_age_days, include_no_lyrics).count()
+
+
+def fetch_verdict(song):
+    """Lyrics and verdict for one song row; runs on a green thread, no DB access"""
+    try:
+        lyrics = get_lyrics(song.artist, song.title, track=track_signature(song))
+        return song.id, lyrics, check_lyrics_content(lyrics) if lyrics else True, None
+    except LyricsPending as e:
+        # No verdict yet: nothing is saved, so the song still needs a check next run
+        return song.id, None, None, e
+    except Exception as e:
+        return song.id, None, None, str(e)
+
+
+def commit_batch(results):
+    """Write a batch of verdicts in one transaction, then auto-reject pending requests for flagged songs"""
+    now = datetime.utcnow()
+    flagged = []
+    for song_id, lyrics, is_clean, error in results:
+        if error:
+            continue
+        existing = LyricsCheck.query.filter_by(song_id=song_id).first()
+        if existing and existing.lyrics and not lyrics:
+            # Nothing new found: keep the lyrics we have and just mark them checked
+            existing.checked_at = now
+            continue
+        save_lyrics_check(song_id, lyrics, is_clean)
+        if not is_clean:
+            flagged.append(song_id)
+    db.session.commit()
+    for song_id in flagged:
+        reject_flagged_requests(song_id)
+
+
+def run_backfill(concurrency=BACKFILL_CONCURRENCY, batch_size=BACKFILL_BATCH_SIZE,
+                 max_age_days=BACKFILL_MAX_AGE_DAYS, include_no_lyrics=False, limit=None):
+    """Generator of progress dicts; the caller must hold an app context"""
+    query = _needing_check_query(max_age_days, include_no_lyrics).order_by(Song.id)
+    if limit:
+        query = query.limit(limit)
+    songs = query.all()
+    started = time.time()
+    progress = {'event': 'start', 'total': len(songs), 'done': 0, 'flagged': 0, 'no_lyrics': 0, 'pending': 0, 'failed': 0}
+    print(f"🗂️  Backfilling lyrics verdicts for {len(songs)} songs")
+    yield dict(progress)
+
+    pool = eventlet.GreenPool(max(1, concurrency))
+    batch = []
+    for result in pool.imap(fetch_verdict, songs):
+        song_id, lyrics, is_clean, error = result
+        batch.append(result)
+        progress['done'] += 1
+        if isinstance(error, LyricsPending):
+            progress['pending'] += 1
+        elif error:
+            progress['failed'] += 1
+        elif not lyrics:
+            progress['no_lyrics'] += 1
+        elif not is_clean:
+            progress['flagged'] += 1
+
+        if len(batch) >= batch_size:
+            commit_batch(batch)
+            batch = []
+            progress.update(event='progress', elapsed=round(time.time() - started, 1))
+            yield dict(progress)
+
+    if batch:
+        commit_batch(batch)
+    progress.update(event='done', elapsed=round(time.time() - started, 1))
+    print(f"✅ Backfill finished: {progress['done']} checked, {progress['flagged']} flagged, "
+          f"{progress['no_lyrics']} without lyrics, {progress['pending']} pending, {progress['failed']} failed")
+    yield dict(progress)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill lyrics verdicts for songs missing or with stale checks")
+    parser.add_argument('--concurrency', type=int, default=BACKFILL_CONCURRENCY)
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument('--max-age-days', type=float, default=BACKFILL_MAX_AGE_DAYS)
+    parser.add_argument('--include-no-lyrics', action='store_true', help="Also retry songs checked without lyrics")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--dry-run', action='store_true', help="Only count the songs that need a check")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.dry_run:
+            print(f"{count_songs_needing_check(args.max_age_days, args.include_no_lyrics)} songs need a lyrics check")
+        else:
+            for update in run_backfill(args.concurrency, args.batch_size, args.max_age_days,
+                                       args.include_no_lyrics, args.limit):
+                print(json.dumps(update))
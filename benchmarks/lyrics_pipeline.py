@@ -0,0 +1,166 @@
+"""Offline lyrics pipeline benchmark
+
+Starts the stub providers (stub_providers.py) in a child process, points the
+lyrics engine at them and pushes cold song lookups through the same path a
+new song request takes: normalise the query, fetch from the providers, run
+the content check. Every lookup is a new song, so caches never answer.
+
+    python benchmarks/lyrics_pipeline.py
+    python benchmarks/lyrics_pipeline.py --concurrency 1,8,32 --requests 300 --modes hedged,sequential
+    python benchmarks/lyrics_pipeline.py --latency 0.3 --error-rate 0.1 --set LRCLIB.miss_rate=0.6 --json
+
+For each fetch mode and concurrency level it reports throughput, p50/p95/p99
+time-to-verdict and upstream calls per lookup, so fetch changes can be
+compared on numbers instead of against the real third-party APIs.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import eventlet
+import requests
+
+import http_client
+from app import check_lyrics_content
+from lyrics_engine import LyricsEngine, PROVIDERS, set_base_urls
+from lyrics_normalize import query_artist, query_title
+from provider_stats import ProviderScoreboard
+from stub_providers import DEFAULT_BEHAVIOUR, STUB_PROVIDERS, parse_overrides
+
+STUB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_providers.py')
+
+
+def start_stub_process(port, behaviour, overrides):
+    """Run the stubs in their own process so they don't share our hub; returns (process, URL map)"""
+    command = [sys.executable, STUB_SCRIPT, '--port', str(port)]
+    for setting, value in behaviour.items():
+        command += [f"--{setting.replace('_', '-')}", str(value)]
+    for item in overrides:
+        command += ['--set', item]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError(f"Stub providers failed to start (exit code {process.wait()})")
+    return process, json.loads(line)
+
+
+# Control calls to the stubs bypass http_client so they neither count nor get rate limited
+def upstream_calls(urls):
+    """Requests each stub has answered since its last reset"""
+    return {name: requests.get(f"{urls[name]}/__stats", timeout=5).json()['requests'] for name in STUB_PROVIDERS}
+
+
+def reset_stubs(urls):
+    for url in urls.values():
+        requests.post(f"{url}/__reset", timeout=5)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values))) - 1))
+    return values[rank]
+
+
+def lookup(engine, artist, title):
+    """One cold lookup: (seconds to verdict, verdict)"""
+    started = time.monotonic()
+    lyrics, provider, inconclusive = engine.fetch(query_artist(artist), query_title(title))
+    if lyrics:
+        verdict = 'clean' if check_lyrics_content(lyrics) else 'flagged'
+    else:
+        verdict = 'pending' if inconclusive else 'no_lyrics'
+    return time.monotonic() - started, verdict
+
+
+def run_scenario(urls, mode, concurrency, lookups, hedge_delay, deadline, tag):
+    """Push `lookups` new songs through the pipeline `concurrency` at a time"""
+    engine = LyricsEngine(PROVIDERS, ProviderScoreboard(), mode=mode, hedge_delay=hedge_delay, deadline=deadline)
+    songs = [(f"Stub Artist {i % 97}", f"Benchmark Song {tag} {i}") for i in range(lookups)]
+    reset_stubs(urls)
+    pool = eventlet.GreenPool(concurrency)
+    timings = []
+    verdicts = {}
+    started = time.monotonic()
+    for seconds, verdict in pool.imap(lambda song: lookup(engine, *song), songs):
+        timings.append(seconds)
+        verdicts[verdict] = verdicts.get(verdict, 0) + 1
+    elapsed = time.monotonic() - started
+    calls = upstream_calls(urls)
+    timings.sort()
+    return {
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': lookups,
+        'throughput_rps': round(lookups / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(timings, 50) * 1000, 1),
+        'p95_ms': round(percentile(timings, 95) * 1000, 1),
+        'p99_ms': round(percentile(timings, 99) * 1000, 1),
+        'upstream_per_request': round(sum(calls.values()) / lookups, 2),
+        'upstream_calls': calls,
+        'verdicts': verdicts
+    }
+
+
+def print_table(rows):
+    header = f"{'mode':<11}{'conc':>5}{'reqs':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls/req':>10}  verdicts"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        verdicts = ' '.join(f"{name}={count}" for name, count in sorted(row['verdicts'].items()))
+        print(f"{row['mode']:<11}{row['concurrency']:>5}{row['requests']:>6}{row['throughput_rps']:>9}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['upstream_per_request']:>10}  {verdicts}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the lyrics fetch + verdict path against stub providers")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=100, help="Lookups per scenario")
+    parser.add_argument('--modes', default='hedged', help="Comma-separated fetch modes: hedged, sequential, parallel")
+    parser.add_argument('--hedge-delay', type=float, default=1.5)
+    parser.add_argument('--deadline', type=float, default=12.0)
+    parser.add_argument('--port', type=int, default=9100, help="First stub port")
+    for setting, default in DEFAULT_BEHAVIOUR.items():
+        parser.add_argument(f"--{setting.replace('_', '-')}", type=float, default=default)
+    parser.add_argument('--set', action='append', default=[], metavar='PROVIDER.SETTING=VALUE',
+                        help="Per-provider stub override, e.g. AZLyrics.latency=1.5")
+    parser.add_argument('--no-rate-limits', action='store_true',
+                        help="Don't apply the providers' request rate limits to the stubs")
+    parser.add_argument('--verbose', action='store_true', help="Keep the engine's per-request logging")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args()
+
+    parse_overrides(args.set)  # fail on typos before starting anything
+    behaviour = {setting: getattr(args, setting) for setting in DEFAULT_BEHAVIOUR}
+    process, urls = start_stub_process(args.port, behaviour, args.set)
+    try:
+        set_base_urls(urls)
+        if args.no_rate_limits:
+            for url in urls.values():
+                http_client.client.set_rate_limit(url.split('://', 1)[1], 1e9, 1e9)
+
+        rows = []
+        for mode in args.modes.split(','):
+            for concurrency in (int(level) for level in args.concurrency.split(',')):
+                output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                with output:
+                    rows.append(run_scenario(urls, mode.strip(), concurrency, args.requests,
+                                             args.hedge_delay, args.deadline, f"{mode}-{concurrency}"))
+        if args.json:
+            print(json.dumps({'stubs': behaviour, 'overrides': args.set, 'results': rows}, indent=2))
+        else:
+            print(f"Stub providers: {', '.join(STUB_PROVIDERS)}; {json.dumps(behaviour)}"
+                  + (f"; overrides {', '.join(args.set)}" if args.set else ''))
+            print_table(rows)
+    finally:
+        process.terminate()
+        process.wait()
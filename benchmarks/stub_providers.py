@@ -0,0 +1,217 @@
+"""Stub lyrics provider servers
+
+Local stand-ins for Lyrics.ovh, LRCLIB, AZLyrics and Genius that answer with
+the same URL shapes and payloads as the real services, after a configurable
+delay, with configurable error (HTTP 500) and miss (HTTP 404 / no hits) rates
+and lyrics size. Used by lyrics_pipeline.py; can also be run on its own:
+
+    python benchmarks/stub_providers.py --port 9100 --latency 0.2 --error-rate 0.05
+    python benchmarks/stub_providers.py --set AZLyrics.latency=1.5 --set LRCLIB.miss_rate=0.5
+
+Every stub also serves GET /__stats (requests received per provider) and
+POST /__reset (zero the counters).
+"""
+import argparse
+import json
+import random
+import threading
+import urllib.parse
+
+import eventlet
+from eventlet import wsgi
+
+AZLYRICS_MARKER = ('<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited by our '
+                   'licensing agreement. Sorry. -->')
+
+# Stubs in the order their ports are assigned, by lyrics engine provider name
+STUB_PROVIDERS = ('Lyrics.ovh', 'LRCLIB', 'AZLyrics', 'Genius Proxy')
+
+DEFAULT_BEHAVIOUR = {
+    'latency': 0.2,      # mean seconds before answering
+    'jitter': 0.5,       # +/- fraction of latency, uniformly
+    'error_rate': 0.0,   # share of requests answered with HTTP 500
+    'miss_rate': 0.0,    # share of requests answered as "not found"
+    'payload': 1500,     # characters of lyrics
+    'page_size': 60000   # AZLyrics: bytes of HTML around the lyrics block
+}
+
+_LINES = (
+    "Walking down the road tonight",
+    "Singing with the morning light",
+    "Every step I take with you",
+    "Hold on to the love that's true",
+    "Raise your hands and lift your voice",
+    "Here together we rejoice"
+)
+
+
+def make_lyrics(artist, title, size):
+    """Deterministic clean lyrics of about `size` characters for a song"""
+    rng = random.Random(f"{artist}|{title}")
+    lines = []
+    length = 0
+    while length < size:
+        line = rng.choice(_LINES)
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)
+
+
+class StubProvider:
+    """WSGI app imitating one provider; counts the requests it answers"""
+
+    def __init__(self, name, **behaviour):
+        self.name = name
+        self.behaviour = dict(DEFAULT_BEHAVIOUR, **behaviour)
+        self.requests = 0
+        self.errors = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'errors': self.errors, 'misses': self.misses}
+
+    def reset(self):
+        with self._lock:
+            self.requests = self.errors = self.misses = 0
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path == '/__stats':
+            return self._reply(start_response, '200 OK', json.dumps(self.stats()), 'application/json')
+        if path == '/__reset':
+            self.reset()
+            return self._reply(start_response, '200 OK', '{}', 'application/json')
+
+        behaviour = self.behaviour
+        latency = behaviour['latency'] * (1 + random.uniform(-behaviour['jitter'], behaviour['jitter']))
+        eventlet.sleep(max(0.0, latency))
+        roll = random.random()
+        with self._lock:
+            self.requests += 1
+            if roll < behaviour['error_rate']:
+                self.errors += 1
+            elif roll < behaviour['error_rate'] + behaviour['miss_rate']:
+                self.misses += 1
+        if roll < behaviour['error_rate']:
+            return self._reply(start_response, '500 Internal Server Error', 'stub error', 'text/plain')
+        found = roll >= behaviour['error_rate'] + behaviour['miss_rate']
+        query = urllib.parse.parse_qs(environ.get('QUERY_STRING', ''))
+        return self.respond(start_response, path, query, found)
+
+    def respond(self, start_response, path, query, found):
+        raise NotImplementedError
+
+    @staticmethod
+    def _reply(start_response, status, body, content_type):
+        body = body.encode('utf-8')
+        start_response(status, [('Content-Type', f"{content_type}; charset=utf-8"),
+                                ('Content-Length', str(len(body)))])
+        return [body]
+
+    def _json(self, start_response, data, found=True):
+        return self._reply(start_response, '200 OK' if found else '404 Not Found', json.dumps(data), 'application/json')
+
+
+class LyricsOvhStub(StubProvider):
+    # /v1/<artist>/<title>
+    def respond(self, start_response, path, query, found):
+        parts = [urllib.parse.unquote(part) for part in path.split('/')[2:4]]
+        if not found or len(parts) < 2:
+            return self._json(start_response, {'error': 'No lyrics found'}, found=False)
+        return self._json(start_response, {'lyrics': make_lyrics(*parts, self.behaviour['payload'])})
+
+
+class LrclibStub(StubProvider):
+    # /api/get?artist_name=&track_name=[&album_name=&duration=] and /api/search?artist_name=&track_name=
+    def respond(self, start_response, path, query, found):
+        artist = query.get('artist_name', [''])[0]
+        title = query.get('track_name', [''])[0]
+        record = {
+            'artistName': artist,
+            'trackName': title,
+            'albumName': query.get('album_name', ['Stub Album'])[0],
+            'duration': float(query.get('duration', [200])[0]),
+            'plainLyrics': make_lyrics(artist, title, self.behaviour['payload'])
+        }
+        if path == '/api/search':
+            return self._json(start_response, [record] if found else [])
+        if not found:
+            return self._json(start_response, {'code': 404, 'name': 'TrackNotFound'}, found=False)
+        return self._json(start_response, record)
+
+
+class AZLyricsStub(StubProvider):
+    # /lyrics/<artist>/<title>.html, lyrics block in the middle of a large page
+    def respond(self, start_response, path, query, found):
+        if not found:
+            return self._reply(start_response, '404 Not Found', '<html>Not found</html>', 'text/html')
+        parts = path.split('/')[2:4]
+        lyrics = make_lyrics(*parts, self.behaviour['payload']) if len(parts) == 2 else ''
+        padding = '<p>' + 'x' * max(0, self.behaviour['page_size'] // 2) + '</p>'
+        page = (f"<html><body>{padding}<div>{AZLYRICS_MARKER}\n" + '<br>\n'.join(lyrics.splitlines()) +
+                f"\n</div>{padding}</body></html>")
+        return self._reply(start_response, '200 OK', page, 'text/html')
+
+
+class GeniusStub(StubProvider):
+    # /api/search/song?q=<artist> <title>
+    def respond(self, start_response, path, query, found):
+        hits = []
+        if found:
+            # The query is "<artist> <title>"; one hit per split point, so one of them matches
+            words = query.get('q', [''])[0].split(' ')
+            for i in range(1, len(words)):
+                hits.append({'result': {'artist_names': ' '.join(words[:i]), 'title': ' '.join(words[i:])}})
+        return self._json(start_response, {'response': {'sections': [{'hits': hits}]}})
+
+
+STUB_CLASSES = {
+    'Lyrics.ovh': LyricsOvhStub,
+    'LRCLIB': LrclibStub,
+    'AZLyrics': AZLyricsStub,
+    'Genius Proxy': GeniusStub
+}
+
+
+def parse_overrides(items):
+    """{provider: {setting: value}} from ['AZLyrics.latency=1.5', ...]"""
+    overrides = {}
+    for item in items or []:
+        key, _, value = item.partition('=')
+        name, _, setting = key.rpartition('.')
+        if name not in STUB_CLASSES or setting not in DEFAULT_BEHAVIOUR:
+            raise ValueError(f"Unknown stub setting: {key}")
+        overrides.setdefault(name, {})[setting] = float(value)
+    return overrides
+
+
+def start_stubs(port, behaviour=None, overrides=None, host='127.0.0.1'):
+    """Serve every stub on consecutive ports from `port`; returns {provider name: base URL}"""
+    urls = {}
+    for offset, name in enumerate(STUB_PROVIDERS):
+        stub = STUB_CLASSES[name](name, **dict(behaviour or {}, **(overrides or {}).get(name, {})))
+        listener = eventlet.listen((host, port + offset))
+        eventlet.spawn(wsgi.server, listener, stub, log_output=False)
+        urls[name] = f"http://{host}:{listener.getsockname()[1]}"
+    # LRCLIB's exact-match and search endpoints live on the same host
+    urls['LRCLIB Search'] = urls['LRCLIB']
+    return urls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve stub lyrics providers for offline benchmarks")
+    parser.add_argument('--port', type=int, default=9100, help="First port; stubs take consecutive ports")
+    for setting, default in DEFAULT_BEHAVIOUR.items():
+        parser.add_argument(f"--{setting.replace('_', '-')}", type=float, default=default)
+    parser.add_argument('--set', action='append', metavar='PROVIDER.SETTING=VALUE',
+                        help="Per-provider override, e.g. AZLyrics.latency=1.5")
+    args = parser.parse_args()
+
+    behaviour = {setting: getattr(args, setting) for setting in DEFAULT_BEHAVIOUR}
+    urls = start_stubs(args.port, behaviour, parse_overrides(args.set))
+    # First line of output is the URL map, for whoever started us
+    print(json.dumps(urls), flush=True)
+    while True:
+        eventlet.sleep(3600)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import threading
+import unicodedata
+
+from language_detect import LanguageDetector
+
+# ----------------------
+# Lyrics Content Filter
+# ----------------------
+# A lexicon maps categories to terms. It is compiled once into an Aho-Corasick
+# automaton, so scanning lyrics is a single pass over the text however many
+# terms there are, and every hit comes back with its offset and category.
+#
+# Terms only match whole words: "hell" flags "hell" and "hell's" but not
+# "hello" or "shell", "gun" doesn't flag "begun". A trailing * matches any
+# word starting with the term, e.g. "kill*" for "killer", "killing"; where a
+# prefix would catch innocent words ("gun*" and "gunther") the inflections are
+# listed instead. Case and accents are ignored on both sides, so "cocaína"
+# also catches "cocaina".
+#
+# There is one lexicon per language. MultilingualFilter detects the song's
+# language and runs that language's matcher (which also carries the English
+# terms every language's pop songs borrow), compiled once per language.
+
+LEXICONS = {
+    'en': {
+        'profanity': ['fuck*', 'motherfuck*', 'shit*', 'bitch*', 'asshole*', 'damn*', 'hell'],
+        'sexual': ['sex', 'sexy', 'sexual*', 'naked*', 'dick', 'dicks', 'pussy', 'pussies', 'whore*'],
+        'violence': ['kill*', 'murder*', 'gun', 'guns', 'gunshot*', 'gunfire', 'gunman', 'gunmen', 'gunpoint',
+                     'shoot*', 'stab', 'stabs', 'stabbed', 'stabbing'],
+        'drugs': ['drug', 'drugs', 'drugged', 'drugging', 'cocaine', 'weed', 'alcohol*', 'drunk*']
+    },
+    'pt': {
+        'profanity': ['porra', 'caralho', 'merda', 'puta', 'putas', 'puto', 'foder', 'fode', 'foda', 'fodido*',
+                      'cacete', 'buceta', 'arrombad*'],
+        'sexual': ['sexo', 'nua', 'transar', 'tesão', 'safad*'],
+        'violence': ['matar', 'matei', 'matou', 'assassin*', 'arma', 'armas', 'tiro', 'tiros', 'atirar', 'facada*'],
+        'drugs': ['droga', 'drogas', 'cocaína', 'maconha', 'cachaça', 'álcool', 'bêbad*']
+    },
+    'es': {
+        'profanity': ['puta', 'putas', 'puto', 'mierda', 'joder', 'jodid*', 'coño', 'cabrón', 'cabrones', 'pendej*',
+                      'chingad*', 'chingar', 'verga', 'culero*', 'hijueputa'],
+        'sexual': ['sexo', 'desnud*', 'follar', 'cachond*'],
+        'violence': ['matar', 'mató', 'asesin*', 'pistola', 'pistolas', 'balazo*', 'disparo*'],
+        'drugs': ['droga', 'drogas', 'cocaína', 'perico', 'marihuana', 'borrach*', 'alcohol']
+    },
+    'fr': {
+        'profanity': ['putain', 'merde', 'merdes', 'connard*', 'connasse', 'salope*', 'enculé*', 'bordel', 'foutre',
+                      'nique', 'niquer', 'ta gueule'],
+        'sexual': ['sexe', 'nu', 'nue', 'nus', 'baise', 'cul'],
+        'violence': ['tuer', 'tué', 'tuée', 'meurtre*', 'flingue*', 'poignard*', 'assassin*'],
+        'drugs': ['drogue*', 'cocaïne', 'beuh', 'ivre*', 'alcool*', 'bourré', 'bourrée']
+    }
+}
+
+# Borrowed by every language's matcher
+BASE_LANGUAGE = 'en'
+DEFAULT_LEXICON = LEXICONS[BASE_LANGUAGE]
+
+
+def _accent_folding_table():
+    # One character in, one character out, so offsets survive folding
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = unicodedata.normalize('NFD', char)[0]
+        if base != char and base.isascii():
+            table[code] = base
+    return table
+
+
+_FOLD = _accent_folding_table()
+
+
+def fold(text):
+    """Lowercase and strip accents without changing the length"""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters grow when lowercased; keep offsets aligned with the original
+        lowered = ''.join(char.lower()[:1] for char in text)
+    return lowered.translate(_FOLD)
+
+
+class Match:
+    """One lexicon hit: the matched text, the term and category it matched, and where"""
+
+    __slots__ = ('term', 'category', 'start', 'end', 'text')
+
+    def __init__(self, term, category, start, end, text):
+        self.term = term
+        self.category = category
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def to_dict(self):
+        return {'term': self.term, 'category': self.category, 'start': self.start, 'end': self.end, 'text': self.text}
+
+
+def lexicon_version(lexicon):
+    """Stable short hash of a lexicon's contents"""
+    canonical = json.dumps({category: sorted(terms) for category, terms in lexicon.items()}, sort_keys=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+
+class ContentFilter:
+    """Aho-Corasick matcher over a lexicon, with word-boundary checks"""
+
+    def __init__(self, lexicon):
+        self.lexicon = {category: list(terms) for category, terms in lexicon.items()}
+        self.version = lexicon_version(lexicon)
+        # Trie as parallel lists: goto transitions, failure links, outputs per state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for category, terms in self.lexicon.items():
+            for term in terms:
+                prefix = term.endswith('*')
+                word = fold(term.rstrip('*'))
+                if word:
+                    self._add(word, (term, category, len(word), prefix))
+        self._link()
+
+    def __len__(self):
+        return sum(len(terms) for terms in self.lexicon.values())
+
+    def _add(self, word, output):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(output)
+
+    def _link(self):
+        # Breadth-first, so a state's failure target is always finished before it
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                # fail is shallower than state, so this can't be next_state itself
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def scan(self, text, first_only=False):
+        """Every whole-word match in text, in order of where it ends"""
+        if not text:
+            return []
+        lowered = fold(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        length = len(lowered)
+        matches = []
+        state = 0
+        for index, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            end = index + 1
+            for term, category, size, prefix in out[state]:
+                start = end - size
+                if start > 0 and lowered[start - 1].isalnum():
+                    continue
+                word_end = end
+                if prefix:
+                    # Report the whole word the prefix started
+                    while word_end < length and lowered[word_end].isalnum():
+                        word_end += 1
+                elif end < length and lowered[end].isalnum():
+                    continue
+                matches.append(Match(term, category, start, word_end, text[start:word_end]))
+                if first_only:
+                    return matches
+        return matches
+
+    def is_clean(self, text):
+        return not self.scan(text, first_only=True)
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def compiled_filter(lexicon):
+    """The ContentFilter for a lexicon, compiled once per lexicon version"""
+    version = lexicon_version(lexicon)
+    with _compiled_lock:
+        content_filter = _compiled.get(version)
+        if content_filter is None:
+            content_filter = _compiled[version] = ContentFilter(lexicon)
+        return content_filter
+
+
+def merge_lexicons(*lexicons):
+    """One lexicon with every category's terms from all of them"""
+    merged = {}
+    for lexicon in lexicons:
+        for category, terms in lexicon.items():
+            merged.setdefault(category, [])
+            merged[category].extend(term for term in terms if term not in merged[category])
+    return merged
+
+
+def as_lexicons(data):
+    """Per-language lexicons from {language: {category: [terms]}}; a plain {category: [terms]} replaces just the English lexicon"""
+    if all(isinstance(terms, list) for terms in data.values()):
+        return dict(LEXICONS, **{BASE_LANGUAGE: data})
+    return data
+
+
+class MultilingualFilter:
+    """Per-language matchers picked by a language detector: one detection plus one pass per song
+
+    Songs whose language can't be told (too short, or no known language) get
+    the matcher with every lexicon, which is still a single pass.
+    """
+
+    def __init__(self, lexicons=LEXICONS, detector=None, base_language=BASE_LANGUAGE):
+        self.lexicons = lexicons
+        self.detector = detector or LanguageDetector()
+        self.base_language = base_language
+        base = lexicons.get(base_language, {})
+        self.filters = {
+            language: compiled_filter(merge_lexicons(base, lexicon)) for language, lexicon in lexicons.items()
+        }
+        self.fallback = compiled_filter(merge_lexicons(*lexicons.values()))
+
+    @property
+    def version(self):
+        """Changes whenever any language's lexicon does"""
+        return lexicon_version({language: [content_filter.version] for language, content_filter in self.filters.items()})
+
+    def filter_for(self, language):
+        return self.filters.get(language, self.fallback)
+
+    def detect(self, text):
+        language, _ = self.detector.detect(text)
+        return language if language in self.filters else None
+
+    def scan(self, text, first_only=False):
+        """(detected language or None, matches)"""
+        if not text:
+            return None, []
+        language = self.detect(text)
+        return language, self.filter_for(language).scan(text, first_only)
+
+    def is_clean(self, text):
+        return not self.scan(text, first_only=True)[1]
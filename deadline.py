@@ -0,0 +1,46 @@
+import time
+
+# ----------------------
+# Request & Job Deadlines
+# ----------------------
+# One Deadline is created per song request (and per background lyrics job)
+# and handed down to everything it calls: Spotify, the lyrics engine and each
+# provider, and the database steps. Each step sizes its socket timeout from
+# the time that is left and gives up early instead of starting work that
+# cannot finish, so the caller gets a fast "pending" answer instead of a green
+# thread hanging on an upstream's full timeout.
+
+
+class DeadlineExceeded(Exception):
+    """The request or job ran out of time before a step could run"""
+
+
+class Deadline:
+    """A point in (monotonic) time that every step of one request or job must finish by"""
+
+    def __init__(self, seconds, label='request'):
+        self.label = label
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, step):
+        """Raise DeadlineExceeded if there is no time left to start `step`"""
+        if self.expired():
+            raise DeadlineExceeded(f"{self.label} deadline of {self.seconds}s exceeded before {step}")
+
+    def timeout(self, cap, step='request'):
+        """Socket timeout for one call: the time left, but never more than cap"""
+        self.check(step)
+        return min(cap, self.remaining())
+
+    def capped(self, seconds):
+        """This deadline or one `seconds` from now, whichever comes first"""
+        if self.remaining() <= seconds:
+            return self
+        return Deadline(seconds, self.label)
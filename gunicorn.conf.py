@@ -0,0 +1,7 @@
+# Gunicorn settings; `gunicorn app:app` reads this file from the working directory
+
+
+def post_worker_init(worker):
+    # Each serving worker starts its own background work once the app is loaded
+    from app import start_background_services
+    start_background_services()
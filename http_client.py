@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ----------------------
+# Pooled Outbound HTTP Client
+# ----------------------
+# One keep-alive requests.Session per upstream host (Spotify accounts, Spotify
+# API, each lyrics provider), so repeat calls skip the TCP and TLS handshakes.
+# Pools don't block: under an eventlet burst, green threads beyond
+# HTTP_POOL_MAXSIZE get a throwaway connection instead of waiting for one.
+# requests already asks for gzip/deflate and decodes it transparently.
+#
+# Hosts can also have a token bucket (rate per second, burst). A request that
+# finds the bucket empty queues for its turn, up to HTTP_RATE_MAX_WAIT seconds
+# (or what is left of the caller's Deadline, if sooner); past that it fails
+# fast with RateLimited instead of piling onto a provider that would answer
+# 429 or ban us.
+
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 32))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+HTTP_RATE_MAX_WAIT = float(os.getenv('HTTP_RATE_MAX_WAIT', 2.0))
+# host=rate[/burst],... e.g. "api.lyrics.ovh=5/10,www.azlyrics.com=0.5/1"
+HTTP_RATE_LIMITS = os.getenv(
+    'HTTP_RATE_LIMITS',
+    'api.lyrics.ovh=5/10,lrclib.net=5/10,www.azlyrics.com=0.5/1,genius.com=2/4,'
+    'api.spotify.com=10/20,accounts.spotify.com=2/5'
+)
+
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """The host's token bucket would make this request wait longer than allowed"""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Re-exported so callers can catch timeouts without importing requests
+Timeout = requests.exceptions.Timeout
+
+
+class TokenBucket:
+    """Classic token bucket; waiters reserve tokens in arrival order"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """Take a token and return how long to wait for it, or None if that exceeds max_wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            # Going negative queues this caller behind the ones already waiting
+            self._tokens -= 1.0
+            return wait
+
+    def next_free(self):
+        """Seconds until a token would be free, without taking it"""
+        with self._lock:
+            tokens = min(self.burst, self._tokens + (time.monotonic() - self._updated) * self.rate)
+            return max(0.0, (1.0 - tokens) / self.rate)
+
+
+def parse_rate_limits(spec):
+    """{host: (rate, burst)} from 'host=rate[/burst],...'"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, _, value = item.partition('=')
+        rate, _, burst = value.partition('/')
+        limits[host.strip()] = (float(rate), float(burst) if burst else None)
+    return limits
+
+
+class HttpClient:
+    """Per-host keep-alive sessions with default timeouts and connection reuse counters"""
+
+    def __init__(self, pool_maxsize=HTTP_POOL_MAXSIZE, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 rate_limits=None, max_wait=HTTP_RATE_MAX_WAIT):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self._sessions = {}
+        self._requests = {}
+        self._buckets = {}
+        self._throttle = {}
+        self._lock = threading.Lock()
+        for host, (rate, burst) in (rate_limits or {}).items():
+            self.set_rate_limit(host, rate, burst)
+
+    def set_rate_limit(self, host, rate, burst=None):
+        """Limit requests to host to `rate` per second with bursts of `burst` (None removes the limit)"""
+        with self._lock:
+            if rate:
+                self._buckets[host] = TokenBucket(rate, burst)
+            else:
+                self._buckets.pop(host, None)
+
+    def default_rate_limit(self, host, rate, burst=None):
+        """Set a limit for host unless one is already configured"""
+        with self._lock:
+            if host in self._buckets:
+                return
+        self.set_rate_limit(host, rate, burst)
+
+    def _wait_for_token(self, host, max_wait):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                return
+            throttle = self._throttle.setdefault(host, {'throttled': 0, 'throttled_seconds': 0.0, 'rejected': 0})
+        wait = bucket.reserve(max_wait)
+        if wait is None:
+            with self._lock:
+                throttle['rejected'] += 1
+            raise RateLimited(f"{host} rate limit: would wait more than {max_wait:.2f}s", bucket.next_free())
+        if wait > 0:
+            with self._lock:
+                throttle['throttled'] += 1
+                throttle['throttled_seconds'] += wait
+            time.sleep(wait)
+
+    def _session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(DEFAULT_HEADERS)
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            self._requests[host] = self._requests.get(host, 0) + 1
+            return session
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """Send through the host's session; a Deadline bounds both the token wait and the socket timeout"""
+        kwargs.setdefault('timeout', self.timeout)
+        host = urllib.parse.urlsplit(url).netloc
+        max_wait = self.max_wait if deadline is None else min(self.max_wait, deadline.remaining())
+        self._wait_for_token(host, max_wait)
+        if deadline is not None:
+            # Sized after the wait, which may have used up part of the deadline
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                raise Timeout(f"{host}: {deadline.label} deadline passed waiting for a rate limit token")
+            timeout = kwargs['timeout']
+            kwargs['timeout'] = (
+                tuple(min(cap, remaining) for cap in timeout) if isinstance(timeout, tuple) else min(timeout, remaining)
+            )
+        return self._session(host).request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Requests and new connections per host; the difference is keep-alive reuse"""
+        with self._lock:
+            sessions = dict(self._sessions)
+            sent = dict(self._requests)
+            throttle = {host: dict(counters) for host, counters in self._throttle.items()}
+            limits = {host: {'rate': b.rate, 'burst': b.burst} for host, b in self._buckets.items()}
+        report = {}
+        for host, session in sessions.items():
+            connections = 0
+            for adapter in {id(a): a for a in session.adapters.values()}.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+            report[host] = {
+                'requests': sent.get(host, 0),
+                'connections_opened': connections,
+                'connections_reused': max(0, sent.get(host, 0) - connections)
+            }
+        for host, counters in throttle.items():
+            entry = report.setdefault(host, {'requests': sent.get(host, 0)})
+            entry.update(counters, throttled_seconds=round(counters['throttled_seconds'], 3))
+        for host, limit in limits.items():
+            report.setdefault(host, {'requests': 0})['rate_limit'] = limit
+        return report
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# Shared by every integration in the process
+client = HttpClient(rate_limits=parse_rate_limits(HTTP_RATE_LIMITS))
+
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return client.post(url, **kwargs)
+
+
+def stats():
+    return client.stats()
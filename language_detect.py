@@ -0,0 +1,117 @@
+import math
+import re
+
+# ----------------------
+# Lyrics Language Detection
+# ----------------------
+# Character trigram naive Bayes over the languages the guest UI ships
+# (en/pt/es/fr). Each language profile is built once, at import, from a short
+# sample text; detecting a song only looks at its first max_chars characters,
+# so it costs a fraction of a filter pass. Accents are kept: ã/ç, ñ and è/ê
+# are some of the strongest signals between these languages.
+
+LANGUAGE_SAMPLES = {
+    'en': (
+        "I was walking down the street when you called my name and the night was so cold "
+        "we have been waiting for this moment all our lives and now it is here with you "
+        "there is nothing that I would not do for the love that we share every day "
+        "they say the world is turning but my heart is standing still when you are around "
+        "what are you thinking about tonight would you like to dance with me one more time "
+        "this is the way we used to be before everything changed and we grew apart "
+        "oh baby hold me tight and never let me go because I need you right now "
+        "the people in the city are singing through the rain and the light is shining bright "
+        "you know that I should have told you how much I wanted you to stay here with me"
+    ),
+    'pt': (
+        "eu estava andando pela rua quando você chamou o meu nome e a noite estava fria "
+        "nós esperamos por esse momento a vida inteira e agora ele chegou com você "
+        "não há nada que eu não faria pelo amor que a gente divide todos os dias "
+        "dizem que o mundo está girando mas meu coração parou quando você está por perto "
+        "o que você está pensando hoje à noite quer dançar comigo mais uma vez "
+        "é assim que a gente era antes de tudo mudar e nós nos afastarmos "
+        "meu bem me abraça forte e nunca me deixa ir porque eu preciso de você agora "
+        "as pessoas na cidade cantam na chuva e a luz brilha no coração da multidão "
+        "saudade da minha terra das canções de ninar e do carinho da nossa gente "
+        "então vamos juntos celebrar a paixão e a emoção dessa canção sem razão"
+    ),
+    'es': (
+        "yo estaba caminando por la calle cuando llamaste mi nombre y la noche estaba fría "
+        "hemos esperado este momento toda la vida y ahora llegó contigo "
+        "no hay nada que yo no haría por el amor que compartimos todos los días "
+        "dicen que el mundo está girando pero mi corazón se detiene cuando estás cerca "
+        "qué estás pensando esta noche quieres bailar conmigo una vez más "
+        "así es como éramos antes de que todo cambiara y nos alejáramos "
+        "mi amor abrázame fuerte y nunca me dejes ir porque te necesito ahora "
+        "la gente en la ciudad canta bajo la lluvia y la luz brilla en el corazón "
+        "cuando llegue el mañana seguiré soñando con tus ojos y tu canción "
+        "vamos juntos a celebrar la pasión y la ilusión de esta canción"
+    ),
+    'fr': (
+        "je marchais dans la rue quand tu as appelé mon nom et la nuit était si froide "
+        "nous avons attendu ce moment toute notre vie et maintenant il est là avec toi "
+        "il n'y a rien que je ne ferais pas pour l'amour que nous partageons chaque jour "
+        "on dit que le monde tourne mais mon cœur s'arrête quand tu es près de moi "
+        "à quoi est-ce que tu penses ce soir veux-tu danser avec moi encore une fois "
+        "c'est comme ça que nous étions avant que tout change et que l'on s'éloigne "
+        "mon amour serre-moi fort et ne me laisse jamais partir parce que j'ai besoin de toi "
+        "les gens dans la ville chantent sous la pluie et la lumière brille dans les cœurs "
+        "quand viendra le matin je rêverai encore de tes yeux et de ta chanson "
+        "allons ensemble célébrer la passion et l'émotion de cette chanson"
+    )
+}
+
+_NON_LETTERS = re.compile(r"[^\w']+|[\d_]+")
+
+
+def trigrams(text):
+    """Character trigrams of text, words padded with spaces ("the" -> " th", "the", "he ")"""
+    counts = {}
+    for word in _NON_LETTERS.sub(' ', text.lower()).split():
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            gram = padded[i:i + 3]
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class LanguageDetector:
+    """Trigram naive Bayes language guesser with add-one smoothing"""
+
+    def __init__(self, samples=LANGUAGE_SAMPLES, max_chars=1500, min_confidence=0.1):
+        self.max_chars = max_chars
+        self.min_confidence = min_confidence
+        self.languages = list(samples)
+        profiles = {language: trigrams(text) for language, text in samples.items()}
+        vocabulary = len({gram for profile in profiles.values() for gram in profile})
+        self._log_probs = {}
+        self._unseen = {}
+        for language, profile in profiles.items():
+            denominator = sum(profile.values()) + vocabulary
+            self._log_probs[language] = {gram: math.log((count + 1) / denominator) for gram, count in profile.items()}
+            self._unseen[language] = math.log(1 / denominator)
+
+    def scores(self, text):
+        """Average log-likelihood per trigram for each language"""
+        grams = trigrams((text or '')[:self.max_chars])
+        total = sum(grams.values())
+        if not total:
+            return {}
+        return {
+            language: sum(count * self._log_probs[language].get(gram, self._unseen[language])
+                          for gram, count in grams.items()) / total
+            for language in self.languages
+        }
+
+    def detect(self, text):
+        """(language, confidence), or (None, confidence) when the text is too short or ambiguous
+
+        confidence is the per-trigram log-likelihood margin between the best and
+        the runner-up language.
+        """
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        margin = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else float('inf')
+        language = ranked[0][0] if margin >= self.min_confidence else None
+        return language, round(margin, 3)
@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ----------------------
+# In-Memory Lyrics Cache
+# ----------------------
+DEFAULT_TTL = 30 * 24 * 60 * 60  # 30 days, same as the on-disk cache
+
+
+def entry_size(key, entry):
+    """Approximate memory footprint of a cache entry in bytes"""
+    size = len(key.encode('utf-8'))
+    for value in entry.values():
+        if isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        elif isinstance(value, bytes):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+
+class LyricsMemoryCache:
+    """Process-wide LRU cache of lyrics entries with a TTL and entry/byte budget"""
+
+    def __init__(self, max_entries=2000, max_bytes=16 * 1024 * 1024, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def bytes_used(self):
+        return self._bytes
+
+    def is_fresh(self, entry, now=None):
+        """Check an entry against the TTL (negative entries expire at their retry time)"""
+        now = now or time.time()
+        if entry.get('negative'):
+            return now < entry.get('retry_at', 0)
+        return now - entry.get('timestamp', 0) < self.ttl
+
+    def get(self, key):
+        """Return a fresh entry and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self.is_fresh(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """Insert or replace an entry, evicting least recently used ones over budget"""
+        size = entry_size(key, entry)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._bytes -= self._sizes.pop(key, 0)
+
+
+class LyricsCacheStats:
+    """Live counters for cache lookups plus a window of recent lookup latencies"""
+
+    def __init__(self, latency_window=2048):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'negative_hits': 0,
+            'fills': 0,
+            'negative_fills': 0
+        }
+        self.fills_by_provider = {}
+
+    def record_lookup(self, outcome, seconds):
+        """outcome is 'hits', 'misses' or 'negative_hits'"""
+        with self._lock:
+            self.counters[outcome] += 1
+            self._latencies.append(seconds)
+
+    def record_fill(self, provider, negative=False):
+        with self._lock:
+            if negative:
+                self.counters['negative_fills'] += 1
+                return
+            self.counters['fills'] += 1
+            name = provider or 'Unknown'
+            self.fills_by_provider[name] = self.fills_by_provider.get(name, 0) + 1
+
+    def latency_percentiles(self):
+        """p50/p95/p99 lookup latency in milliseconds over the recent window"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'samples': 0}
+
+        def pick(q):
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 3)
+
+        return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'samples': len(samples)}
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self.counters)
+            providers = dict(self.fills_by_provider)
+        lookups = counters['hits'] + counters['misses'] + counters['negative_hits']
+        counters['hit_rate'] = round(counters['hits'] / lookups, 3) if lookups else None
+        counters['fills_by_provider'] = providers
+        counters['latency'] = self.latency_percentiles()
+        return counters
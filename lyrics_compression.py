@@ -0,0 +1,169 @@
+import base64
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import Counter
+
+# ----------------------
+# Lyrics Compression
+# ----------------------
+# Lyrics repeat their choruses many times, so zlib shrinks them well; a shared
+# dictionary trained on the catalog helps short songs that repeat little.
+#
+# Packed values are plain strings so they fit JSON files and Text columns:
+#   'zlib64:' + base64(header + zlib stream)
+# header is b'\x00' (no dictionary) or b'\x01' + 4-byte dictionary id.
+# Anything without the prefix is returned unchanged, so old rows still read.
+
+PACKED_PREFIX = 'zlib64:'
+MIN_COMPRESS_CHARS = 64
+DICTIONARY_SIZE = 32 * 1024  # zlib only uses the last 32 KB of a dictionary
+
+_dictionaries = {}       # dictionary id -> bytes
+_active = {'id': None}   # dictionary used for new values
+_dictionary_dir = {'path': None}
+_lock = threading.Lock()
+
+stats = {
+    'packed_values': 0,
+    'raw_bytes': 0,
+    'packed_bytes': 0
+}
+
+
+def dictionary_id(data):
+    return zlib.crc32(data) & 0xffffffff
+
+
+def use_dictionary_dir(path):
+    """Load dictionaries from path; the newest one compresses new values"""
+    _dictionary_dir['path'] = path
+    if not path or not os.path.isdir(path):
+        return
+    files = sorted(
+        (name for name in os.listdir(path) if name.endswith('.zdict')),
+        key=lambda name: os.path.getmtime(os.path.join(path, name))
+    )
+    for name in files:
+        with open(os.path.join(path, name), 'rb') as f:
+            data = f.read()
+        _dictionaries[dictionary_id(data)] = data
+        _active['id'] = dictionary_id(data)
+
+
+def _get_dictionary(dict_id):
+    data = _dictionaries.get(dict_id)
+    if data is None and _dictionary_dir['path']:
+        path = os.path.join(_dictionary_dir['path'], f'{dict_id:08x}.zdict')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = _dictionaries[dict_id] = f.read()
+    if data is None:
+        raise ValueError(f"Missing lyrics compression dictionary {dict_id:08x}")
+    return data
+
+
+def compress_lyrics(text):
+    """Compress text to header + zlib bytes"""
+    raw = text.encode('utf-8')
+    dict_id = _active['id']
+    if dict_id is None:
+        return b'\x00' + zlib.compress(raw, 9)
+    compressor = zlib.compressobj(9, zdict=_dictionaries[dict_id])
+    return b'\x01' + struct.pack('>I', dict_id) + compressor.compress(raw) + compressor.flush()
+
+
+def decompress_lyrics(blob):
+    if blob[:1] == b'\x00':
+        return zlib.decompress(blob[1:]).decode('utf-8')
+    if blob[:1] == b'\x01':
+        dict_id = struct.unpack('>I', blob[1:5])[0]
+        decompressor = zlib.decompressobj(zdict=_get_dictionary(dict_id))
+        return (decompressor.decompress(blob[5:]) + decompressor.flush()).decode('utf-8')
+    raise ValueError("Unknown lyrics compression header")
+
+
+def pack_lyrics(text):
+    """Compress lyrics into a storable string when that makes them smaller"""
+    if not text or (len(text) < MIN_COMPRESS_CHARS and not text.startswith(PACKED_PREFIX)):
+        return text
+    packed = PACKED_PREFIX + base64.b64encode(compress_lyrics(text)).decode('ascii')
+    raw_bytes = len(text.encode('utf-8'))
+    if len(packed) >= raw_bytes and not text.startswith(PACKED_PREFIX):
+        return text
+    with _lock:
+        stats['packed_values'] += 1
+        stats['raw_bytes'] += raw_bytes
+        stats['packed_bytes'] += len(packed)
+    return packed
+
+
+def unpack_lyrics(value):
+    """Inverse of pack_lyrics; plain strings pass through"""
+    if not value or not value.startswith(PACKED_PREFIX):
+        return value
+    return decompress_lyrics(base64.b64decode(value[len(PACKED_PREFIX):]))
+
+
+def compression_stats():
+    with _lock:
+        result = dict(stats)
+    result['ratio'] = round(result['raw_bytes'] / result['packed_bytes'], 2) if result['packed_bytes'] else None
+    result['dictionary_id'] = f"{_active['id']:08x}" if _active['id'] is not None else None
+    return result
+
+
+def train_dictionary(samples, size=DICTIONARY_SIZE):
+    """Build a zlib dictionary from lines that recur across many songs
+
+    zlib favours matches near the end of the dictionary, so the most valuable
+    lines (frequency x length) go last.
+    """
+    counts = Counter()
+    for text in samples:
+        if text:
+            counts.update(set(line.strip() for line in text.splitlines() if len(line.strip()) > 3))
+    ranked = sorted(
+        ((line, n) for line, n in counts.items() if n > 1),
+        key=lambda item: item[1] * len(item[0])
+    )
+    chunks = []
+    total = 0
+    for line, _ in reversed(ranked):
+        encoded = (line + '\n').encode('utf-8')
+        if total + len(encoded) > size:
+            break
+        chunks.append(encoded)
+        total += len(encoded)
+    return b''.join(reversed(chunks))
+
+
+def save_dictionary(data, path):
+    """Write a dictionary into the dictionary directory and make it active"""
+    os.makedirs(path, exist_ok=True)
+    dict_id = dictionary_id(data)
+    with open(os.path.join(path, f'{dict_id:08x}.zdict'), 'wb') as f:
+        f.write(data)
+    _dictionaries[dict_id] = data
+    _active['id'] = dict_id
+    return dict_id
+
+
+if __name__ == '__main__':
+    # python lyrics_compression.py train [lyrics_cache.db] [lyrics_zdict]
+    if len(sys.argv) < 2 or sys.argv[1] != 'train':
+        print("usage: python lyrics_compression.py train [lyrics_cache.db] [dictionary dir]")
+        sys.exit(1)
+    from lyrics_store import SqliteLyricsStore
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'lyrics_cache.db'
+    dict_dir = sys.argv[3] if len(sys.argv) > 3 else 'lyrics_zdict'
+    use_dictionary_dir(dict_dir)
+    samples = [unpack_lyrics(entry.get('lyrics')) for _, entry in SqliteLyricsStore(db_path).items()]
+    data = train_dictionary(samples)
+    if not data:
+        print("Not enough repeated lines to train a dictionary")
+        sys.exit(1)
+    print(f"Trained dictionary {save_dictionary(data, dict_dir):08x} ({len(data)} bytes) from {len(samples)} songs")
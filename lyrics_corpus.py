@@ -0,0 +1,212 @@
+import bisect
+import re
+from array import array
+
+import numpy as np
+
+from content_filter import BASE_LANGUAGE, fold, merge_lexicons
+
+# ----------------------
+# Vectorized Lyrics Corpus
+# ----------------------
+# Stored lyrics are tokenized once into a single int32 array over an interned
+# vocabulary (one id per distinct folded word), with each song a [start, end)
+# slice of it and its detected language kept alongside. Scoring a filter
+# policy then never touches the text again: each term becomes a set of
+# vocabulary ids, each language's lexicon a row of per-word category bits,
+# and one gather plus a cumulative sum per category counts every song's hits
+# at once.
+#
+# Words and terms follow the content filter's rules (folded, whole words,
+# "kill*" for any word starting with "kill"), so a policy gives the same
+# verdicts here as MultilingualFilter gives song by song. Multi-word terms
+# match consecutive words only where the text between them is exactly the
+# term's ("ta gueule" matches "Ta Gueule" but not "ta-gueule"), so the text
+# between each word and the one before it is interned alongside the tokens.
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def words_and_gaps(text):
+    """(word, text since the previous word) for each folded whole word of text; the first gap is None
+
+    Words split where the content filter sees a word boundary.
+    """
+    folded = fold(text)
+    previous_end = None
+    for match in _WORD.finditer(folded):
+        yield match.group(), None if previous_end is None else folded[previous_end:match.start()]
+        previous_end = match.end()
+
+
+class Vocabulary:
+    """Interned words: each distinct word gets the next integer id"""
+
+    def __init__(self):
+        self.ids = {}
+        self.words = []
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.words)
+
+    def intern(self, word):
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = self.ids[word] = len(self.words)
+            self.words.append(word)
+            self._sorted = None
+        return word_id
+
+    def matching(self, word, prefix=False):
+        """Ids of the word, or of every word starting with it"""
+        if not prefix:
+            word_id = self.ids.get(word)
+            return [] if word_id is None else [word_id]
+        if self._sorted is None:
+            self._sorted = sorted(self.words)
+        start = bisect.bisect_left(self._sorted, word)
+        end = bisect.bisect_left(self._sorted, word + '\U0010ffff')
+        return [self.ids[match] for match in self._sorted[start:end]]
+
+
+class PolicyVerdicts:
+    """One policy's outcome for every song in a corpus"""
+
+    def __init__(self, song_ids, categories, counts):
+        self.song_ids = song_ids
+        self.categories = categories
+        # counts[song, category]: how many of the song's words hit that category
+        self.counts = counts
+        self.is_clean = ~counts.any(axis=1)
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def summary(self):
+        return {
+            'songs': len(self),
+            'flagged': int((~self.is_clean).sum()),
+            'by_category': {category: int((self.counts[:, index] > 0).sum())
+                            for index, category in enumerate(self.categories)}
+        }
+
+
+class LyricsCorpus:
+    """Every song's lyrics as slices of one token array, tokenized once"""
+
+    def __init__(self, detector=None):
+        self.detector = detector
+        self.vocabulary = Vocabulary()
+        self.song_ids = []
+        self.languages = []
+        self._tokens = array('i')
+        # Id of the separator before each token (-1 for a song's first word), for multi-word terms
+        self._gaps = array('i')
+        self._gap_ids = {}
+        self._bounds = [0]
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def add(self, song_id, lyrics):
+        """Tokenize one song's lyrics into the corpus"""
+        intern = self.vocabulary.intern
+        gap_ids = self._gap_ids
+        for word, gap in words_and_gaps(lyrics or ''):
+            self._tokens.append(intern(word))
+            self._gaps.append(-1 if gap is None else gap_ids.setdefault(gap, len(gap_ids)))
+        self._bounds.append(len(self._tokens))
+        self.song_ids.append(song_id)
+        language = self.detector.detect(lyrics)[0] if self.detector and lyrics else None
+        self.languages.append(language)
+        self._arrays = None
+
+    @classmethod
+    def build(cls, songs, detector=None):
+        """Corpus of (song_id, lyrics) pairs"""
+        corpus = cls(detector)
+        for song_id, lyrics in songs:
+            corpus.add(song_id, lyrics)
+        return corpus
+
+    @property
+    def arrays(self):
+        """(tokens, song bounds, song of each token, gap before each token), as NumPy arrays"""
+        if self._arrays is None:
+            tokens = np.frombuffer(self._tokens, dtype=np.int32) if self._tokens else np.zeros(0, np.int32)
+            gaps = np.frombuffer(self._gaps, dtype=np.int32) if self._gaps else np.zeros(0, np.int32)
+            bounds = np.array(self._bounds, dtype=np.int64)
+            song_of = np.repeat(np.arange(len(self.song_ids), dtype=np.int32), np.diff(bounds))
+            self._arrays = (tokens, bounds, song_of, gaps)
+        return self._arrays
+
+    def stats(self):
+        return {
+            'songs': len(self),
+            'tokens': len(self._tokens),
+            'vocabulary': len(self.vocabulary),
+            'languages': {language or 'unknown': self.languages.count(language) for language in set(self.languages)}
+        }
+
+    def score(self, lexicons, base_language=BASE_LANGUAGE):
+        """PolicyVerdicts for per-language lexicons, picked per song as MultilingualFilter does
+
+        Each language's lexicon also carries the base language's terms; songs in
+        no known language get every lexicon merged.
+        """
+        tokens, bounds, song_of, _ = self.arrays
+        base = lexicons.get(base_language, {})
+        languages = list(lexicons)
+        policies = [merge_lexicons(base, lexicons[language]) for language in languages]
+        policies.append(merge_lexicons(*lexicons.values()))
+        categories = sorted({category for policy in policies for category in policy})
+        if len(categories) > 64:
+            raise ValueError(f"At most 64 filter categories can be scored at once, got {len(categories)}")
+
+        # bits[policy, word]: the categories a single word hits under each policy
+        bits = np.zeros((len(policies), len(self.vocabulary)), dtype=np.uint64)
+        phrases = []
+        for row, policy in enumerate(policies):
+            for category, terms in policy.items():
+                bit = np.uint64(1 << categories.index(category))
+                for term in terms:
+                    term_words = list(words_and_gaps(term.rstrip('*')))
+                    if len(term_words) == 1:
+                        bits[row, self.vocabulary.matching(term_words[0][0], term.endswith('*'))] |= bit
+                    elif term_words:
+                        phrases.append((row, categories.index(category), term_words, term.endswith('*')))
+
+        fallback = len(languages)
+        song_policy = np.array([languages.index(language) if language in lexicons else fallback
+                                for language in self.languages], dtype=np.int32)
+        token_bits = bits[song_policy[song_of], tokens] if len(tokens) else np.zeros(0, np.uint64)
+
+        counts = np.zeros((len(self), len(categories)), dtype=np.int32)
+        for index in range(len(categories)):
+            hits = ((token_bits >> np.uint64(index)) & np.uint64(1)).astype(np.int32)
+            running = np.concatenate(([0], np.cumsum(hits)))
+            counts[:, index] = running[bounds[1:]] - running[bounds[:-1]]
+        for row, index, term_words, prefix in phrases:
+            self._count_phrase(counts, row, index, term_words, prefix, song_policy)
+        return PolicyVerdicts(np.array(self.song_ids), categories, counts)
+
+    def _count_phrase(self, counts, row, index, term_words, prefix, song_policy):
+        tokens, _, song_of, gaps = self.arrays
+        span = len(term_words)
+        if len(tokens) < span:
+            return
+        # Positions where every word of the phrase follows in order, with the phrase's separators, within one song
+        starts = np.ones(len(tokens) - span + 1, dtype=bool)
+        for offset, (word, gap) in enumerate(term_words):
+            window = slice(offset, len(tokens) - span + 1 + offset)
+            ids = self.vocabulary.matching(word, prefix and offset == span - 1)
+            starts &= np.isin(tokens[window], ids)
+            if offset:
+                # -2 when no song has this separator anywhere
+                starts &= gaps[window] == self._gap_ids.get(gap, -2)
+        starts &= song_of[:len(starts)] == song_of[span - 1:]
+        songs = song_of[:len(starts)][starts]
+        songs = songs[song_policy[songs] == row]
+        np.add.at(counts[:, index], songs, 1)
@@ -0,0 +1,502 @@
+import codecs
+import html
+import os
+import re
+import time
+import urllib.parse
+
+import eventlet
+import requests
+from eventlet.queue import LightQueue, Empty
+
+import http_client
+from deadline import Deadline
+from provider_stats import ProviderScoreboard, OUTCOME_SUCCESS, OUTCOME_MISS, OUTCOME_ERROR
+
+# ----------------------
+# Lyrics Provider Registry & Fetch Engine
+# ----------------------
+# Every lyrics source is a LyricsProvider: it builds its request, parses the
+# response and decides whether what came back is usable lyrics. Providers
+# register themselves in PROVIDERS; LyricsEngine runs them on green threads
+# for the request path (fetch), DJ refreshes and the API test route (probe).
+#
+# Each provider's base_url can be pointed elsewhere (a mirror, or the stub
+# servers in benchmarks/) with LYRICS_PROVIDER_URLS="LRCLIB=http://...,...".
+
+LYRICS_PROVIDER_URLS = os.getenv('LYRICS_PROVIDER_URLS', '')
+# How far (seconds) a search result's duration may be from the Spotify track's
+LYRICS_DURATION_TOLERANCE = float(os.getenv('LYRICS_DURATION_TOLERANCE', 3))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class LyricsPending(Exception):
+    """No verdict yet: the providers were throttled, cooling down or out of time, which is not a miss"""
+
+
+class TrackSignature:
+    """What we know about the recording beyond artist and title, for providers that can match on it"""
+
+    def __init__(self, album=None, duration=None, artists=()):
+        self.album = album or None
+        self.duration = duration  # seconds
+        self.artists = list(artists)
+
+
+def _folded(text):
+    return ' '.join((text or '').lower().split())
+
+
+class LyricsProvider:
+    """Base provider: subclasses set name and implement build_request/parse
+
+    Both also get the song's TrackSignature (or None) as `track`.
+    """
+
+    name = None
+    base_url = None
+    timeout = 10
+    min_length = 50
+    rate_limit = None  # requests per second to the provider's host, unless HTTP_RATE_LIMITS sets one
+    fetch = True  # False keeps the provider to /test-lyrics-apis only
+
+    def build_request(self, artist, title, track=None):
+        """Keyword arguments for http_client.request(): method, url, headers, params..."""
+        raise NotImplementedError
+
+    def parse(self, response, artist, title, track=None):
+        """Lyrics text from a 200 response ('' when there are none)"""
+        raise NotImplementedError
+
+    def validate(self, lyrics):
+        return bool(lyrics) and len(lyrics.strip()) > self.min_length
+
+
+class JsonLyricsProvider(LyricsProvider):
+    """GET a URL template (relative to base_url) and read the lyrics from one JSON field"""
+
+    url = None
+    field = 'lyrics'
+
+    def build_request(self, artist, title, track=None):
+        return {
+            'method': 'GET',
+            'url': self.url.format(
+                base_url=self.base_url,
+                artist=urllib.parse.quote(artist.lower().strip()),
+                title=urllib.parse.quote(title.lower().strip())
+            ),
+            'headers': {'User-Agent': USER_AGENT, 'Accept': 'application/json'}
+        }
+
+    def parse(self, response, artist, title, track=None):
+        return response.json().get(self.field, '') or ''
+
+
+class LyricsOvhProvider(JsonLyricsProvider):
+    name = 'Lyrics.ovh'
+    base_url = 'https://api.lyrics.ovh'
+    url = '{base_url}/v1/{artist}/{title}'
+
+
+class LrclibProvider(JsonLyricsProvider):
+    """LRCLIB's exact-match endpoint, given album and duration whenever Spotify supplied them"""
+
+    name = 'LRCLIB'
+    base_url = 'https://lrclib.net'
+    field = 'plainLyrics'
+
+    def build_request(self, artist, title, track=None):
+        params = {'artist_name': artist.lower().strip(), 'track_name': title.lower().strip()}
+        if track and track.album:
+            params['album_name'] = track.album
+        if track and track.duration:
+            # LRCLIB matches durations within +/- 2 seconds
+            params['duration'] = int(round(track.duration))
+        return {
+            'method': 'GET',
+            'url': f"{self.base_url}/api/get",
+            'params': params,
+            'headers': {'User-Agent': USER_AGENT, 'Accept': 'application/json'}
+        }
+
+
+class LrclibSearchProvider(LrclibProvider):
+    """LRCLIB search, keeping the candidate closest to the track's duration
+
+    Catches what the exact match misses (album named differently, featured
+    artists in the credit) in one more LRCLIB call instead of a page scrape.
+    Without a duration the first candidate by one of the track's artists wins.
+    """
+
+    name = 'LRCLIB Search'
+
+    def build_request(self, artist, title, track=None):
+        return {
+            'method': 'GET',
+            'url': f"{self.base_url}/api/search",
+            'params': {'artist_name': artist.lower().strip(), 'track_name': title.lower().strip()},
+            'headers': {'User-Agent': USER_AGENT, 'Accept': 'application/json'}
+        }
+
+    def parse(self, response, artist, title, track=None):
+        artists = {_folded(name) for name in (track.artists if track else [])} | {_folded(artist)}
+        album = _folded(track.album) if track else ''
+        best, best_key = None, None
+        for candidate in response.json() or []:
+            if not candidate.get(self.field):
+                continue
+            credited = _folded(candidate.get('artistName'))
+            if not any(name and name in credited for name in artists):
+                continue
+            if track and track.duration:
+                if candidate.get('duration') is None:
+                    continue
+                off_by = abs(candidate['duration'] - track.duration)
+                if off_by > LYRICS_DURATION_TOLERANCE:
+                    continue
+            else:
+                off_by = 0
+            # Same album first, then the closest duration
+            key = (_folded(candidate.get('albumName')) != album, off_by)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best[self.field] if best else ''
+
+
+class AZLyricsProvider(LyricsProvider):
+    """Scrape the lyrics block out of an AZLyrics song page
+
+    The page is streamed: reading stops as soon as the lyrics block closes, or
+    after max_bytes if it never shows up, so most of the page (and all of a
+    wrong or oversized one) is never downloaded or decoded.
+    """
+
+    name = 'AZLyrics'
+    base_url = 'https://www.azlyrics.com'
+    min_length = 100
+    rate_limit = 0.5
+    max_bytes = int(os.getenv('AZLYRICS_MAX_BYTES', 512 * 1024))
+    chunk_size = 16 * 1024
+
+    _BLOCK_START = ('<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited by our '
+                    'licensing agreement. Sorry. -->')
+    _BLOCK_END = '</div>'
+    _BREAK = re.compile(r'<br\s*/?>\n?')
+    _TAG = re.compile(r'<.*?>')
+    _BLANK_LINES = re.compile(r'\n\s*\n')
+
+    @staticmethod
+    def _slug(text):
+        # AZLyrics URLs are lowercase alphanumerics only, without a leading "the"
+        return re.sub(r'[^a-z0-9]', '', re.sub(r'^the\s+', '', text.lower().replace('&', 'and')))
+
+    def build_request(self, artist, title, track=None):
+        return {
+            'method': 'GET',
+            'url': f"{self.base_url}/lyrics/{self._slug(artist)}/{self._slug(title)}.html",
+            'headers': {'User-Agent': USER_AGENT + ' (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'},
+            'stream': True
+        }
+
+    def extract_block(self, chunks, encoding=None):
+        """Text between the lyrics start marker and the next </div>, or None"""
+        decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        buffer = ''
+        in_block = False
+        scanned = 0
+        received = 0
+        for chunk in chunks:
+            received += len(chunk)
+            buffer += decoder.decode(chunk)
+            if not in_block:
+                start = buffer.find(self._BLOCK_START)
+                if start < 0:
+                    # Keep just enough of the tail for a marker split across chunks
+                    buffer = buffer[-len(self._BLOCK_START):]
+                else:
+                    buffer = buffer[start + len(self._BLOCK_START):]
+                    in_block = True
+            if in_block:
+                end = buffer.find(self._BLOCK_END, scanned)
+                if end >= 0:
+                    return buffer[:end]
+                scanned = max(0, len(buffer) - len(self._BLOCK_END))
+            if received >= self.max_bytes:
+                print(f"✂️  {self.name} page exceeded {self.max_bytes} bytes without a complete lyrics block")
+                return None
+        return None
+
+    def parse(self, response, artist, title, track=None):
+        block = self.extract_block(response.iter_content(self.chunk_size), response.encoding)
+        if not block:
+            return ''
+        lyrics = self._BREAK.sub('\n', block.strip())
+        lyrics = html.unescape(self._TAG.sub('', lyrics))
+        return self._BLANK_LINES.sub('\n\n', lyrics).strip()
+
+
+class GeniusSearchProvider(JsonLyricsProvider):
+    """Genius search only confirms the song exists; it never returns the lyrics text"""
+
+    name = 'Genius Proxy'
+    base_url = 'https://genius.com'
+    url = '{base_url}/api/search/song?q={artist}%20{title}'
+    fetch = False
+
+    def parse(self, response, artist, title, track=None):
+        data = response.json()
+        for section in (data.get('response') or {}).get('sections') or []:
+            for hit in section.get('hits') or []:
+                result = hit.get('result') or {}
+                if (result.get('artist_names', '').lower() == artist.lower() or
+                        result.get('title', '').lower() == title.lower()):
+                    return f"Lyrics available on Genius for '{result.get('title', '')}' by {result.get('artist_names', '')}"
+        return ''
+
+
+class VanillaProvider(JsonLyricsProvider):
+    name = 'Vanilla API'
+    base_url = 'https://vanilla.works.gd'
+    url = '{base_url}/api/lyrics?artist={artist}&song={title}'
+    fetch = False
+
+
+class SomeRandomApiProvider(JsonLyricsProvider):
+    name = 'Some Random API'
+    base_url = 'https://some-random-api.com'
+    url = '{base_url}/lyrics?title={title}'
+    fetch = False
+
+
+class LyristProvider(JsonLyricsProvider):
+    name = 'Lyrist (Vercel)'
+    base_url = 'https://lyrist.vercel.app'
+    url = '{base_url}/api/{artist}/{title}'
+    fetch = False
+
+
+# Registration order is the fallback priority until the scoreboard has data
+PROVIDERS = {}
+
+
+def register_provider(provider):
+    PROVIDERS[provider.name] = provider
+    return provider
+
+
+for _provider in (LyricsOvhProvider(), LrclibProvider(), LrclibSearchProvider(), AZLyricsProvider(),
+                  GeniusSearchProvider(), VanillaProvider(), SomeRandomApiProvider(), LyristProvider()):
+    register_provider(_provider)
+
+
+def set_base_urls(urls):
+    """Point providers at other hosts: {provider name: base URL}"""
+    for name, base_url in urls.items():
+        if name not in PROVIDERS:
+            raise KeyError(f"Unknown lyrics provider: {name}")
+        PROVIDERS[name].base_url = base_url.rstrip('/')
+
+
+def parse_base_urls(spec):
+    """{provider name: base URL} from 'name=url,...'"""
+    urls = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, base_url = item.partition('=')
+        urls[name.strip()] = base_url.strip()
+    return urls
+
+
+set_base_urls(parse_base_urls(LYRICS_PROVIDER_URLS))
+
+
+def get_providers(fetch_only=False):
+    return [p for p in PROVIDERS.values() if p.fetch or not fetch_only]
+
+
+def provider_outcome(status_code):
+    """Scoreboard outcome for a non-200 status: blocked, throttled or broken counts as an error"""
+    return OUTCOME_ERROR if status_code >= 500 or status_code in (403, 429) else OUTCOME_MISS
+
+
+class ProviderResult:
+    """What one provider request produced"""
+
+    def __init__(self, provider, lyrics=None, outcome=OUTCOME_MISS, seconds=0.0, status=None, error=None, url=None):
+        self.provider = provider
+        self.lyrics = lyrics
+        self.outcome = outcome
+        self.seconds = seconds
+        self.status = status
+        self.error = error
+        self.url = url
+        self.throttled = False
+        self.cut_short = False  # the caller's deadline, not the provider, ended it
+
+    @property
+    def ok(self):
+        return self.outcome == OUTCOME_SUCCESS
+
+    @property
+    def inconclusive(self):
+        return self.throttled or self.cut_short
+
+
+class LyricsEngine:
+    """Runs registered providers on green threads, feeding and following the scoreboard
+
+    mode: 'sequential' (next provider only after a failure), 'parallel' (all at
+    once) or 'hedged' (the next one also starts after hedge_delay seconds).
+    """
+
+    def __init__(self, providers=None, scoreboard=None, mode='hedged', hedge_delay=1.5, deadline=12.0):
+        self.providers = providers if providers is not None else PROVIDERS
+        self.scoreboard = scoreboard or ProviderScoreboard()
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+
+    def query(self, provider, artist, title, record=True, deadline=None, track=None):
+        """One provider request, validated and recorded on the scoreboard
+
+        With a deadline the socket timeout is whatever is left of it (up to the
+        provider's own timeout); a request that deadline cuts short says
+        nothing about the provider, so it isn't recorded.
+        """
+        spec = provider.build_request(artist, title, track)
+        method, url = spec.pop('method', 'GET'), spec.pop('url')
+        result = ProviderResult(provider.name, url=url)
+        spec['timeout'] = provider.timeout
+        if deadline is not None:
+            if deadline.expired():
+                result.error, result.cut_short = 'DeadlineExceeded', True
+                return result
+            spec['timeout'] = min(provider.timeout, deadline.remaining())
+        if provider.rate_limit:
+            http_client.client.default_rate_limit(urllib.parse.urlsplit(url).netloc, provider.rate_limit)
+        started = time.monotonic()
+        try:
+            print(f"🔍 Trying {provider.name}...")
+            response = http_client.client.request(method, url, deadline=deadline, **spec)
+            try:
+                result.status = response.status_code
+                if response.status_code == 200:
+                    lyrics = provider.parse(response, artist, title, track)
+                    if provider.validate(lyrics):
+                        print(f"✅ Success with {provider.name} - {len(lyrics)} characters")
+                        result.lyrics, result.outcome = lyrics, OUTCOME_SUCCESS
+                    else:
+                        print(f"⚠️  {provider.name} returned insufficient lyrics")
+                else:
+                    print(f"❌ {provider.name} returned {response.status_code}")
+                    result.outcome, result.error = provider_outcome(response.status_code), f"HTTP {response.status_code}"
+            finally:
+                # Streamed responses hold their connection until closed (also when a hedge loser is killed)
+                response.close()
+        except http_client.RateLimited as e:
+            # Our own throttle said no: the provider wasn't asked, so nothing to score
+            print(f"🚦 {provider.name} skipped: {str(e)}")
+            result.error, result.throttled = 'RateLimited', True
+            return result
+        except requests.exceptions.Timeout as e:
+            if spec['timeout'] < provider.timeout:
+                # Timed out on what was left of the caller's deadline, not the provider's own timeout
+                print(f"⏱️  {provider.name} cut short by the deadline")
+                result.error, result.cut_short = 'DeadlineExceeded', True
+                return result
+            print(f"💥 {provider.name} failed: {str(e)}")
+            result.outcome, result.error = OUTCOME_ERROR, type(e).__name__
+        except Exception as e:
+            print(f"💥 {provider.name} failed: {str(e)}")
+            result.outcome, result.error = OUTCOME_ERROR, type(e).__name__
+        result.seconds = time.monotonic() - started
+        # Losers killed by race() never get here, so they don't skew the stats
+        if record:
+            self.scoreboard.record(provider.name, result.outcome, result.seconds, result.error)
+        return result
+
+    def race(self, providers, artist, title, hedge_delay, deadline, track=None):
+        """Return (winning ProviderResult or None, inconclusive)
+
+        Providers start in the given order: the next one starts as soon as a
+        running one fails, or after hedge_delay seconds without an answer (0
+        starts them all at once, None never hedges). Providers still running
+        when a winner arrives or the Deadline passes are killed. The outcome is
+        inconclusive when the deadline passed, cut a provider short or a
+        provider was rate limited.
+        """
+        results = LightQueue()
+        pending = list(providers)
+        running = []
+        outstanding = 0
+        inconclusive = False
+
+        def launch():
+            provider = pending.pop(0)
+            running.append(eventlet.spawn(
+                lambda: results.put(self.query(provider, artist, title, deadline=deadline, track=track))
+            ))
+            return 1
+
+        try:
+            outstanding += launch()
+            while hedge_delay == 0 and pending:
+                outstanding += launch()
+
+            while outstanding:
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    return None, True
+                wait = min(remaining, hedge_delay) if pending and hedge_delay else remaining
+                try:
+                    result = results.get(timeout=wait)
+                except Empty:
+                    if pending and hedge_delay:
+                        print(f"⏩ Hedging with {pending[0].name}")
+                        outstanding += launch()
+                    continue
+
+                outstanding -= 1
+                if result.ok:
+                    return result, False
+                inconclusive = inconclusive or result.inconclusive
+                if pending:
+                    outstanding += launch()
+            return None, inconclusive
+        finally:
+            for green_thread in running:
+                green_thread.kill()
+
+    def fetch(self, artist, title, deadline=None, track=None):
+        """Best lyrics for a song from the fetch providers: (lyrics, provider name, inconclusive)
+
+        track is the song's TrackSignature, for providers that can match on it.
+        Runs until the engine's own deadline or the caller's Deadline, whichever
+        comes first. Returns (None, None, True) when nothing could be asked, a
+        provider was rate limited or the deadline passed, i.e. when the absence
+        of lyrics is not a confirmed miss.
+        """
+        deadline = deadline.capped(self.deadline) if deadline is not None else Deadline(self.deadline, 'lyrics fetch')
+        if deadline.expired():
+            return None, None, True
+        providers = self.scoreboard.order(
+            [p for p in self.providers.values() if p.fetch],
+            key=lambda provider: provider.name
+        )
+        if not providers:
+            print("🚧 Every lyrics provider is cooling down")
+            return None, None, True
+        print(f"📊 Provider order: {', '.join(p.name for p in providers)}")
+
+        hedge_delay = {'sequential': None, 'parallel': 0}.get(self.mode, self.hedge_delay)
+        result, inconclusive = self.race(providers, artist, title, hedge_delay, deadline, track)
+        if result:
+            return result.lyrics, result.provider, False
+        return None, None, inconclusive
+
+    def probe(self, artist, title, providers=None):
+        """Query every provider at once (fetch or not) and return all results in registry order"""
+        providers = list(providers if providers is not None else self.providers.values())
+        pool = eventlet.GreenPool(max(1, len(providers)))
+        return list(pool.imap(lambda provider: self.query(provider, artist, title), providers))
@@ -0,0 +1,157 @@
+import re
+import sys
+import threading
+import unicodedata
+
+# ----------------------
+# Artist/Title Normalization
+# ----------------------
+# "Song - Remastered 2011", "Song (feat. X)" and "Sóng!" should all share one
+# lyrics cache entry and one provider query.
+
+# Letters NFKD does not decompose
+_FOLD_TABLE = str.maketrans({
+    'ø': 'o', 'Ø': 'o', 'æ': 'ae', 'Æ': 'ae', 'œ': 'oe', 'Œ': 'oe',
+    'đ': 'd', 'Đ': 'd', 'ł': 'l', 'Ł': 'l', 'þ': 'th', 'Þ': 'th',
+    '’': "'", '‘': "'", '“': '"', '”': '"', '–': '-', '—': '-'
+})
+
+_VERSION_WORDS = (
+    r'remaster(?:ed)?(?:\s+\d{4})?|\d{4}\s+remaster(?:ed)?|live(?:\s+(?:at|from|in)\b.*)?|'
+    r'(?:radio|single|album|extended|original)\s+(?:edit|version|mix)|'
+    r'(?:acoustic|demo|mono|stereo|deluxe|explicit|clean|bonus\s+track)(?:\s+version)?|'
+    r'[\w\s]*\bversion|[\w\s]*\bedit'
+)
+_FEAT = r'(?:feat\.?|ft\.?|featuring|with)\s'
+
+_BRACKETED = re.compile(r'\s*[\(\[]\s*(?:' + _FEAT + r'[^\)\]]*|(?:' + _VERSION_WORDS + r'))\s*[\)\]]', re.IGNORECASE)
+_DASH_SUFFIX = re.compile(r'\s+-\s+(?:' + _FEAT + r'.*|(?:' + _VERSION_WORDS + r')(?:\s*-.*)?)$', re.IGNORECASE)
+_INLINE_FEAT = re.compile(r'\s+(?:feat\.?|ft\.?|featuring)\s.*$', re.IGNORECASE)
+_ARTIST_FEAT = re.compile(r'\s+[\(\[]?(?:feat\.?|ft\.?|featuring)\s.*$', re.IGNORECASE)
+_NON_WORD = re.compile(r"[^\w]+")
+_LEADING_THE = re.compile(r'^the\s+')
+
+
+def fold_text(text):
+    """Lowercase and strip accents: 'Beyoncé' -> 'beyonce'"""
+    text = unicodedata.normalize('NFKD', text.translate(_FOLD_TABLE))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return text.casefold()
+
+
+def _collapse(text):
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def primary_artist(artist):
+    """Artist without featured guests: 'A feat. B' -> 'A'
+
+    Commas and '&' are part of many names ('Earth, Wind & Fire', 'Tyler, The
+    Creator'), so they are never split on; Spotify's artist list already
+    separates co-credited artists.
+    """
+    if not artist:
+        return ''
+    return _ARTIST_FEAT.sub('', artist.strip()).strip() or artist.strip()
+
+
+def clean_title(title):
+    """Drop featured artists and remaster/live/version suffixes, keeping the original casing"""
+    if not title:
+        return ''
+    cleaned = title.strip()
+    previous = None
+    while cleaned != previous:
+        previous = cleaned
+        cleaned = _BRACKETED.sub('', cleaned)
+        cleaned = _DASH_SUFFIX.sub('', cleaned)
+    cleaned = _INLINE_FEAT.sub('', cleaned).strip()
+    return cleaned or title.strip()
+
+
+def normalize_artist(artist):
+    return _LEADING_THE.sub('', _collapse(fold_text(primary_artist(artist))))
+
+
+def normalize_title(title):
+    return _collapse(fold_text(clean_title(title)))
+
+
+def song_cache_key(artist, title):
+    """Canonical lyrics cache key shared by every variant of a track"""
+    return f"{normalize_artist(artist)}_{normalize_title(title)}"
+
+
+def legacy_cache_key(artist, title):
+    """Key used before normalization, kept so old cache entries are still found"""
+    return f"{artist.lower()}_{title.lower()}"
+
+
+def query_artist(artist):
+    """Artist to send to lyrics providers"""
+    return primary_artist(artist)
+
+
+def query_title(title):
+    """Title to send to lyrics providers"""
+    return clean_title(title)
+
+
+# ----------------------
+# Hit-Rate Report
+# ----------------------
+_lock = threading.Lock()
+_counters = {
+    'lookups': 0,
+    'hits': 0,
+    'normalized_hits': 0,  # hits the old lowercase key would have missed
+    'legacy_hits': 0       # hits only found under an old-style key (then re-keyed)
+}
+
+
+def record_lookup(hit, normalized_only=False, legacy=False):
+    with _lock:
+        _counters['lookups'] += 1
+        if hit:
+            _counters['hits'] += 1
+        if normalized_only:
+            _counters['normalized_hits'] += 1
+        if legacy:
+            _counters['legacy_hits'] += 1
+
+
+def hit_rate_report():
+    with _lock:
+        report = dict(_counters)
+    report['hit_rate'] = round(report['hits'] / report['lookups'], 3) if report['lookups'] else None
+    return report
+
+
+def key_collapse_report(pairs):
+    """How many stored (artist, title) pairs fold into the same canonical key"""
+    canonical = {}
+    total = 0
+    for artist, title in pairs:
+        total += 1
+        canonical.setdefault(song_cache_key(artist, title), []).append(f"{artist} - {title}")
+    merged = {key: names for key, names in canonical.items() if len(names) > 1}
+    return {
+        'entries': total,
+        'canonical_keys': len(canonical),
+        'merged_examples': dict(list(merged.items())[:20])
+    }
+
+
+if __name__ == '__main__':
+    # python lyrics_normalize.py [lyrics_cache.db]
+    from lyrics_store import SqliteLyricsStore
+
+    store = SqliteLyricsStore(sys.argv[1] if len(sys.argv) > 1 else 'lyrics_cache.db')
+    pairs = [
+        (entry['artist'], entry['title']) for _, entry in store.items()
+        if entry.get('artist') and entry.get('title')
+    ]
+    report = key_collapse_report(pairs)
+    print(f"{report['entries']} entries -> {report['canonical_keys']} canonical keys")
+    for key, names in report['merged_examples'].items():
+        print(f"  {key}: {names}")
@@ -0,0 +1,170 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+# ----------------------
+# Memory-Mapped Lyrics Snapshot
+# ----------------------
+# An immutable, read-only file that every worker maps into memory, so N
+# gunicorn workers share one copy of the cached lyrics in the page cache
+# instead of each parsing its own.
+#
+# Layout (little-endian):
+#   header   8s magic | I count | I seq | Q index_offset
+#   data     key bytes and JSON-encoded entries, back to back
+#   index    count x (Q key_offset | I key_len | Q value_offset | I value_len),
+#            sorted by key bytes for binary search
+#
+# A single writer builds the file under a temporary name and renames it over
+# the old one, so readers only ever see complete snapshots. seq is the lyrics
+# store's write sequence when publishing started (0 if unknown): any key the
+# store has written since then may be newer than its snapshot copy.
+
+MAGIC = b'LYRSNAP1'
+_HEADER = struct.Struct('<8sIIQ')
+_INDEX = struct.Struct('<QIQI')
+
+
+def write_snapshot(path, items, seq=0):
+    """Atomically publish a snapshot of (key, entry) pairs stamped with a store write sequence; returns the entry count"""
+    records = sorted(
+        ((key.encode('utf-8'), json.dumps(entry, separators=(',', ':')).encode('utf-8')) for key, entry in items),
+        key=lambda record: record[0]
+    )
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\0' * _HEADER.size)
+        index = []
+        offset = _HEADER.size
+        for key, value in records:
+            f.write(key)
+            f.write(value)
+            index.append(_INDEX.pack(offset, len(key), offset + len(key), len(value)))
+            offset += len(key) + len(value)
+        f.write(b''.join(index))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, len(records), seq, offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class LyricsSnapshot:
+    """Read-only view of a snapshot file that follows atomic re-publishes"""
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._identity = None
+        self._count = 0
+        self._index_offset = 0
+        self.seq = 0
+        self._next_check = 0
+        self._open()
+
+    def _open(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._close()
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return
+        self._close()
+        if stat.st_size < _HEADER.size:
+            return
+        f = open(self.path, 'rb')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, seq, index_offset = _HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            mapped.close()
+            f.close()
+            raise ValueError(f"{self.path} is not a lyrics snapshot")
+        self._file, self._map = f, mapped
+        self._count, self._index_offset, self.seq = count, index_offset, seq
+        self._identity = identity
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        self._file = self._map = self._identity = None
+        self._count = self.seq = 0
+
+    def refresh(self, force=False):
+        """Pick up a newly published snapshot (checked at most every check_interval seconds)"""
+        now = time.monotonic()
+        if now < self._next_check and not force:
+            return
+        with self._lock:
+            self._next_check = now + self.check_interval
+            self._open()
+
+    def __len__(self):
+        return self._count
+
+    def _record(self, i):
+        return _INDEX.unpack_from(self._map, self._index_offset + i * _INDEX.size)
+
+    def get(self, key):
+        """Binary search the sorted index; only the matching value is decoded"""
+        self.refresh()
+        with self._lock:
+            if self._map is None:
+                return None
+            target = key.encode('utf-8')
+            lo, hi = 0, self._count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                key_offset, key_len, value_offset, value_len = self._record(mid)
+                probe = self._map[key_offset:key_offset + key_len]
+                if probe < target:
+                    lo = mid + 1
+                elif probe > target:
+                    hi = mid
+                else:
+                    return json.loads(self._map[value_offset:value_offset + value_len])
+        return None
+
+    def keys(self):
+        with self._lock:
+            if self._map is None:
+                return []
+            return [
+                self._map[key_offset:key_offset + key_len].decode('utf-8')
+                for key_offset, key_len, _, _ in (self._record(i) for i in range(self._count))
+            ]
+
+
+def publishable_entries(store, ttl):
+    """Positive, unexpired entries from a lyrics store"""
+    now = time.time()
+    for key, entry in store.items():
+        if entry.get('negative') or not entry.get('lyrics'):
+            continue
+        if now - entry.get('timestamp', 0) >= ttl:
+            continue
+        yield key, entry
+
+
+if __name__ == '__main__':
+    # python lyrics_snapshot.py publish [lyrics_cache.db] [lyrics_snapshot.bin]
+    if len(sys.argv) < 2 or sys.argv[1] != 'publish':
+        print("usage: python lyrics_snapshot.py publish [lyrics_cache.db] [snapshot file]")
+        sys.exit(1)
+    from lyrics_store import SqliteLyricsStore
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'lyrics_cache.db'
+    out_path = sys.argv[3] if len(sys.argv) > 3 else 'lyrics_snapshot.bin'
+    store = SqliteLyricsStore(db_path)
+    count = write_snapshot(out_path, publishable_entries(store, 30 * 24 * 60 * 60), store.write_seq())
+    print(f"Published {count} entries to {out_path}")
@@ -0,0 +1,476 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+# ----------------------
+# Lyrics Store Backends
+# ----------------------
+# Every store keeps entries shaped like the original lyrics_cache.json values:
+#   {'lyrics': ..., 'timestamp': ..., 'api_used': ..., 'artist': ..., 'title': ...}
+# Negative entries (every provider missed) carry no lyrics and add:
+#   {'negative': True, 'attempts': ..., 'retry_at': ...}
+#
+# list_entries/count take the same filters: provider name, a substring of the
+# cache key, and negative=True/False. Listings return metadata, never lyrics.
+
+
+def entry_metadata(key, entry):
+    lyrics = entry.get('lyrics')
+    return {
+        'key': key,
+        'artist': entry.get('artist'),
+        'title': entry.get('title'),
+        'provider': entry.get('api_used'),
+        'timestamp': entry.get('timestamp'),
+        'negative': bool(entry.get('negative')),
+        'retry_at': entry.get('retry_at'),
+        'stored_bytes': len(lyrics.encode('utf-8')) if lyrics else 0
+    }
+
+
+class LogLyricsStore:
+    """Flat-file store: a JSON snapshot plus an append-only log of writes
+
+    Each put appends one JSON line to the log instead of rewriting the whole
+    cache. Once the log passes compact_bytes a background thread folds it into
+    a fresh snapshot. Startup replays the snapshot and then the log. Only one
+    process should write to a given pair of files.
+    """
+
+    def __init__(self, snapshot_path, log_path=None, compact_bytes=1024 * 1024):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or snapshot_path + '.log'
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._data = self._replay()
+        if os.path.exists(self.log_path + '.old'):
+            # An interrupted compaction: fold its log into the snapshot before the next one replaces it
+            self._write_snapshot(self._data)
+            os.remove(self.log_path + '.old')
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._log_bytes = self._log.tell()
+
+    def _replay(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        # A leftover .old log means we stopped mid-compaction; it is older than the live log
+        self._apply_log(self.log_path + '.old', data)
+        intact = self._apply_log(self.log_path, data)
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > intact:
+            # Cut off the torn final write so the next append starts on a line of its own
+            os.truncate(self.log_path, intact)
+        return data
+
+    @staticmethod
+    def _apply_log(path, data):
+        """Apply a log's records to data; returns the byte length of its intact lines"""
+        intact = 0
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # torn final write
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if record.get('deleted'):
+                        data.pop(record['key'], None)
+                    else:
+                        data[record['key']] = record['entry']
+                    intact += len(line)
+        except FileNotFoundError:
+            pass
+        return intact
+
+    def version(self):
+        # Single writer per file, so there are never outside changes to detect
+        return 0
+
+    def write_seq(self):
+        # Writes are not sequenced, so a published snapshot can never vouch for this store
+        return None
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key, entry):
+        self._append({'key': key, 'entry': entry})
+
+    def delete(self, key):
+        with self._lock:
+            if key not in self._data:
+                return
+        self._append({'key': key, 'deleted': True})
+
+    def count(self, provider=None, query=None, negative=None):
+        with self._lock:
+            if provider is None and query is None and negative is None:
+                return len(self._data)
+            return sum(1 for key, entry in self._data.items() if self._matches(key, entry, provider, query, negative))
+
+    def keys(self, limit=None):
+        with self._lock:
+            keys = list(self._data.keys())
+        return keys[:limit] if limit is not None else keys
+
+    def list_entries(self, offset=0, limit=50, provider=None, query=None, negative=None):
+        with self._lock:
+            matching = sorted(
+                (key, entry) for key, entry in self._data.items()
+                if self._matches(key, entry, provider, query, negative)
+            )
+        return [entry_metadata(key, entry) for key, entry in matching[offset:offset + limit]]
+
+    def provider_counts(self):
+        counts = {}
+        with self._lock:
+            for entry in self._data.values():
+                name = entry.get('api_used') or ('Negative' if entry.get('negative') else 'Unknown')
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    def storage_bytes(self):
+        total = 0
+        for path in (self.snapshot_path, self.log_path):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    @staticmethod
+    def _matches(key, entry, provider, query, negative):
+        if provider is not None and entry.get('api_used') != provider:
+            return False
+        if query is not None and query not in key:
+            return False
+        if negative is not None and bool(entry.get('negative')) != negative:
+            return False
+        return True
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def _append(self, record):
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self._log.write(line)
+            self._log.flush()
+            # Apply under the same lock so compaction never sees the log write without the data
+            if record.get('deleted'):
+                self._data.pop(record['key'], None)
+            else:
+                self._data[record['key']] = record['entry']
+            self._log_bytes += len(line.encode('utf-8'))
+            should_compact = self._log_bytes >= self.compact_bytes and not self._compacting
+            if should_compact:
+                self._compacting = True
+        if should_compact:
+            thread = threading.Thread(target=self.compact)
+            thread.daemon = True
+            thread.start()
+
+    def _write_snapshot(self, data):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def compact(self):
+        """Fold the log into a new snapshot"""
+        try:
+            with self._lock:
+                # Writes from here on go to a fresh log; the old one is covered by the snapshot
+                self._log.close()
+                os.replace(self.log_path, self.log_path + '.old')
+                self._log = open(self.log_path, 'a', encoding='utf-8')
+                self._log_bytes = 0
+                data = dict(self._data)
+
+            self._write_snapshot(data)
+            os.remove(self.log_path + '.old')
+            print(f"🗜️  Compacted lyrics cache log into {self.snapshot_path} ({len(data)} entries)")
+        except Exception as e:
+            print(f"❌ Lyrics cache compaction failed: {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+
+class SqliteLyricsStore:
+    """Keyed SQLite table with point reads and writes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS lyrics_cache (
+                cache_key TEXT PRIMARY KEY,
+                artist TEXT,
+                title TEXT,
+                provider TEXT,
+                timestamp REAL NOT NULL,
+                lyrics TEXT,
+                negative INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                retry_at REAL,
+                seq INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_lyrics_cache_timestamp ON lyrics_cache (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_lyrics_cache_provider ON lyrics_cache (provider);
+            CREATE TABLE IF NOT EXISTS lyrics_cache_deleted (
+                cache_key TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lyrics_store_meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        # Columns added after the table was first created
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(lyrics_cache)')}
+        for name, ddl in (
+            ('negative', 'negative INTEGER NOT NULL DEFAULT 0'),
+            ('attempts', 'attempts INTEGER NOT NULL DEFAULT 0'),
+            ('retry_at', 'retry_at REAL'),
+            ('seq', 'seq INTEGER NOT NULL DEFAULT 0')
+        ):
+            if name not in columns:
+                self._conn.execute(f'ALTER TABLE lyrics_cache ADD COLUMN {ddl}')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_lyrics_cache_seq ON lyrics_cache (seq)')
+        self._conn.commit()
+
+    def version(self):
+        """Changes whenever another connection commits to the database"""
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def write_seq(self):
+        """Sequence number of the latest write; every put and delete takes the next one"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value FROM lyrics_store_meta WHERE name = ?', ('write_seq',)
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    def keys_written_since(self, seq):
+        """Keys put or deleted after write sequence number seq"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT cache_key FROM lyrics_cache WHERE seq > ? '
+                'UNION SELECT cache_key FROM lyrics_cache_deleted WHERE seq > ?',
+                (seq, seq)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _next_seq(self):
+        # Called inside the write's transaction, so the counter commits with the row
+        self._conn.execute(
+            "INSERT INTO lyrics_store_meta (name, value) VALUES ('write_seq', 1) "
+            'ON CONFLICT (name) DO UPDATE SET value = value + 1'
+        )
+        return int(self._conn.execute(
+            "SELECT value FROM lyrics_store_meta WHERE name = 'write_seq'"
+        ).fetchone()[0])
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {self._COLUMNS} FROM lyrics_cache WHERE cache_key = ?',
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._entry(row)[1]
+
+    def put(self, key, entry):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    f'INSERT OR REPLACE INTO lyrics_cache ({self._COLUMNS}, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self._row(key, entry) + (self._next_seq(),)
+                )
+                self._conn.execute('DELETE FROM lyrics_cache_deleted WHERE cache_key = ?', (key,))
+
+    def delete(self, key):
+        with self._lock:
+            with self._conn:
+                self._conn.execute('DELETE FROM lyrics_cache WHERE cache_key = ?', (key,))
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO lyrics_cache_deleted (cache_key, seq) VALUES (?, ?)',
+                    (key, self._next_seq())
+                )
+
+    def count(self, provider=None, query=None, negative=None):
+        where, params = self._where(provider, query, negative)
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM lyrics_cache{where}', params).fetchone()[0]
+
+    def list_entries(self, offset=0, limit=50, provider=None, query=None, negative=None):
+        where, params = self._where(provider, query, negative)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT cache_key, artist, title, provider, timestamp, negative, retry_at, length(lyrics) '
+                f'FROM lyrics_cache{where} ORDER BY cache_key LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+        return [
+            {
+                'key': row[0],
+                'artist': row[1],
+                'title': row[2],
+                'provider': row[3],
+                'timestamp': row[4],
+                'negative': bool(row[5]),
+                'retry_at': row[6],
+                'stored_bytes': row[7] or 0
+            }
+            for row in rows
+        ]
+
+    def provider_counts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT provider, negative, COUNT(*) FROM lyrics_cache GROUP BY provider, negative'
+            ).fetchall()
+        counts = {}
+        for provider, negative, n in rows:
+            name = provider or ('Negative' if negative else 'Unknown')
+            counts[name] = counts.get(name, 0) + n
+        return counts
+
+    def storage_bytes(self):
+        with self._lock:
+            page_count = self._conn.execute('PRAGMA page_count').fetchone()[0]
+            page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+        return page_count * page_size
+
+    @staticmethod
+    def _where(provider, query, negative):
+        clauses = []
+        params = []
+        if provider is not None:
+            clauses.append('provider = ?')
+            params.append(provider)
+        if query is not None:
+            clauses.append("cache_key LIKE ? ESCAPE '\\'")
+            escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        if negative is not None:
+            clauses.append('negative = ?')
+            params.append(1 if negative else 0)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def keys(self, limit=None):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT cache_key FROM lyrics_cache ORDER BY cache_key LIMIT ?',
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def items(self):
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {self._COLUMNS} FROM lyrics_cache').fetchall()
+        return [self._entry(row) for row in rows]
+
+    def import_json(self, json_path):
+        """One-time import of a legacy lyrics_cache.json; returns the number of entries imported"""
+        try:
+            marker = str(os.stat(json_path).st_mtime_ns)
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            done = self._conn.execute(
+                'SELECT value FROM lyrics_store_meta WHERE name = ?', ('json_imported',)
+            ).fetchone()
+        if done and done[0] == marker:
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                legacy = json.load(f)
+        except json.JSONDecodeError:
+            legacy = {}
+
+        with self._lock:
+            with self._conn:
+                seq = self._next_seq()
+                # Keep whichever copy is newer if a key already exists
+                self._conn.executemany(
+                    f'INSERT INTO lyrics_cache ({self._COLUMNS}, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (cache_key) DO UPDATE SET '
+                    'provider = excluded.provider, timestamp = excluded.timestamp, lyrics = excluded.lyrics, '
+                    'seq = excluded.seq '
+                    'WHERE excluded.timestamp > lyrics_cache.timestamp',
+                    [self._row(key, entry) + (seq,) for key, entry in legacy.items()]
+                )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO lyrics_store_meta (name, value) VALUES (?, ?)',
+                    ('json_imported', marker)
+                )
+        return len(legacy)
+
+    _COLUMNS = 'cache_key, artist, title, provider, timestamp, lyrics, negative, attempts, retry_at'
+
+    @staticmethod
+    def _row(key, entry):
+        return (
+            key,
+            entry.get('artist'),
+            entry.get('title'),
+            entry.get('api_used'),
+            entry.get('timestamp', 0),
+            entry.get('lyrics'),
+            1 if entry.get('negative') else 0,
+            entry.get('attempts', 0),
+            entry.get('retry_at')
+        )
+
+    @staticmethod
+    def _entry(row):
+        entry = {
+            'lyrics': row[5],
+            'timestamp': row[4],
+            'api_used': row[3],
+            'artist': row[1],
+            'title': row[2]
+        }
+        if row[6]:
+            entry.update({'negative': True, 'attempts': row[7], 'retry_at': row[8]})
+        return row[0], entry
+
+
+def open_lyrics_store(backend, json_path, db_path, compact_bytes=1024 * 1024):
+    """Open the configured store, importing the legacy JSON cache into SQLite once"""
+    if backend in ('log', 'json'):
+        return LogLyricsStore(json_path, compact_bytes=compact_bytes)
+    if backend == 'sqlite':
+        store = SqliteLyricsStore(db_path)
+        imported = store.import_json(json_path)
+        if imported:
+            print(f"📦 Imported {imported} cached lyrics from {json_path} into {db_path}")
+        return store
+    raise ValueError(f"Unknown lyrics store backend: {backend}")
+
+
+if __name__ == '__main__':
+    # python lyrics_store.py [lyrics_cache.json] [lyrics_cache.db]
+    json_path = sys.argv[1] if len(sys.argv) > 1 else 'lyrics_cache.json'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'lyrics_cache.db'
+    store = SqliteLyricsStore(db_path)
+    print(f"Imported {store.import_json(json_path)} entries; store now holds {store.count()}")
@@ -0,0 +1,27 @@
+"""Standalone lyrics-check worker (opt-in)
+
+By default the web process runs the lyrics job queue itself. To move it into
+a process of its own:
+
+    python lyrics_worker.py --workers 4
+
+This process must see the same database files as the web process (same
+host, or a shared database), so it does not work as a separate Heroku or
+Railway service with SQLite. Set LYRICS_JOB_WORKERS_IN_WEB=0 on the web
+process to keep jobs out of it, or leave it on and both claim jobs.
+
+Provider health is per process: fetches made here feed this process's
+scoreboard, not the web process's routing, prober or /dj/lyrics-summary.
+"""
+import argparse
+
+from app import LYRICS_JOB_WORKERS, start_lyrics_job_workers
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run lyrics-check job workers")
+    parser.add_argument('--workers', type=int, default=LYRICS_JOB_WORKERS)
+    args = parser.parse_args()
+
+    for worker in start_lyrics_job_workers(max(1, args.workers)):
+        worker.wait()
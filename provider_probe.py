@@ -0,0 +1,155 @@
+import threading
+import time
+
+import eventlet
+
+from singleflight import SingleFlight
+
+# ----------------------
+# Lyrics Provider Health Probing
+# ----------------------
+# The provider test matrix (test songs x registered providers) is kept in
+# memory. A full run queries every cell at once, and callers arriving while
+# one is going share it. /test-lyrics-apis serves the last matrix straight
+# away and refreshes it in the background once it is older than max_age.
+#
+# Between full runs a background prober re-checks one cell every `interval`
+# seconds, round robin across providers, skipping providers whose circuit is
+# open. Probes go through LyricsEngine.query, so they feed the scoreboard
+# behind fetch ordering and /lyrics-summary even when no songs are requested.
+
+
+class ProviderProber:
+    """Cached song x provider probe matrix with a low-rate background refresher"""
+
+    def __init__(self, engine, songs, max_age=600, interval=30, normalize=None):
+        self.engine = engine
+        self.songs = list(songs)
+        self.max_age = max_age
+        self.interval = interval
+        # Maps a test song to what providers are asked for
+        self.normalize = normalize or (lambda artist, title: (artist, title))
+        self.probes = 0
+        self._cells = {}
+        self._last_run = None
+        self._cursor = 0
+        self._runs = SingleFlight()
+        self._lock = threading.Lock()
+        self._started = False
+
+    @staticmethod
+    def label(song):
+        return f"{song[0]} - {song[1]}"
+
+    def _store(self, song, result):
+        key = (self.label(song), result.provider)
+        with self._lock:
+            if result.throttled and key in self._cells:
+                # Our own rate limit skipped it; the last real answer still stands
+                return
+            self._cells[key] = {
+                'status': 'working' if result.ok else ('throttled' if result.throttled else result.outcome),
+                'http_status': result.status,
+                'error': result.error,
+                'url': result.url,
+                'response_time': round(result.seconds, 3),
+                'sample': result.lyrics[:100] + '...' if result.lyrics and len(result.lyrics) > 100 else result.lyrics,
+                'checked_at': time.time()
+            }
+
+    def _run(self):
+        started = time.time()
+
+        def probe_song(song):
+            for result in self.engine.probe(*self.normalize(*song)):
+                self._store(song, result)
+
+        pool = eventlet.GreenPool(max(1, len(self.songs)))
+        list(pool.imap(probe_song, self.songs))
+        with self._lock:
+            self._last_run = {'started_at': started, 'seconds': round(time.time() - started, 2)}
+        print(f"🩺 Probed {len(self.songs)} songs x {len(self.engine.providers)} providers in {time.time() - started:.1f}s")
+
+    def run(self):
+        """Probe every cell now, concurrently; joins a run that is already going"""
+        self._runs.do('matrix', self._run)
+
+    def matrix(self, refresh=False):
+        """The cached matrix; waits for a run only when there is none yet (or refresh), else revalidates in the background"""
+        with self._lock:
+            last_run = self._last_run
+        revalidating = False
+        if refresh or last_run is None:
+            self.run()
+        elif time.time() - last_run['started_at'] > self.max_age and not self._runs.in_flight():
+            eventlet.spawn(self.run)
+            revalidating = True
+        return self.report(revalidating)
+
+    def report(self, revalidating=False):
+        now = time.time()
+        with self._lock:
+            cells = {key: dict(cell) for key, cell in self._cells.items()}
+            last_run = dict(self._last_run) if self._last_run else None
+        songs = {}
+        for song in self.songs:
+            label = self.label(song)
+            providers = {name: cell for (song_label, name), cell in cells.items() if song_label == label}
+            working = sorted(
+                ({'name': name, 'url': cell['url'], 'response_time': cell['response_time'], 'sample': cell['sample']}
+                 for name, cell in providers.items() if cell['status'] == 'working'),
+                key=lambda api: api['response_time']
+            )
+            songs[label] = {'working_apis': working, 'working_count': len(working), 'providers': providers}
+        return {
+            'songs': songs,
+            'last_run': last_run,
+            'age': round(now - last_run['started_at']) if last_run else None,
+            'refreshing': revalidating or self._runs.in_flight() > 0,
+            'prober': self.stats()
+        }
+
+    def probe_next(self):
+        """Re-check the next cell whose provider isn't cooling down; returns its result or None"""
+        providers = list(self.engine.providers.values())
+        cells = len(providers) * len(self.songs)
+        for _ in range(cells):
+            with self._lock:
+                index = self._cursor % cells
+                self._cursor = (index + 1) % cells
+            # Providers change fastest, so consecutive probes go to different hosts
+            song, provider = self.songs[index // len(providers)], providers[index % len(providers)]
+            if not self.engine.scoreboard.available(provider.name):
+                continue
+            result = self.engine.query(provider, *self.normalize(*song))
+            self._store(song, result)
+            with self._lock:
+                self.probes += 1
+            return result
+        return None
+
+    def _loop(self):
+        while True:
+            eventlet.sleep(self.interval)
+            try:
+                self.probe_next()
+            except Exception as e:
+                print(f"❌ Provider probe failed: {e}")
+
+    def start(self):
+        """Start the background prober (once per process)"""
+        with self._lock:
+            if self._started or not self.songs:
+                return
+            self._started = True
+        eventlet.spawn(self._loop)
+        print(f"🩺 Provider prober checking one song/provider pair every {self.interval}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._started,
+                'interval': self.interval,
+                'probes': self.probes,
+                'cells': len(self._cells)
+            }
@@ -0,0 +1,116 @@
+import threading
+import time
+
+# ----------------------
+# Lyrics Provider Scoreboard
+# ----------------------
+# Live per-provider statistics from real fetches:
+#   success  - EWMA of "returned usable lyrics" (1) vs anything else (0)
+#   latency  - EWMA of request time in seconds, successes and failures alike
+#
+# Providers are tried in order of expected time-to-success, latency / success,
+# which minimises the expected wait when they are walked one after another.
+#
+# Errors (timeouts, connection failures, 5xx, 429) count towards a circuit
+# breaker; a plain "not found" does not, since the provider is up. After
+# `failure_threshold` errors in a row the provider is skipped for `cooldown`
+# seconds, doubling on every trip that fails its trial request.
+
+OUTCOME_SUCCESS = 'success'
+OUTCOME_MISS = 'miss'
+OUTCOME_ERROR = 'error'
+
+
+class ProviderScoreboard:
+    """Latency/success EWMAs and circuit breakers for lyrics providers"""
+
+    def __init__(self, alpha=0.2, failure_threshold=3, cooldown=60, max_cooldown=15 * 60,
+                 prior_success=0.5, prior_latency=2.0):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.prior_success = prior_success
+        self.prior_latency = prior_latency
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def _state(self, name):
+        state = self._providers.get(name)
+        if state is None:
+            state = self._providers[name] = {
+                'success': self.prior_success,
+                'latency': self.prior_latency,
+                'samples': 0,
+                'successes': 0,
+                'misses': 0,
+                'errors': 0,
+                'consecutive_errors': 0,
+                'trips': 0,
+                'open_until': 0.0,
+                'last_error': None
+            }
+        return state
+
+    def record(self, name, outcome, seconds, error=None):
+        """Fold one request's outcome into the provider's statistics"""
+        with self._lock:
+            state = self._state(name)
+            # Starting from the priors keeps one early miss from burying a provider
+            state['success'] += self.alpha * ((1.0 if outcome == OUTCOME_SUCCESS else 0.0) - state['success'])
+            state['latency'] += self.alpha * (seconds - state['latency'])
+            state['samples'] += 1
+
+            if outcome == OUTCOME_ERROR:
+                state['errors'] += 1
+                state['consecutive_errors'] += 1
+                state['last_error'] = error
+                now = time.time()
+                # A failed trial after a cooldown (half-open) re-opens straight away
+                if state['open_until'] <= now and (state['trips'] or state['consecutive_errors'] >= self.failure_threshold):
+                    state['trips'] += 1
+                    delay = min(self.cooldown * 2 ** (state['trips'] - 1), self.max_cooldown)
+                    state['open_until'] = now + delay
+                    print(f"🚧 {name} circuit open for {int(delay)}s after {state['consecutive_errors']} errors")
+            else:
+                state['successes' if outcome == OUTCOME_SUCCESS else 'misses'] += 1
+                state['consecutive_errors'] = 0
+                state['trips'] = 0
+                state['open_until'] = 0.0
+
+    def available(self, name):
+        """False while the provider's circuit is open"""
+        with self._lock:
+            state = self._providers.get(name)
+            return state is None or state['open_until'] <= time.time()
+
+    def expected_time(self, name):
+        with self._lock:
+            state = self._providers.get(name)
+            if state is None:
+                return self.prior_latency / self.prior_success
+            return state['latency'] / max(state['success'], 0.01)
+
+    def order(self, providers, key=lambda provider: provider['name']):
+        """Available providers, fastest expected time-to-success first (ties keep the given order)"""
+        usable = [p for p in providers if self.available(key(p))]
+        return sorted(usable, key=lambda p: self.expected_time(key(p)))
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {
+                name: {
+                    'success_rate': round(state['success'], 3),
+                    'latency_ms': round(state['latency'] * 1000, 1),
+                    'expected_time_ms': round(state['latency'] / max(state['success'], 0.01) * 1000, 1),
+                    'samples': state['samples'],
+                    'successes': state['successes'],
+                    'misses': state['misses'],
+                    'errors': state['errors'],
+                    'circuit': 'open' if state['open_until'] > now else ('half-open' if state['trips'] else 'closed'),
+                    'retry_in': max(0, round(state['open_until'] - now)),
+                    'last_error': state['last_error']
+                }
+                for name, state in self._providers.items()
+            }
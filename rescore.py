@@ -0,0 +1,175 @@
+"""Re-score stored lyrics verdicts against the filter policy
+
+Tokenizes every stored LyricsCheck's lyrics once into a token corpus
+(lyrics_corpus.py), scores the whole library under the policy with NumPy and
+writes back only the verdicts that changed, one bulk UPDATE per batch.
+Nothing is downloaded, so after a filter policy change the library is
+re-verdicted in seconds. The corpus stays in memory until a lyrics check is
+added or updated.
+
+    python rescore.py
+    python rescore.py --dry-run
+    python rescore.py --preview new_lexicons.json
+
+Lyrics cut short when stored (fetched lyrics at LYRICS_EXCERPT_CHARS, a DJ's
+manual lyrics at MANUAL_LYRICS_CHARS) are scored on the full lyrics from the
+lyrics cache when it still has them. If it doesn't, a rescore may flag the
+song but never clears it; /dj/refresh-lyrics or the backfill can.
+
+The DJ endpoint /dj/rescore-lyrics runs the same job.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import eventlet
+import numpy as np
+from sqlalchemy import func
+
+from app import (app, db, Song, LyricsCheck, lyrics_store, lyrics_filter, song_cache_key, unpack_lyrics,
+                 LYRICS_EXCERPT_CHARS, MANUAL_LYRICS_CHARS)
+from content_filter import as_lexicons
+from lyrics_corpus import LyricsCorpus
+
+RESCORE_BATCH_SIZE = int(os.getenv('RESCORE_BATCH_SIZE', 500))
+# Stored lyrics of exactly these lengths may have been cut short
+TRUNCATED_LENGTHS = (LYRICS_EXCERPT_CHARS, MANUAL_LYRICS_CHARS)
+
+# One rescore at a time per process
+rescore_lock = threading.Lock()
+# The tokenized library and the stored-lyrics state it was built from
+_corpus = {'fingerprint': None, 'corpus': None, 'complete': None}
+
+
+def _fingerprint():
+    # Every write of stored lyrics sets checked_at; verdict-only updates (like ours) don't
+    return tuple(db.session.query(func.count(LyricsCheck.id), func.max(LyricsCheck.id), func.max(LyricsCheck.checked_at))
+                 .filter(LyricsCheck.lyrics.isnot(None)).one())
+
+
+def cached_full_lyrics(artist, title):
+    """The song's full lyrics from the lyrics store, if it has them"""
+    entry = lyrics_store.get(song_cache_key(artist, title))
+    if entry and not entry.get('negative') and entry.get('lyrics'):
+        return unpack_lyrics(entry['lyrics'])
+    return None
+
+
+def stored_lyrics():
+    """(song_id, lyrics, complete) for every song with stored lyrics"""
+    rows = db.session.query(LyricsCheck.song_id, LyricsCheck.lyrics, Song.artist, Song.title) \
+        .join(Song, Song.id == LyricsCheck.song_id) \
+        .filter(LyricsCheck.lyrics.isnot(None)) \
+        .order_by(LyricsCheck.song_id) \
+        .yield_per(RESCORE_BATCH_SIZE)
+    for song_id, lyrics, artist, title in rows:
+        if len(lyrics) not in TRUNCATED_LENGTHS:
+            yield song_id, lyrics, True
+            continue
+        full = cached_full_lyrics(artist, title)
+        if full and full[:len(lyrics)] == lyrics:
+            yield song_id, full, True
+        else:
+            yield song_id, lyrics, False
+
+
+def load_corpus():
+    """(corpus, complete flags, reused) - tokenizes the library only when its stored lyrics changed"""
+    fingerprint = _fingerprint()
+    if _corpus['corpus'] is not None and _corpus['fingerprint'] == fingerprint:
+        return _corpus['corpus'], _corpus['complete'], True
+    corpus = LyricsCorpus(lyrics_filter.detector)
+    complete = []
+    for count, (song_id, lyrics, is_complete) in enumerate(stored_lyrics(), 1):
+        corpus.add(song_id, lyrics)
+        complete.append(is_complete)
+        if count % 100 == 0:
+            eventlet.sleep(0)  # let requests through while a big library tokenizes
+    _corpus.update(fingerprint=fingerprint, corpus=corpus, complete=np.array(complete, dtype=bool))
+    return corpus, _corpus['complete'], False
+
+
+def corpus_status():
+    corpus = _corpus['corpus']
+    return {
+        'corpus': corpus.stats() if corpus is not None else None,
+        'running': rescore_lock.locked()
+    }
+
+
+def write_verdicts(song_ids, is_clean, batch_size=RESCORE_BATCH_SIZE):
+    """Set is_clean for song_ids, one UPDATE and commit per batch"""
+    for start in range(0, len(song_ids), batch_size):
+        batch = song_ids[start:start + batch_size]
+        LyricsCheck.query.filter(LyricsCheck.song_id.in_(batch)) \
+            .update({LyricsCheck.is_clean: is_clean}, synchronize_session=False)
+        db.session.commit()
+
+
+def run_rescore(lexicons=None, dry_run=False, batch_size=RESCORE_BATCH_SIZE):
+    """Re-verdict every song with stored lyrics; returns a summary. The caller must hold an app context
+
+    lexicons previews another policy ({language: {category: [terms]}}); its
+    verdicts are reported but never written.
+    """
+    dry_run = dry_run or lexicons is not None
+    started = time.perf_counter()
+    corpus, complete, reused = load_corpus()
+    tokenized = time.perf_counter()
+
+    verdicts = corpus.score(lexicons or lyrics_filter.lexicons, lyrics_filter.base_language)
+    stored = dict(db.session.query(LyricsCheck.song_id, LyricsCheck.is_clean)
+                  .filter(LyricsCheck.lyrics.isnot(None)).all())
+    current = np.array([stored.get(song_id, True) for song_id in corpus.song_ids], dtype=bool)
+    is_clean = verdicts.is_clean.copy()
+    # Partial excerpts can't prove a song clean, so they keep a flag they already have
+    held = is_clean & ~current & ~complete
+    is_clean[held] = False
+    newly_flagged = verdicts.song_ids[current & ~is_clean].tolist()
+    newly_cleared = verdicts.song_ids[~current & is_clean].tolist()
+    scored = time.perf_counter()
+
+    if not dry_run:
+        write_verdicts(newly_flagged, False, batch_size)
+        write_verdicts(newly_cleared, True, batch_size)
+    written = time.perf_counter()
+
+    summary = dict(verdicts.summary(), **{
+        'policy': 'preview' if lexicons is not None else 'live',
+        'dry_run': dry_run,
+        'corpus': dict(corpus.stats(), reused=reused),
+        'flagged': int((~is_clean).sum()),
+        'newly_flagged': len(newly_flagged),
+        'newly_cleared': len(newly_cleared),
+        'held': int(held.sum()),
+        'changed': [{'song_id': song_id, 'is_clean': False} for song_id in newly_flagged[:50]]
+                   + [{'song_id': song_id, 'is_clean': True} for song_id in newly_cleared[:50]],
+        'seconds': {
+            'tokenize': round(tokenized - started, 3),
+            'score': round(scored - tokenized, 3),
+            'write': round(written - scored, 3)
+        }
+    })
+    print(f"🧮 Rescored {len(verdicts)} songs in {written - started:.2f}s: {summary['flagged']} flagged, "
+          f"{len(newly_flagged)} newly flagged, {len(newly_cleared)} cleared, {summary['held']} held"
+          + (" (dry run)" if dry_run else ""))
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-verdict stored lyrics against the filter policy without re-downloading")
+    parser.add_argument('--batch-size', type=int, default=RESCORE_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing")
+    parser.add_argument('--preview', metavar='LEXICON_FILE',
+                        help="Score another policy (JSON lexicons, as LYRICS_FILTER_LEXICON_FILE); implies --dry-run")
+    args = parser.parse_args()
+
+    lexicons = None
+    if args.preview:
+        with open(args.preview, 'r', encoding='utf-8') as f:
+            lexicons = as_lexicons(json.load(f))
+
+    with app.app_context():
+        print(json.dumps(run_rescore(lexicons, args.dry_run, args.batch_size), indent=2))
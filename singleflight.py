@@ -0,0 +1,74 @@
+import threading
+
+# ----------------------
+# Single-Flight Call Coalescing
+# ----------------------
+# Concurrent callers asking for the same key share one in-flight call: the
+# first caller runs the function, the rest wait for it and get the same result
+# (or exception). Nothing is remembered once the call finishes; caching is the
+# caller's job.
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into a single execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless a call for key is already running, then share its outcome"""
+        return self.do_within(None, key, fn, *args, **kwargs)
+
+    def do_within(self, timeout, key, fn, *args, **kwargs):
+        """Like do(), but a caller that joins a running call waits at most timeout seconds (TimeoutError)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Gave up waiting for the in-flight call for {key!r} after {timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
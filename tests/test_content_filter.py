@@ -0,0 +1,208 @@
+import random
+
+import pytest
+
+from content_filter import (DEFAULT_LEXICON, LEXICONS, ContentFilter, MultilingualFilter, as_lexicons, compiled_filter,
+                            fold, lexicon_version)
+from lyrics_corpus import LyricsCorpus
+
+LEXICON = {
+    'profanity': ['hell', 'damn*', 'ta gueule'],
+    'violence': ['kill*', 'gun', 'guns'],
+    'sexual': ['sex'],
+    'drugs': ['cocaína']
+}
+
+
+@pytest.fixture
+def content_filter():
+    return ContentFilter(LEXICON)
+
+
+def matched(content_filter, text):
+    return [match.text for match in content_filter.scan(text)]
+
+
+def test_whole_words_only(content_filter):
+    assert matched(content_filter, "Hell yeah, hell's kitchen") == ['Hell', 'hell']
+    assert content_filter.is_clean("hello from the shell, it had begun in Essex")
+
+
+@pytest.mark.parametrize('text', ["a gun", "guns!", "GUN-shy", "sex."])
+def test_term_at_word_boundaries(content_filter, text):
+    assert not content_filter.is_clean(text)
+
+
+def test_prefix_terms_match_whole_words_they_start(content_filter):
+    assert matched(content_filter, "killer skills, killing time") == ['killer', 'killing']
+    assert matched(content_filter, "damnation") == ['damnation']
+    assert content_filter.is_clean("skill and skills")
+
+
+def test_case_and_accents_are_folded(content_filter):
+    assert matched(content_filter, "COCAINA y cocaína") == ['COCAINA', 'cocaína']
+    assert matched(content_filter, "Ta Gueule") == ['Ta Gueule']
+    assert fold("Ação Ü") == "acao u"
+
+
+def test_scan_reports_offsets_terms_and_categories(content_filter):
+    text = "It begun, hell on earth: killers and guns"
+    matches = content_filter.scan(text)
+    assert [(m.term, m.category, m.start, m.end) for m in matches] == [
+        ('hell', 'profanity', 10, 14),
+        ('kill*', 'violence', 25, 32),
+        ('guns', 'violence', 37, 41)
+    ]
+    assert all(text[m.start:m.end] == m.text for m in matches)
+    assert content_filter.scan(text, first_only=True)[0].to_dict() == {
+        'term': 'hell', 'category': 'profanity', 'start': 10, 'end': 14, 'text': 'hell'
+    }
+
+
+def test_offsets_survive_characters_that_grow_when_lowercased():
+    content_filter = ContentFilter({'profanity': ['hell']})
+    text = "İ said hell"
+    [match] = content_filter.scan(text)
+    assert text[match.start:match.end] == 'hell'
+
+
+@pytest.mark.parametrize('word', [
+    'sexy', 'sexual', 'naked', 'nakedness', 'dicks', 'pussies', 'gunshot', 'gunshots', 'gunfire', 'gunman',
+    'drugged', 'stabs', 'fucking', 'killer'
+])
+def test_default_lexicon_catches_inflections(word):
+    assert not compiled_filter(DEFAULT_LEXICON).is_clean(f"they said {word} again")
+
+
+@pytest.mark.parametrize('text', ['hello', 'shell', 'begun', 'Essex', 'skill', 'Gunther', 'seashell'])
+def test_default_lexicon_ignores_words_containing_terms(text):
+    assert compiled_filter(DEFAULT_LEXICON).is_clean(f"{text} by the sea")
+
+
+@pytest.mark.parametrize('language, text', [
+    ('pt', "baseado numa história real"),
+    ('pt', "uma cerveja gelada no fim da tarde"),
+    ('es', "nos fuimos en la mota por la costa")
+])
+def test_lexicons_ignore_everyday_words(language, text):
+    assert compiled_filter(LEXICONS[language]).is_clean(text)
+
+
+def test_compiled_filter_is_cached_per_version():
+    first = compiled_filter(LEXICON)
+    reordered = {category: list(reversed(terms)) for category, terms in reversed(list(LEXICON.items()))}
+    assert compiled_filter(reordered) is first
+    assert lexicon_version(reordered) == first.version
+
+    changed = dict(LEXICON, sexual=['sex', 'sexy'])
+    assert compiled_filter(changed) is not first
+    assert compiled_filter(changed).version != first.version
+    assert compiled_filter(changed) is compiled_filter(dict(changed))
+
+
+LYRICS = {
+    'en': "Every morning I wake up and the sun is coming through the window\n"
+          "I keep thinking of the summer when we drove along the coast\n"
+          "And the radio was playing all the songs we used to know\n"
+          "So tell me where you're going, I will follow you tonight",
+    'pt': "Toda manhã eu acordo e o sol entra pela janela\n"
+          "Fico pensando no verão em que a gente viajou pelo litoral\n"
+          "E o rádio tocava todas as músicas que a gente sabia de cor\n"
+          "Então me diz pra onde você vai que eu vou atrás de você",
+    'es': "Cada mañana me despierto y el sol entra por la ventana\n"
+          "Sigo pensando en el verano cuando viajamos por la costa\n"
+          "Y la radio sonaba con todas las canciones que sabíamos\n"
+          "Así que dime adónde vas, esta noche yo te sigo",
+    'fr': "Chaque matin je me réveille et le soleil entre par la fenêtre\n"
+          "Je repense à l'été où on roulait le long de la côte\n"
+          "Et la radio jouait toutes les chansons qu'on connaissait\n"
+          "Alors dis-moi où tu vas, ce soir je te suivrai"
+}
+
+SHORT_LYRICS = {
+    'en': "I love you baby, hold me tight tonight",
+    'pt': "Eu te amo, meu amor, não vá embora",
+    'es': "Te quiero mucho, mi corazón es tuyo",
+    'fr': "Je t'aime mon amour, ne pars pas"
+}
+
+
+@pytest.fixture(scope='module')
+def multilingual():
+    return MultilingualFilter()
+
+
+@pytest.mark.parametrize('language', sorted(LYRICS))
+def test_detects_the_language_of_long_lyrics(multilingual, language):
+    assert multilingual.detect(LYRICS[language]) == language
+    # Only the start is read, however long the song
+    assert multilingual.detect(LYRICS[language] * 50) == language
+
+
+@pytest.mark.parametrize('language', sorted(SHORT_LYRICS))
+def test_detects_the_language_of_a_single_line(multilingual, language):
+    assert multilingual.detect(SHORT_LYRICS[language]) == language
+
+
+def test_scans_with_the_detected_languages_lexicon(multilingual):
+    language, matches = multilingual.scan(LYRICS['pt'] + "\nporra, que merda")
+    assert language == 'pt'
+    assert [(m.text, m.category) for m in matches] == [('porra', 'profanity'), ('merda', 'profanity')]
+    # Another language's words are not flagged in English lyrics...
+    assert multilingual.scan(LYRICS['en'] + "\nporra merda") == ('en', [])
+    # ...but every language's matcher carries the English terms
+    assert multilingual.filter_for('pt') is not multilingual.filter_for('en')
+    assert [m.term for m in multilingual.scan(LYRICS['fr'] + " fuck")[1]] == ['fuck*']
+
+
+@pytest.mark.parametrize('text', ["na na na hey hey merda", "12345 !!!", "ok"])
+def test_unclassifiable_text_falls_back_to_every_lexicon(multilingual, text):
+    assert multilingual.detect(text) is None
+    assert [m.text for m in multilingual.scan(text)[1]] == (['merda'] if 'merda' in text else [])
+
+
+def test_fallback_matcher_carries_every_languages_terms(multilingual):
+    assert multilingual.filter_for(None) is multilingual.fallback
+    for lexicon in LEXICONS.values():
+        for terms in lexicon.values():
+            assert not multilingual.fallback.is_clean(terms[0].rstrip('*'))
+
+
+def test_legacy_lexicon_format_replaces_only_the_english_lexicon():
+    legacy = {'profanity': ['heck'], 'violence': ['kill*']}
+    lexicons = as_lexicons(legacy)
+    assert lexicons['en'] == legacy
+    assert {language: lexicons[language] for language in ('pt', 'es', 'fr')} == \
+        {language: LEXICONS[language] for language in ('pt', 'es', 'fr')}
+    assert as_lexicons(LEXICONS) is LEXICONS
+
+    multilingual = MultilingualFilter(lexicons)
+    assert [m.text for m in multilingual.scan(LYRICS['en'] + " heck, damn")[1]] == ['heck']
+    assert [m.text for m in multilingual.scan(LYRICS['pt'] + " heck, merda")[1]] == ['heck', 'merda']
+
+
+def generated_lyrics(count, seed=7):
+    """Songs mixing innocent words, lexicon terms and the separators lyrics put between them"""
+    rng = random.Random(seed)
+    terms = [term.rstrip('*') for lexicon in LEXICONS.values() for terms in lexicon.values() for term in terms]
+    filler = "the love night amor noche nuit coeur tu ta gueule essex skill begun hello shell killer".split()
+    separators = [' ', ' ', ' ', '  ', '-', ', ', '\n', "'"]
+    songs = []
+    for song_id in range(count):
+        parts = []
+        for _ in range(rng.randint(0, 12)):
+            word = rng.choice(filler if rng.random() < 0.85 else terms)
+            parts += [word.upper() if rng.random() < 0.2 else word, rng.choice(separators)]
+        songs.append((song_id, ''.join(parts)))
+    return songs
+
+
+def test_corpus_verdicts_match_the_live_filter(multilingual):
+    songs = generated_lyrics(2000) + [
+        (-1, "ta gueule"), (-2, "Ta  Gueule"), (-3, "ta-gueule"), (-4, "TA, GUEULE"), (-5, "ta\ngueule"), (-6, "")
+    ]
+    corpus = LyricsCorpus.build(songs, multilingual.detector)
+    verdicts = corpus.score(multilingual.lexicons, multilingual.base_language)
+    assert list(verdicts.song_ids) == [song_id for song_id, _ in songs]
+    assert list(verdicts.is_clean) == [multilingual.is_clean(lyrics) for _, lyrics in songs]
+    assert list(verdicts.is_clean[-6:]) == [False, True, True, True, True, True]
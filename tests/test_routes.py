@@ -0,0 +1,284 @@
+import os
+import tempfile
+import time
+
+# Point the app at throwaway databases before it is imported
+_data_dir = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_data_dir, 'church_party.db')}"
+os.environ['LYRICS_DB_FILE'] = os.path.join(_data_dir, 'lyrics_cache.db')
+os.environ['LYRICS_SNAPSHOT_FILE'] = os.path.join(_data_dir, 'lyrics_snapshot.bin')
+
+import eventlet
+import pytest
+
+import app as app_module
+import http_client
+import warmup
+from app import (JOB_PRIORITY_BACKGROUND, JOB_PRIORITY_DJ, LYRICS_DB_FILE, LYRICS_EXCERPT_CHARS, LYRICS_JOB_LEASE,
+                 LYRICS_JOB_MAX_ATTEMPTS, LYRICS_JOB_RETRY_DELAY, LYRICS_NEGATIVE_MAX_TTL, LYRICS_NEGATIVE_TTL,
+                 MANUAL_LYRICS_CHARS, LyricsCheck, LyricsJob, Request, Song, User, app, cache_lyrics,
+                 cache_lyrics_miss, claim_lyrics_job, db, enqueue_lyrics_check, get_cached_lyrics, get_lyrics_miss,
+                 lyrics_memory_cache, lyrics_store, process_lyrics_check, publish_lyrics_snapshot, run_lyrics_job,
+                 socketio)
+from backfill import commit_batch
+from lyrics_normalize import legacy_cache_key, song_cache_key
+from lyrics_store import SqliteLyricsStore
+
+CLEAN_WORDS = "we sing along under the summer sky "
+FLAGGED_WORDS = "they pulled a gun on me "
+
+
+def padded(text, length):
+    return (text * (length // len(text) + 1))[:length]
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app.test_client()
+
+
+def add_song(number, lyrics, is_clean):
+    song = Song(spotify_id=f"{number:022d}", title=f"Song {number}", artist=f"Artist {number}", explicit=False)
+    db.session.add(song)
+    db.session.flush()
+    db.session.add(LyricsCheck(song_id=song.id, lyrics=lyrics, is_clean=is_clean))
+    db.session.commit()
+    return song.id
+
+
+def add_request(song_id):
+    user = User(username=f"guest-{song_id}", password_hash='-', role='guest')
+    db.session.add(user)
+    db.session.flush()
+    request_obj = Request(user_id=user.id, song_id=song_id, status='Pending')
+    db.session.add(request_obj)
+    db.session.commit()
+    return request_obj.id
+
+
+def verdicts():
+    return {check.song_id: check.is_clean for check in LyricsCheck.query.all()}
+
+
+def test_rescore_writes_back_changed_verdicts_and_holds_truncated_excerpts(client):
+    with app.app_context():
+        cleared = add_song(1, CLEAN_WORDS, False)
+        flagged = add_song(2, CLEAN_WORDS + FLAGGED_WORDS, True)
+        # Cut at the stored length, so what was cut off may be why they are flagged
+        held_excerpt = add_song(3, padded(CLEAN_WORDS, LYRICS_EXCERPT_CHARS), False)
+        held_manual = add_song(4, padded(CLEAN_WORDS, MANUAL_LYRICS_CHARS), False)
+        # The lyrics cache still has the whole song, and it is clean
+        full_excerpt = add_song(5, padded(CLEAN_WORDS, LYRICS_EXCERPT_CHARS), False)
+        cache_lyrics('Artist 5', 'Song 5', padded(CLEAN_WORDS, 3 * LYRICS_EXCERPT_CHARS), 'LRCLIB')
+
+    response = client.post('/dj/rescore-lyrics', json={'dry_run': True})
+    assert response.status_code == 200
+    assert response.get_json()['newly_cleared'] == 2
+    with app.app_context():
+        assert verdicts()[cleared] is False
+
+    response = client.post('/dj/rescore-lyrics')
+    summary = response.get_json()
+    assert (summary['newly_flagged'], summary['newly_cleared'], summary['held']) == (1, 2, 2)
+    with app.app_context():
+        assert verdicts() == {
+            cleared: True,
+            flagged: False,
+            held_excerpt: False,
+            held_manual: False,
+            full_excerpt: True
+        }
+
+
+def test_lyrics_jobs_lists_queued_and_failed_jobs(client):
+    with app.app_context():
+        queued = add_song(1, None, True)
+        failed = add_song(2, None, True)
+        enqueue_lyrics_check(queued, JOB_PRIORITY_DJ)
+        job = enqueue_lyrics_check(failed)
+        job.status, job.last_error = 'failed', 'boom'
+        db.session.commit()
+
+    response = client.get('/dj/lyrics-jobs')
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status['counts']['queued'] == 1 and status['counts']['failed'] == 1
+    assert [(job['song_id'], job['song_title']) for job in status['upcoming']] == [(queued, 'Song 1')]
+    assert [(job['song_title'], job['last_error']) for job in status['failed']] == [('Song 2', 'boom')]
+
+
+def test_lyrics_jobs_are_claimed_by_priority_then_due_time(client):
+    with app.app_context():
+        background = add_song(1, None, True)
+        requested = add_song(2, None, True)
+        dj = add_song(3, None, True)
+        not_due = add_song(4, None, True)
+        enqueue_lyrics_check(background, JOB_PRIORITY_BACKGROUND)
+        enqueue_lyrics_check(requested)
+        enqueue_lyrics_check(dj, JOB_PRIORITY_DJ)
+        enqueue_lyrics_check(not_due, JOB_PRIORITY_DJ).run_at = time.time() + 60
+        db.session.commit()
+        # Queuing the same song again only raises its priority; it keeps its place in time
+        enqueue_lyrics_check(background, JOB_PRIORITY_DJ)
+        assert LyricsJob.query.count() == 4
+
+        claimed = [claim_lyrics_job('worker-1') for _ in range(4)]
+        assert [job.song_id for job in claimed[:3]] == [background, dj, requested]
+        assert claimed[3] is None
+        assert all(job.status == 'running' and job.locked_by == 'worker-1' for job in claimed[:3])
+
+
+def test_failing_lyrics_jobs_back_off_then_fail(client, monkeypatch):
+    def fail(song_id, deadline=None):
+        raise RuntimeError('providers down')
+
+    monkeypatch.setattr(app_module, 'process_lyrics_check', fail)
+    with app.app_context():
+        job_id = enqueue_lyrics_check(add_song(1, None, True)).id
+        for attempt in range(1, LYRICS_JOB_MAX_ATTEMPTS + 1):
+            started = time.time()
+            run_lyrics_job(claim_lyrics_job('worker-1'))
+            job = db.session.get(LyricsJob, job_id)
+            assert (job.attempts, job.last_error, job.locked_by) == (attempt, 'providers down', None)
+            if attempt < LYRICS_JOB_MAX_ATTEMPTS:
+                assert job.status == 'queued'
+                delay = LYRICS_JOB_RETRY_DELAY * 2 ** (attempt - 1)
+                assert started + delay <= job.run_at <= time.time() + delay
+                assert claim_lyrics_job('worker-1') is None
+                job.run_at = time.time()
+                db.session.commit()
+        assert job.status == 'failed'
+        assert claim_lyrics_job('worker-1') is None
+
+
+def test_running_jobs_are_reclaimed_once_their_lease_expires(client):
+    with app.app_context():
+        job_id = enqueue_lyrics_check(add_song(1, None, True)).id
+        assert claim_lyrics_job('dead-worker').id == job_id
+        assert claim_lyrics_job('worker-2') is None
+
+        db.session.get(LyricsJob, job_id).locked_at = time.time() - LYRICS_JOB_LEASE - 1
+        db.session.commit()
+        job = claim_lyrics_job('worker-2')
+        assert (job.id, job.locked_by, job.attempts) == (job_id, 'worker-2', 2)
+        assert claim_lyrics_job('worker-3') is None
+
+
+def test_snapshot_answers_reads_until_the_store_writes_the_key(monkeypatch):
+    cache_lyrics('Artist 7', 'Song 7', 'first words', 'LRCLIB')
+    cache_lyrics('Artist 8', 'Song 8', 'other words', 'LRCLIB')
+    publish_lyrics_snapshot()
+    lyrics_memory_cache.clear()
+    store_reads = []
+    store_get = lyrics_store.get
+    monkeypatch.setattr(lyrics_store, 'get', lambda key: store_reads.append(key) or store_get(key))
+
+    assert get_cached_lyrics('Artist 7', 'Song 7') == 'first words'
+    assert store_reads == []
+
+    # Written by this process...
+    cache_lyrics('Artist 7', 'Song 7', 'second words', 'Genius')
+    lyrics_memory_cache.clear()
+    assert get_cached_lyrics('Artist 7', 'Song 7') == 'second words'
+    # ...or by another one
+    SqliteLyricsStore(LYRICS_DB_FILE).put(song_cache_key('Artist 8', 'Song 8'), {
+        'lyrics': 'newer words', 'timestamp': time.time(), 'api_used': 'Genius'
+    })
+    assert get_cached_lyrics('Artist 8', 'Song 8') == 'newer words'
+    assert store_reads == [song_cache_key('Artist 7', 'Song 7'), song_cache_key('Artist 8', 'Song 8')]
+
+
+def drained_bucket(rate):
+    bucket = http_client.TokenBucket(rate, 1)
+    bucket.reserve(0)
+    return bucket
+
+
+@pytest.mark.parametrize('url', ['/guest-search?query=hello', '/callback?code=abc'])
+def test_spotify_rate_limit_answers_429_with_retry_after(client, monkeypatch, url):
+    # One token every 10s, just taken: the next call would wait far past the limit
+    monkeypatch.setitem(http_client.client._buckets, 'accounts.spotify.com', drained_bucket(0.1))
+    response = client.get(url)
+    assert response.status_code == 429
+    assert response.get_json() == {'error': 'Spotify is busy right now, please try again shortly'}
+    assert 9 <= int(response.headers['Retry-After']) <= 10
+
+
+@pytest.mark.parametrize('checked_by', ['job', 'backfill', 'warmup'])
+def test_flagged_verdicts_reject_pending_requests(client, monkeypatch, checked_by):
+    emitted = []
+    monkeypatch.setattr(socketio, 'emit', lambda event, data: emitted.append((event, data)))
+    monkeypatch.setattr(app_module, 'get_lyrics', lambda *args, **kwargs: FLAGGED_WORDS)
+    monkeypatch.setattr(warmup, 'get_lyrics', lambda *args, **kwargs: FLAGGED_WORDS)
+    with app.app_context():
+        song = Song(spotify_id=f"{1:022d}", title="Song 1", artist="Artist 1", explicit=False)
+        db.session.add(song)
+        db.session.commit()
+        song_id = song.id
+        request_id = add_request(song_id)
+
+        if checked_by == 'job':
+            process_lyrics_check(song_id)
+        elif checked_by == 'backfill':
+            commit_batch([(song_id, FLAGGED_WORDS, False, None)])
+        else:
+            assert warmup.warm_track({'id': f"{1:022d}"}) == 'flagged'
+
+        assert db.session.get(Request, request_id).status == 'Rejected'
+        assert verdicts() == {song_id: False}
+    assert emitted == [('request_rejected', {
+        'request_id': request_id, 'song_title': 'Song 1', 'reason': 'Inappropriate lyrics detected'
+    })]
+
+
+def test_warmup_runs_one_at_a_time_and_accepts_playlist_links(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(warmup, 'warmup_from_spotify', lambda **kwargs: started.append(kwargs['playlist_id']))
+    link = {'playlist_id': 'https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M?si=abc'}
+
+    assert client.post('/dj/warmup', json=link).status_code == 202
+    # The first run has not had a turn yet, so it still holds the lock
+    assert client.post('/dj/warmup', json={'playlist_id': '37i9dQZF1DXcBWIGoYBM5M'}).status_code == 409
+    eventlet.sleep(0)
+    assert started == ['37i9dQZF1DXcBWIGoYBM5M']
+
+    assert client.post('/dj/warmup', json={'playlist_id': 'spotify:playlist:37i9dQZF1DX0XUsuxWHRQd'}).status_code == 202
+    eventlet.sleep(0)
+    assert started == ['37i9dQZF1DXcBWIGoYBM5M', '37i9dQZF1DX0XUsuxWHRQd']
+    assert client.post('/dj/warmup', json={}).status_code == 400
+
+
+def test_repeat_lyrics_misses_back_off_exponentially_up_to_the_cap():
+    assert get_lyrics_miss('Artist 10', 'Song 10') is None
+    delays = []
+    for attempt in range(1, 12):
+        entry = cache_lyrics_miss('Artist 10', 'Song 10')
+        assert entry['attempts'] == attempt
+        delays.append(entry['retry_at'] - entry['timestamp'])
+    assert delays[:4] == [LYRICS_NEGATIVE_TTL, 2 * LYRICS_NEGATIVE_TTL, 4 * LYRICS_NEGATIVE_TTL, 8 * LYRICS_NEGATIVE_TTL]
+    assert delays[-1] == LYRICS_NEGATIVE_MAX_TTL
+    assert get_lyrics_miss('Artist 10', 'Song 10')['attempts'] == 11
+    assert get_cached_lyrics('Artist 10', 'Song 10') is None
+
+    # Lyrics found later replace the miss
+    cache_lyrics('Artist 10', 'Song 10', 'found at last', 'LRCLIB')
+    assert get_lyrics_miss('Artist 10', 'Song 10') is None
+    assert cache_lyrics_miss('Artist 10', 'Song 10')['attempts'] == 1
+
+
+def test_entries_under_the_legacy_key_are_rekeyed_on_first_hit():
+    artist, title = 'Earth, Wind & Fire', 'September (Remastered 1999)'
+    assert legacy_cache_key(artist, title) != song_cache_key(artist, title)
+    lyrics_store.put(legacy_cache_key(artist, title), {
+        'lyrics': 'ba de ya, say do you remember', 'timestamp': time.time(), 'api_used': 'Lyrics.ovh'
+    })
+    lyrics_memory_cache.clear()
+
+    assert lyrics_store.get(song_cache_key(artist, title)) is None
+    assert get_cached_lyrics(artist, title) == 'ba de ya, say do you remember'
+    assert lyrics_store.get(song_cache_key(artist, title))['lyrics'] == 'ba de ya, say do you remember'
+    # Other spellings of the same song now share the canonical entry
+    assert get_cached_lyrics(artist, 'September') == 'ba de ya, say do you remember'
@@ -0,0 +1,288 @@
+import json
+import os
+import socket
+import time
+
+import eventlet
+import pytest
+import requests
+
+from deadline import Deadline, DeadlineExceeded
+from http_client import HttpClient, RateLimited, TokenBucket
+from lyrics_engine import AZLyricsProvider, JsonLyricsProvider, LyricsEngine, LyricsProvider, ProviderResult
+from lyrics_normalize import primary_artist, query_artist, song_cache_key
+from lyrics_snapshot import LyricsSnapshot, write_snapshot
+from lyrics_store import LogLyricsStore, SqliteLyricsStore
+from provider_stats import OUTCOME_MISS, OUTCOME_SUCCESS
+
+
+def entry(lyrics):
+    return {'lyrics': lyrics, 'timestamp': 1.0, 'api_used': 'LRCLIB'}
+
+
+def test_log_store_survives_a_torn_final_write(tmp_path):
+    snapshot = str(tmp_path / 'lyrics_cache.json')
+    store = LogLyricsStore(snapshot)
+    store.put('a', entry('first'))
+    store.put('b', entry('second'))
+    store._log.close()
+    with open(store.log_path, 'rb+') as f:
+        f.truncate(os.path.getsize(store.log_path) - 5)
+
+    store = LogLyricsStore(snapshot)
+    assert store.get('a') == entry('first')
+    assert store.get('b') is None
+    store.put('c', entry('third'))
+    store._log.close()
+
+    store = LogLyricsStore(snapshot)
+    assert store.get('a') == entry('first')
+    assert store.get('c') == entry('third')
+
+
+def test_log_store_folds_an_interrupted_compaction_into_the_snapshot(tmp_path):
+    snapshot = str(tmp_path / 'lyrics_cache.json')
+    store = LogLyricsStore(snapshot)
+    store.put('a', entry('first'))
+    store.put('gone', entry('deleted later'))
+    store._log.close()
+    # Stopped after the log was rotated but before the snapshot was written
+    os.replace(store.log_path, store.log_path + '.old')
+    with open(store.log_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'key': 'gone', 'deleted': True}) + '\n')
+
+    store = LogLyricsStore(snapshot)
+    assert not os.path.exists(store.log_path + '.old')
+    assert store.get('a') == entry('first')
+    assert store.get('gone') is None
+
+    store.put('b', entry('second'))
+    store.compact()
+    store._log.close()
+    store = LogLyricsStore(snapshot)
+    assert sorted(store.keys()) == ['a', 'b']
+
+
+def test_sqlite_store_lists_keys_written_after_a_snapshot(tmp_path):
+    path = str(tmp_path / 'lyrics_cache.db')
+    store = SqliteLyricsStore(path)
+    store.put('a', entry('first'))
+    store.put('b', entry('second'))
+    store.put('c', entry('third'))
+    write_snapshot(str(tmp_path / 'lyrics_snapshot.bin'), store.items(), store.write_seq())
+    snapshot = LyricsSnapshot(str(tmp_path / 'lyrics_snapshot.bin'))
+    assert snapshot.seq == 3
+    assert snapshot.get('b')['lyrics'] == 'second'
+
+    store.put('b', entry('newer'))
+    store.delete('c')
+    assert sorted(store.keys_written_since(snapshot.seq)) == ['b', 'c']
+    # The sequence survives a reopen, and a re-put clears the deletion
+    store = SqliteLyricsStore(path)
+    assert store.write_seq() == 5
+    store.put('c', entry('back'))
+    assert store.keys_written_since(5) == ['c']
+    assert LogLyricsStore(str(tmp_path / 'lyrics_cache.json')).write_seq() is None
+
+
+@pytest.mark.parametrize('artist', ['Earth, Wind & Fire', 'Tyler, The Creator', 'Crosby, Stills, Nash & Young',
+                                    'Simon & Garfunkel'])
+def test_primary_artist_keeps_names_with_commas_and_ampersands(artist):
+    assert primary_artist(artist) == artist
+    assert query_artist(artist) == artist
+
+
+@pytest.mark.parametrize('artist', ['Drake feat. Rihanna', 'Drake ft. Rihanna', 'Drake featuring Rihanna',
+                                    'Drake (feat. Rihanna)'])
+def test_primary_artist_drops_featured_artists(artist):
+    assert primary_artist(artist) == 'Drake'
+
+
+def test_song_cache_keys_of_comma_names_do_not_collide():
+    assert song_cache_key('Earth, Wind & Fire', 'September') != song_cache_key('Earth', 'September')
+    assert song_cache_key('Earth, Wind & Fire', 'September') == song_cache_key('Earth, Wind & Fire', 'September (Remastered)')
+
+
+class ScriptedEngine(LyricsEngine):
+    """Providers answer after a set delay instead of over the network"""
+
+    def __init__(self, script):
+        super().__init__(providers={})
+        self.script = script
+        self.started = []
+        self.finished = []
+        self.deadlines = []
+
+    def query(self, provider, artist, title, record=True, deadline=None, track=None):
+        self.started.append(provider.name)
+        self.deadlines.append(deadline)
+        seconds, lyrics = self.script[provider.name]
+        eventlet.sleep(seconds)
+        self.finished.append(provider.name)
+        return ProviderResult(provider.name, lyrics, OUTCOME_SUCCESS if lyrics else OUTCOME_MISS)
+
+
+def scripted_providers(*names):
+    providers = []
+    for name in names:
+        provider = LyricsProvider()
+        provider.name = name
+        providers.append(provider)
+    return providers
+
+
+def test_hedged_race_starts_the_next_provider_after_the_delay_and_kills_the_loser():
+    engine = ScriptedEngine({'slow': (0.5, 'slow lyrics'), 'fast': (0.01, 'fast lyrics')})
+    started = time.monotonic()
+    result, inconclusive = engine.race(scripted_providers('slow', 'fast'), 'Artist', 'Title', 0.05, Deadline(5))
+    assert (result.provider, result.lyrics, inconclusive) == ('fast', 'fast lyrics', False)
+    assert time.monotonic() - started < 0.4
+    assert engine.started == ['slow', 'fast']
+    # The slow provider was killed rather than left to finish in the background
+    eventlet.sleep(0.6)
+    assert engine.finished == ['fast']
+
+
+def test_race_moves_on_at_once_when_a_provider_misses():
+    engine = ScriptedEngine({'miss': (0.01, None), 'hit': (0.01, 'lyrics'), 'unused': (0.01, 'lyrics')})
+    started = time.monotonic()
+    result, _ = engine.race(scripted_providers('miss', 'hit', 'unused'), 'Artist', 'Title', 5, Deadline(5))
+    assert result.provider == 'hit'
+    assert time.monotonic() - started < 1
+    assert engine.started == ['miss', 'hit']
+
+
+def test_race_gives_up_inconclusive_at_the_deadline():
+    engine = ScriptedEngine({'a': (1, 'lyrics'), 'b': (1, 'lyrics')})
+    started = time.monotonic()
+    assert engine.race(scripted_providers('a', 'b'), 'Artist', 'Title', 0, Deadline(0.1)) == (None, True)
+    assert time.monotonic() - started < 0.5
+    eventlet.sleep(1.1)
+    assert engine.finished == []
+
+
+def test_token_bucket_queues_waiters_behind_each_other():
+    bucket = TokenBucket(10, 2)
+    assert bucket.reserve(0) == 0 and bucket.reserve(0) == 0
+    assert bucket.reserve(1) == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(1) == pytest.approx(0.2, abs=0.01)
+    # A caller that won't wait that long takes nothing
+    assert bucket.reserve(0.25) is None
+    assert bucket.next_free() == pytest.approx(0.3, abs=0.01)
+
+
+# Nothing listens here, so a request that gets its token fails straight away with a connection error
+CLOSED_PORT_URL = 'http://127.0.0.1:9/'
+
+
+def test_client_waits_for_a_token_up_to_max_wait_then_rejects():
+    client = HttpClient(rate_limits={'127.0.0.1:9': (10, 1)}, max_wait=0.15)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(CLOSED_PORT_URL)
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(CLOSED_PORT_URL)
+    waited = client.stats()['127.0.0.1:9']['throttled_seconds']
+    assert 0 < waited <= 0.1 and time.monotonic() - started >= waited
+
+    # At 5 per second the next token is further off than max_wait
+    client.set_rate_limit('127.0.0.1:9', 5, 1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(CLOSED_PORT_URL)
+    with pytest.raises(RateLimited) as rejected:
+        client.get(CLOSED_PORT_URL)
+    assert rejected.value.retry_after == pytest.approx(0.2, abs=0.05)
+    stats = client.stats()['127.0.0.1:9']
+    assert (stats['requests'], stats['throttled'], stats['rejected']) == (3, 1, 1)
+
+
+def test_client_token_wait_is_bounded_by_the_deadline():
+    client = HttpClient(rate_limits={'127.0.0.1:9': (10, 1)}, max_wait=2)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(CLOSED_PORT_URL)
+    started = time.monotonic()
+    with pytest.raises(RateLimited):
+        client.get(CLOSED_PORT_URL, deadline=Deadline(0.05))
+    assert time.monotonic() - started < 0.05
+
+
+AZ_LYRICS = "Olá, coração <i>[Refrão]</i><br>\nÇa va, naïve café ♪<br>\n"
+AZ_PAGE = ('<html><div class="ringtone"></div>' + AZLyricsProvider._BLOCK_START + AZ_LYRICS + '</div>'
+           + '<div class="footer">' + 'x' * 5000 + '</div></html>').encode('utf-8')
+
+
+def chunked(data, size, read=None):
+    for start in range(0, len(data), size):
+        if read is not None:
+            read.append(start)
+        yield data[start:start + size]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, 4096])
+def test_azlyrics_block_survives_chunk_and_utf8_boundaries(size):
+    assert AZLyricsProvider().extract_block(chunked(AZ_PAGE, size), 'utf-8') == AZ_LYRICS
+
+
+def test_azlyrics_stops_reading_once_the_block_closes():
+    read = []
+    assert AZLyricsProvider().extract_block(chunked(AZ_PAGE, 64, read)) == AZ_LYRICS
+    assert read[-1] < AZ_PAGE.index(b'<div class="footer">')
+
+
+def test_azlyrics_gives_up_after_max_bytes_without_a_block():
+    provider = AZLyricsProvider()
+    provider.max_bytes = 1024
+    read = []
+    page = b'<html>' + b'<p>no lyrics here</p>' * 500
+    assert provider.extract_block(chunked(page, 100, read)) is None
+    assert len(read) == 11
+
+
+def test_deadline_sizes_timeouts_and_refuses_steps_once_spent():
+    deadline = Deadline(1, 'song request')
+    assert deadline.timeout(10) <= 1
+    assert deadline.timeout(0.2) == 0.2
+    assert deadline.capped(5) is deadline
+    assert deadline.capped(0.1).remaining() <= 0.1
+
+    spent = Deadline(0, 'song request')
+    with pytest.raises(DeadlineExceeded, match='song request deadline of 0s exceeded before saving'):
+        spent.check('saving')
+
+
+@pytest.mark.parametrize('caller_seconds, limit', [(30, 2), (0.5, 0.5)])
+def test_engine_fetch_hands_the_tighter_deadline_to_every_provider(caller_seconds, limit):
+    engine = ScriptedEngine({'a': (0.01, None), 'b': (0.01, 'lyrics')})
+    engine.providers = {provider.name: provider for provider in scripted_providers('a', 'b')}
+    engine.deadline = 2
+    assert engine.fetch('Artist', 'Title', Deadline(caller_seconds)) == ('lyrics', 'b', False)
+    assert len(engine.deadlines) == 2 and engine.deadlines[0] is engine.deadlines[1]
+    assert 0 < engine.deadlines[0].remaining() <= limit
+
+
+class SilentProvider(JsonLyricsProvider):
+    name = 'Silent'
+    url = '{base_url}/{artist}/{title}'
+    timeout = 10
+
+
+def test_provider_requests_time_out_with_the_deadline_not_the_provider_timeout():
+    # Accepts connections (through the backlog) but never answers
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(8)
+    provider = SilentProvider()
+    provider.base_url = f"http://127.0.0.1:{server.getsockname()[1]}"
+    engine = LyricsEngine(providers={})
+    try:
+        started = time.monotonic()
+        result = engine.query(provider, 'Artist', 'Title', deadline=Deadline(0.3))
+        assert time.monotonic() - started < 2
+        assert (result.error, result.cut_short, result.inconclusive) == ('DeadlineExceeded', True, True)
+        # Running out of the caller's time says nothing about the provider
+        assert 'Silent' not in engine.scoreboard.snapshot()
+
+        result = engine.query(provider, 'Artist', 'Title', deadline=Deadline(0))
+        assert result.cut_short and result.seconds == 0
+    finally:
+        server.close()
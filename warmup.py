@@ -0,0 +1,235 @@
+"""Pre-event lyrics warm-up
+
+Resolves a Spotify playlist or a list of track IDs, then fetches, filters and
+caches lyrics for every track so guest requests on the night hit warm caches.
+
+    python warmup.py --playlist 37i9dQZF1DXcBWIGoYBM5M
+    python warmup.py --file tracks.txt --concurrency 8
+
+Progress is saved after every track, so an interrupted run resumes where it
+stopped (use --reset to start over).
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+import eventlet
+
+import http_client
+from app import (
+    app, db, Song, LyricsCheck, SPOTIFY_API_URL,
+    get_app_spotify_token, song_from_track, track_signature, get_lyrics, check_lyrics_content, save_lyrics_check,
+    reject_flagged_requests
+)
+from lyrics_engine import LyricsPending
+
+WARMUP_PROGRESS_FILE = os.getenv('WARMUP_PROGRESS_FILE', 'warmup_progress.json')
+WARMUP_CONCURRENCY = int(os.getenv('WARMUP_CONCURRENCY', 4))
+
+_TRACK_ID = re.compile(r'(?:spotify:track:|open\.spotify\.com/track/)?([A-Za-z0-9]{22})')
+_PLAYLIST_ID = re.compile(r'playlist[/:]([A-Za-z0-9]+)')
+
+# Shared with the /dj/warmup endpoint
+warmup_status = {
+    'running': False,
+    'total': 0,
+    'done': 0,
+    'skipped': 0,
+    'failed': 0,
+    'pending': 0,
+    'flagged': 0,
+    'started_at': None,
+    'finished_at': None
+}
+_status_lock = threading.Lock()
+
+# One warm-up at a time per process
+warmup_lock = threading.Lock()
+
+
+def parse_track_ids(text):
+    """Pull track IDs out of raw IDs, spotify:track: URIs or open.spotify.com links"""
+    ids = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = _TRACK_ID.search(line)
+        if match and match.group(1) not in ids:
+            ids.append(match.group(1))
+    return ids
+
+
+def parse_playlist_id(text):
+    """Playlist ID from a raw ID, spotify:playlist: URI or open.spotify.com link"""
+    text = text.strip()
+    match = _PLAYLIST_ID.search(text)
+    return match.group(1) if match else text
+
+
+def resolve_playlist(playlist_id, token):
+    """All tracks of a playlist, following Spotify's paging"""
+    url = f"{SPOTIFY_API_URL}/playlists/{playlist_id}/tracks"
+    params = {'limit': 100, 'fields': 'next,items(track(id,name,artists,album,explicit,duration_ms))'}
+    headers = {"Authorization": f"Bearer {token}"}
+    tracks = []
+    while url:
+        response = http_client.get(url, headers=headers, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        tracks.extend(item['track'] for item in data.get('items', []) if item.get('track') and item['track'].get('id'))
+        url = data.get('next')
+        params = None  # 'next' already carries the query string
+    return tracks
+
+
+def resolve_tracks(track_ids, token):
+    """Track metadata for a list of IDs, 50 per Spotify call"""
+    headers = {"Authorization": f"Bearer {token}"}
+    tracks = []
+    for start in range(0, len(track_ids), 50):
+        batch = track_ids[start:start + 50]
+        response = http_client.get(f"{SPOTIFY_API_URL}/tracks", headers=headers,
+                                params={'ids': ','.join(batch)}, timeout=10)
+        response.raise_for_status()
+        tracks.extend(t for t in response.json().get('tracks', []) if t)
+    return tracks
+
+
+def load_progress(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'done': [], 'failed': []}
+
+
+def save_progress(path, progress):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def _bump(*counters):
+    with _status_lock:
+        for counter in counters:
+            warmup_status[counter] += 1
+
+
+def warm_track(track):
+    """Create the Song if needed and make sure its lyrics are cached and checked"""
+    with app.app_context():
+        song = Song.query.filter_by(spotify_id=track['id']).first()
+        if not song:
+            song = song_from_track(track)
+            db.session.add(song)
+            db.session.commit()
+
+        existing = LyricsCheck.query.filter_by(song_id=song.id).first()
+        if existing and existing.lyrics:
+            return 'skipped'
+
+        try:
+            lyrics = get_lyrics(song.artist, song.title, track=track_signature(song))
+        except LyricsPending as e:
+            # No verdict yet; leave the track unchecked so the next run retries it
+            print(f"⏱️  Warm-up pending for {song.title}: {e}")
+            return 'pending'
+        is_clean = check_lyrics_content(lyrics) if lyrics else True
+        save_lyrics_check(song.id, lyrics, is_clean)
+        db.session.commit()
+        if not is_clean:
+            # A guest may have requested it while the warm-up was running
+            reject_flagged_requests(song.id)
+        return 'done' if is_clean else 'flagged'
+
+
+def run_warmup(tracks, concurrency=WARMUP_CONCURRENCY, progress_file=WARMUP_PROGRESS_FILE):
+    """Warm every track with at most `concurrency` fetches in flight"""
+    progress = load_progress(progress_file)
+    done = set(progress['done'])
+    pending = [t for t in tracks if t['id'] not in done]
+    with _status_lock:
+        warmup_status.update({
+            'running': True,
+            'total': len(tracks),
+            'done': len(tracks) - len(pending),
+            'skipped': 0,
+            'failed': 0,
+            'pending': 0,
+            'flagged': 0,
+            'started_at': time.time(),
+            'finished_at': None
+        })
+    print(f"🔥 Warming lyrics for {len(pending)} tracks ({len(tracks) - len(pending)} already done)")
+
+    def work(track):
+        try:
+            return track, warm_track(track)
+        except Exception as e:
+            print(f"❌ Warm-up failed for {track.get('name')}: {e}")
+            return track, 'failed'
+
+    pool = eventlet.GreenPool(max(1, concurrency))
+    try:
+        for track, outcome in pool.imap(work, pending):
+            if outcome == 'pending':
+                # Neither done nor failed: the next run picks it up again
+                _bump('pending')
+            elif outcome == 'failed':
+                if track['id'] not in progress['failed']:
+                    progress['failed'].append(track['id'])
+                _bump('failed')
+            else:
+                progress['done'].append(track['id'])
+                if track['id'] in progress['failed']:
+                    progress['failed'].remove(track['id'])
+                _bump('done', *([outcome] if outcome != 'done' else []))
+            save_progress(progress_file, progress)
+    finally:
+        with _status_lock:
+            warmup_status.update({'running': False, 'finished_at': time.time()})
+
+    with _status_lock:
+        summary = dict(warmup_status)
+    print(f"✅ Warm-up finished: {summary['done']} done, {summary['flagged']} flagged, {summary['failed']} failed, "
+          f"{summary['pending']} pending")
+    return summary
+
+
+def warmup_from_spotify(playlist_id=None, track_ids=None, concurrency=WARMUP_CONCURRENCY,
+                        progress_file=WARMUP_PROGRESS_FILE):
+    """Resolve a playlist or track ID list and warm it"""
+    token = get_app_spotify_token()
+    if not token:
+        raise RuntimeError("Spotify token unavailable")
+    tracks = resolve_playlist(playlist_id, token) if playlist_id else resolve_tracks(track_ids or [], token)
+    return run_warmup(tracks, concurrency=concurrency, progress_file=progress_file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Warm the lyrics cache before an event")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--playlist', help="Spotify playlist ID or link")
+    source.add_argument('--file', help="File with one track ID, URI or link per line")
+    parser.add_argument('--concurrency', type=int, default=WARMUP_CONCURRENCY)
+    parser.add_argument('--progress', default=WARMUP_PROGRESS_FILE)
+    parser.add_argument('--reset', action='store_true', help="Ignore saved progress")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.progress):
+        os.remove(args.progress)
+
+    playlist_id = None
+    track_ids = None
+    if args.playlist:
+        playlist_id = parse_playlist_id(args.playlist)
+    else:
+        with open(args.file, 'r') as f:
+            track_ids = parse_track_ids(f.read())
+
+    warmup_from_spotify(playlist_id, track_ids, concurrency=args.concurrency, progress_file=args.progress)